@@ -0,0 +1 @@
+"""Offline benchmarks with a fake registry and a fake skopeo."""
@@ -0,0 +1,268 @@
+"""Offline benchmarks of docker-tag-updater.
+
+Every benchmark runs against a local stand-in registry (tests/fake_registry.py) and a
+stub skopeo executable (benchmarks/fake-skopeo), so no network is needed. The results
+are written as JSON so that they can be compared between releases. Run them from the
+root of the repository:
+
+    python -m benchmarks.run --images 500 --output bench.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from importlib import metadata
+from pathlib import Path
+from typing import Any, Callable
+
+from docker_tag_updater import compose, helpers, registry, skopeo
+from tests.fake_registry import FakeRegistry
+
+FAKE_SKOPEO = Path(__file__).with_name("fake-skopeo")
+VERSION_LABEL = "org.opencontainers.image.version"
+BENCH_REGISTRY = "bench.io"
+
+bench_parser = argparse.ArgumentParser(description=__doc__.split("\n", 1)[0])
+bench_parser.add_argument(
+    "--images",
+    type=int,
+    help="The number of images in the synthetic Compose file.",
+    default=500,
+)
+bench_parser.add_argument(
+    "--tags",
+    type=int,
+    help="The number of tags listed for the tag selection benchmarks.",
+    default=10000,
+)
+bench_parser.add_argument(
+    "--latency",
+    type=float,
+    help="The number of seconds the fake registry and skopeo take per request.",
+    default=0.005,
+)
+bench_parser.add_argument(
+    "--error-rate",
+    type=float,
+    help="The fraction of requests that the fake registry and skopeo fail.",
+    default=0.0,
+)
+bench_parser.add_argument(
+    "--samples",
+    type=int,
+    help="The number of images looked up for the per-image latencies.",
+    default=50,
+)
+bench_parser.add_argument(
+    "--seconds",
+    type=float,
+    help="The time spent on each throughput benchmark.",
+    default=0.5,
+)
+bench_parser.add_argument(
+    "--skip-skopeo",
+    action="store_true",
+    help="Skip the benchmarks of the skopeo backend.",
+)
+bench_parser.add_argument(
+    "-o",
+    "--output",
+    help="Write the results to this file instead of STDOUT.",
+)
+
+
+def throughput(func: Callable[[], Any], seconds: float) -> dict[str, float]:
+    """Call a function repeatedly for a while and report the calls per second."""
+    calls = 0
+    start = time.perf_counter()
+    deadline = start + seconds
+    while True:
+        for _ in range(100):
+            func()
+        calls += 100
+        now = time.perf_counter()
+        if now >= deadline:
+            return {"calls": calls, "ops_per_second": calls / (now - start)}
+
+
+def latencies(samples: list[float]) -> dict[str, float]:
+    """Summarise latencies in seconds."""
+    ordered = sorted(samples)
+    return {
+        "count": len(ordered),
+        "mean": statistics.fmean(ordered),
+        "p50": ordered[len(ordered) // 2],
+        "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        "max": ordered[-1],
+    }
+
+
+def bench_parse_version(seconds: float) -> dict[str, Any]:
+    """Measure the throughput of parse_version per rule."""
+    versions = {
+        "default": "v1.2.3",
+        "lscr": "version-1.2.3.456-ls789",
+        "yyyymmdd": "20240601",
+        "auto": "version-1.2.3.456-ls789",
+    }
+    return {
+        rule: throughput(
+            lambda version=version, rule=rule: helpers.parse_version(
+                version, helpers.rules, rule
+            ),
+            seconds,
+        )
+        for rule, version in versions.items()
+    }
+
+
+def bench_compare_versions(seconds: float) -> dict[str, Any]:
+    """Measure the throughput of compare_versions with a warm and a cold memo."""
+    versions = [f"v1.{minor}.{patch}" for minor in range(100) for patch in range(100)]
+    position = iter(range(sys.maxsize))
+
+    def cold():
+        index = next(position) % len(versions)
+        skopeo.compare_versions(versions[index], versions[-index - 1], "default")
+
+    return {
+        "warm": throughput(
+            lambda: skopeo.compare_versions("v1.2.3", "v1.2.4", "default"), seconds
+        ),
+        "cold": throughput(cold, seconds),
+    }
+
+
+def bench_newest_version(tag_count: int) -> dict[str, Any]:
+    """Measure how long picking the newest of many tags takes."""
+    tags = [
+        f"{index // 10000}.{index // 100 % 100}.{index % 100}"
+        for index in range(tag_count)
+    ] + ["latest", "edge"]
+    start = time.perf_counter()
+    helpers.newest_version(tags)
+    return {"tags": len(tags), "seconds": time.perf_counter() - start}
+
+
+def bench_image_version(
+    inspector: Callable, images: list[str], base_tag: str = "latest"
+) -> dict[str, Any]:
+    """Measure the end-to-end latency of image_version per image."""
+    samples = []
+    failures = 0
+    for image in images:
+        start = time.perf_counter()
+        try:
+            skopeo.image_version(image, BENCH_REGISTRY, base_tag, inspector=inspector)
+        except (KeyError, ValueError):
+            failures += 1
+        samples.append(time.perf_counter() - start)
+    return {**latencies(samples), "failures": failures}
+
+
+def bench_compose_run(inspector: Callable, image_count: int) -> dict[str, Any]:
+    """Measure the whole run of compose-updater over a synthetic Compose file."""
+    services = "".join(
+        f"  app{index}:\n    image: {BENCH_REGISTRY}/bench/app{index}:1.0.0\n"
+        for index in range(image_count)
+    )
+    with tempfile.TemporaryDirectory() as temp_dir:
+        compose_file = Path(temp_dir) / "compose.yaml"
+        compose_file.write_text(f"services:\n{services}", encoding="utf-8")
+        start = time.perf_counter()
+        updated, errors = compose.update_file(compose_file, inspector=inspector)
+        seconds = time.perf_counter() - start
+    return {
+        "images": image_count,
+        "seconds": seconds,
+        "updated": len(updated),
+        "failures": len(errors),
+    }
+
+
+def run(args: argparse.Namespace) -> dict[str, Any]:
+    """Run every benchmark."""
+    results: dict[str, Any] = {
+        "parse_version": bench_parse_version(args.seconds),
+        "compare_versions": bench_compare_versions(args.seconds),
+        "newest_version": bench_newest_version(args.tags),
+    }
+    sample_images = [f"bench/app{index}" for index in range(args.samples)]
+
+    with FakeRegistry(latency=args.latency, error_rate=args.error_rate) as server:
+        for index in range(max(args.images, args.samples)):
+            server.add_image(
+                f"bench/app{index}", "latest", {VERSION_LABEL: f"1.{index % 50 + 1}.0"}
+            )
+        server.add_tags("bench/tags", [f"1.0.{patch}" for patch in range(args.tags)])
+        client = registry.RegistryClient(endpoints={BENCH_REGISTRY: server.url})
+
+        results["native"] = {
+            "image_version": bench_image_version(client.inspect, sample_images),
+        }
+        start = time.perf_counter()
+        skopeo.newest_tag("bench/tags", BENCH_REGISTRY, lister=client.list_tags)
+        results["native"]["newest_tag"] = {
+            "tags": args.tags,
+            "seconds": time.perf_counter() - start,
+        }
+        client.close()
+        client = registry.RegistryClient(endpoints={BENCH_REGISTRY: server.url})
+        results["native"]["compose_run"] = bench_compose_run(client.inspect, args.images)
+        client.close()
+        results["native"]["requests"] = len(server.requests)
+
+    if not args.skip_skopeo:
+        with tempfile.TemporaryDirectory() as bin_dir:
+            os.symlink(FAKE_SKOPEO.resolve(), Path(bin_dir) / "skopeo")
+            environment = dict(os.environ)
+            os.environ["PATH"] = f"{bin_dir}{os.pathsep}{os.environ['PATH']}"
+            os.environ["FAKE_SKOPEO_LATENCY"] = str(args.latency)
+            os.environ["FAKE_SKOPEO_ERROR_RATE"] = str(args.error_rate)
+            os.environ["FAKE_SKOPEO_TAGS"] = str(args.tags)
+            try:
+                results["skopeo"] = {
+                    "image_version": bench_image_version(skopeo.inspect, sample_images),
+                    "compose_run": bench_compose_run(skopeo.inspect, args.images),
+                }
+            finally:
+                os.environ.clear()
+                os.environ.update(environment)
+    return results
+
+
+def package_version() -> str | None:
+    """Get the installed version of docker-tag-updater, if it is installed."""
+    try:
+        return metadata.version("docker-tag-updater")
+    except metadata.PackageNotFoundError:
+        return None
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Run the benchmarks and write out the report."""
+    args = bench_parser.parse_args(argv)
+    report = {
+        "meta": {
+            "package_version": package_version(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.time(),
+            "parameters": vars(args),
+        },
+        "results": run(args),
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n", encoding="utf-8")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,34 @@
-"""docker_updater_tag module"""
+"""docker_updater_tag module
 
-from . import skopeo
-from . import parser
+The submodules are imported when they are first used, so that the command line tools
+only pay for the modules that they need.
+"""
+
+import importlib
+
+__all__ = [
+    "auth",
+    "cache",
+    "compose",
+    "daemon",
+    "helpers",
+    "jsonstream",
+    "metrics",
+    "parser",
+    "policy",
+    "proxy",
+    "ratelimit",
+    "registry",
+    "replay",
+    "scanindex",
+    "server",
+    "singleflight",
+    "skopeo",
+    "tagsync",
+]
+
+
+def __getattr__(name: str):
+    if name in __all__:
+        return importlib.import_module(f".{name}", __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
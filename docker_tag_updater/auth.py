@@ -0,0 +1,221 @@
+"""Registry authentication.
+
+This module defines the cache of the bearer tokens that registries grant, so that a
+token is requested once per registry and repository scope and reused by every lookup
+until just before it expires, and the lookup of the credentials that ``docker
+login`` stores. The tokens can also be kept on disk, readable only by the current
+user, so that back-to-back runs reuse them too.
+"""
+
+import base64
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import NamedTuple
+
+from .cache import default_cache_dir
+
+DEFAULT_EXPIRES_IN = 60
+"""The lifetime of a token in seconds if the registry does not say, as per the spec."""
+
+EXPIRY_MARGIN = 10.0
+"""The number of seconds before its expiry that a token is no longer used."""
+
+DOCKER_HUB_AUTH_KEY = "https://index.docker.io/v1/"
+"""The key of the Docker Hub credentials in the Docker configuration."""
+
+
+class Token(NamedTuple):
+    """A bearer token for a registry and repository scope."""
+
+    token: str
+    """The token itself."""
+    expires_at: float
+    """When the token expires, in seconds since the epoch."""
+
+
+def default_token_path() -> Path:
+    """Get the file where the tokens are kept on disk by default."""
+    return default_cache_dir() / "tokens.json"
+
+
+class TokenCache:
+    """A thread-safe cache of bearer tokens keyed by registry and scope.
+
+    Parameters
+    ----------
+    path
+        Keep the tokens in this file too, so that other runs can reuse them. The file
+        is only readable and writable by the current user. The tokens are only kept
+        in memory if it is None.
+
+    Examples
+    --------
+    >>> tokens = TokenCache()
+    >>> tokens.set("docker.io", "repository:library/alpine:pull", "eyJ...", 300)
+    >>> tokens.get("docker.io", "repository:library/alpine:pull")
+    'eyJ...'
+
+    """
+
+    def __init__(self, path: str | Path | None = None):
+        self.path: Path | None = None
+        self._tokens: dict[tuple[str, str], Token] = {}
+        self._lock = threading.Lock()
+        if path is not None:
+            self.open(path)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._tokens)
+
+    def open(self, path: str | Path | None = None) -> None:
+        """Keep the tokens in a file too, loading the tokens that are stored in it.
+
+        Parameters
+        ----------
+        path
+            The file. ``default_token_path`` by default.
+        """
+        path = Path(path) if path else default_token_path()
+        with self._lock:
+            self.path = path
+            self._tokens.update(self._load())
+
+    def _load(self) -> dict[tuple[str, str], Token]:
+        assert self.path is not None
+        try:
+            entries = json.loads(self.path.read_text(encoding="utf-8"))["tokens"]
+            tokens = {
+                (entry["registry"], entry["scope"]): Token(
+                    entry["token"], float(entry["expires_at"])
+                )
+                for entry in entries
+            }
+        except (OSError, ValueError, KeyError, TypeError):
+            return {}
+        now = time.time()
+        return {key: token for key, token in tokens.items() if token.expires_at > now}
+
+    def _save(self) -> None:
+        """Write the unexpired tokens, merged with those of other runs, to the file."""
+        assert self.path is not None
+        tokens = {**self._load(), **self._tokens}
+        entries = [
+            {"registry": registry, "scope": scope, **token._asdict()}
+            for (registry, scope), token in tokens.items()
+            if token.expires_at > time.time()
+        ]
+        self.path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(
+            dir=self.path.parent, prefix=f".{self.path.name}.", suffix=".tmp"
+        )
+        try:
+            # mkstemp creates the file readable and writable by its owner only
+            with os.fdopen(fd, "w", encoding="utf-8") as temp_file:
+                json.dump({"tokens": entries}, temp_file)
+            os.replace(temp_path, self.path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    def get(self, registry: str, scope: str) -> str | None:
+        """Get a token that is valid for at least another ``EXPIRY_MARGIN`` seconds."""
+        with self._lock:
+            token = self._tokens.get((registry, scope))
+        if token is None or token.expires_at - EXPIRY_MARGIN <= time.time():
+            return None
+        return token.token
+
+    def set(
+        self,
+        registry: str,
+        scope: str,
+        token: str,
+        expires_in: float | None = None,
+        issued_at: float | None = None,
+    ) -> None:
+        """Store a token.
+
+        Parameters
+        ----------
+        registry
+            The registry that the token is for.
+        scope
+            The scope of the token, e.g., repository:library/alpine:pull.
+        token
+            The token itself.
+        expires_in
+            The lifetime of the token in seconds. ``DEFAULT_EXPIRES_IN`` by default.
+        issued_at
+            When the token was issued, in seconds since the epoch. Now by default.
+        """
+        expires_at = (issued_at or time.time()) + (expires_in or DEFAULT_EXPIRES_IN)
+        with self._lock:
+            self._tokens[(registry, scope)] = Token(token, expires_at)
+            if self.path is not None:
+                try:
+                    self._save()
+                except OSError:
+                    pass
+
+    def clear(self) -> None:
+        """Forget every token, including those kept on disk."""
+        with self._lock:
+            self._tokens.clear()
+            if self.path is not None:
+                self.path.unlink(missing_ok=True)
+
+
+def docker_config_path() -> Path:
+    """Get the path of the Docker configuration, which ``docker login`` writes to.
+
+    This is ``$DOCKER_CONFIG/config.json``, or ``~/.docker/config.json`` if
+    DOCKER_CONFIG is not set.
+    """
+    config_dir = os.environ.get("DOCKER_CONFIG") or Path.home() / ".docker"
+    return Path(config_dir) / "config.json"
+
+
+def docker_credentials(registry: str, path: str | Path | None = None) -> str | None:
+    """Get the credentials of a registry from the Docker configuration.
+
+    Only credentials that are stored in the configuration itself are found, not
+    those that are kept by a credential helper.
+
+    Parameters
+    ----------
+    registry
+        The registry, e.g., ghcr.io.
+    path
+        The path of the Docker configuration. ``docker_config_path`` by default.
+
+    Returns
+    -------
+        The value of a Basic Authorization header, or None if there are no
+        credentials for the registry.
+    """
+    try:
+        config = json.loads(Path(path or docker_config_path()).read_text("utf-8"))
+        auths = config.get("auths") or {}
+    except (OSError, ValueError, AttributeError):
+        return None
+    keys = [DOCKER_HUB_AUTH_KEY] if registry == "docker.io" else []
+    keys += [registry, f"https://{registry}", f"https://{registry}/v1/"]
+    for key in keys:
+        entry = auths.get(key)
+        if not isinstance(entry, dict):
+            continue
+        if entry.get("auth"):
+            return f"Basic {entry['auth']}"
+        if entry.get("username") and entry.get("password"):
+            pair = f"{entry['username']}:{entry['password']}".encode()
+            return f"Basic {base64.b64encode(pair).decode()}"
+    return None
+
+
+TOKENS = TokenCache()
+"""The tokens shared by every lookup of this process."""
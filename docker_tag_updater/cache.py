@@ -0,0 +1,260 @@
+"""Persistent metadata cache.
+
+This module defines an on-disk cache for the results of ``skopeo.image_version``, so
+that repeated lookups of the same image within the cache lifetime do not reach the
+registry at all. The cache is an SQLite database, which can be shared safely by
+several processes at the same time.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import NamedTuple
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS metadata (
+    registry TEXT NOT NULL,
+    image TEXT NOT NULL,
+    tag TEXT NOT NULL,
+    version TEXT,
+    digest TEXT,
+    error_type TEXT,
+    error TEXT,
+    stored_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    PRIMARY KEY (registry, image, tag)
+);
+CREATE INDEX IF NOT EXISTS metadata_accessed_at ON metadata (accessed_at);
+"""
+
+_ERROR_TYPES: dict[str, type[Exception]] = {
+    "KeyError": KeyError,
+    "ValueError": ValueError,
+}
+
+
+def default_cache_dir() -> Path:
+    """Get the directory where docker-tag-updater keeps its caches.
+
+    This is ``$XDG_CACHE_HOME/docker-tag-updater``, or
+    ``~/.cache/docker-tag-updater`` if XDG_CACHE_HOME is not set.
+    """
+    cache_home = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(cache_home) / "docker-tag-updater"
+
+
+class CacheEntry(NamedTuple):
+    """A cached lookup, which is either a version or a failure."""
+
+    version: str | None
+    """The version label of the image."""
+    digest: str | None
+    """The manifest digest of the image, if it is known."""
+    error_type: str | None
+    """The name of the exception raised by the failed lookup."""
+    error: str | None
+    """The message of the exception raised by the failed lookup."""
+    stored_at: float
+    """When the entry was stored, in seconds since the epoch."""
+
+    def result(self) -> str:
+        """Get the cached version, or raise the cached error.
+
+        Raises
+        ------
+        KeyError
+            If the version label of the image was not set.
+        ValueError
+            If the image could not be inspected.
+        """
+        if self.error_type is not None:
+            raise _ERROR_TYPES.get(self.error_type, ValueError)(self.error)
+        assert self.version is not None
+        return self.version
+
+
+class MetadataCache:
+    """A size-bounded, least-recently-used cache of image versions.
+
+    Parameters
+    ----------
+    path
+        The path of the SQLite database. Defaults to metadata.sqlite3 in
+        ``default_cache_dir()``.
+    ttl
+        The number of seconds that a version stays valid.
+    error_ttl
+        The number of seconds that a failed lookup stays valid. This is usually
+        shorter than ttl. Throttled and timed out lookups are never cached, see
+        ``skopeo.image_version``.
+    max_entries
+        The number of entries kept. The least recently used entries are evicted
+        beyond this.
+
+    Examples
+    --------
+    >>> cache = MetadataCache(ttl=3600)
+    >>> skopeo.image_version("traefik", cache=cache)
+    v2.11.0
+    >>> cache.get("docker.io", "traefik", "latest").version
+    'v2.11.0'
+
+    """
+
+    def __init__(
+        self,
+        path: str | Path | None = None,
+        ttl: float = 3600,
+        error_ttl: float = 300,
+        max_entries: int = 10000,
+    ):
+        if path is None:
+            path = default_cache_dir() / "metadata.sqlite3"
+        self.path = Path(path)
+        self.ttl = ttl
+        self.error_ttl = error_ttl
+        self.max_entries = max_entries
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        """Close the database."""
+        with self._lock:
+            self._db.close()
+
+    def __enter__(self) -> "MetadataCache":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM metadata").fetchone()[0]
+
+    def get(self, registry: str, image: str, tag: str) -> CacheEntry | None:
+        """Get a fresh entry and mark it as recently used.
+
+        Parameters
+        ----------
+        registry
+            The registry hosting the container image.
+        image
+            The name of the container image.
+        tag
+            The tag of the container image.
+
+        Returns
+        -------
+            The entry, or None if there is no entry or it has expired.
+        """
+        now = time.time()
+        with self._lock, self._db:
+            row = self._db.execute(
+                "SELECT version, digest, error_type, error, stored_at FROM metadata"
+                " WHERE registry = ? AND image = ? AND tag = ?",
+                (registry, image, tag),
+            ).fetchone()
+            if row is None:
+                return None
+            entry = CacheEntry(*row)
+            ttl = self.ttl if entry.error_type is None else self.error_ttl
+            if now - entry.stored_at >= ttl:
+                return None
+            self._db.execute(
+                "UPDATE metadata SET accessed_at = ?"
+                " WHERE registry = ? AND image = ? AND tag = ?",
+                (now, registry, image, tag),
+            )
+        return entry
+
+    def stored_at(self, registry: str, image: str, tag: str) -> float | None:
+        """Get when an image was last looked up, even if its entry has expired.
+
+        Returns
+        -------
+            The time of the lookup in seconds since the epoch, or None if there is
+            no entry.
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT stored_at FROM metadata"
+                " WHERE registry = ? AND image = ? AND tag = ?",
+                (registry, image, tag),
+            ).fetchone()
+        return None if row is None else row[0]
+
+    def _store(
+        self,
+        registry: str,
+        image: str,
+        tag: str,
+        version: str | None = None,
+        digest: str | None = None,
+        error: Exception | None = None,
+    ) -> None:
+        now = time.time()
+        error_type = type(error).__name__ if error is not None else None
+        # KeyError quotes its message when it is turned into a string
+        message = error.args[0] if error is not None and error.args else None
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO metadata VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (registry, image, tag, version, digest, error_type, message, now, now),
+            )
+            self._db.execute(
+                "DELETE FROM metadata WHERE rowid IN (SELECT rowid FROM metadata"
+                " ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def set_version(
+        self,
+        registry: str,
+        image: str,
+        tag: str,
+        version: str,
+        digest: str | None = None,
+    ) -> None:
+        """Store the version label of an image.
+
+        Parameters
+        ----------
+        registry
+            The registry hosting the container image.
+        image
+            The name of the container image.
+        tag
+            The tag of the container image.
+        version
+            The version label of the image.
+        digest
+            The manifest digest of the image, if it is known.
+        """
+        self._store(registry, image, tag, version=version, digest=digest)
+
+    def set_error(self, registry: str, image: str, tag: str, error: Exception) -> None:
+        """Store a failed lookup of an image.
+
+        Parameters
+        ----------
+        registry
+            The registry hosting the container image.
+        image
+            The name of the container image.
+        tag
+            The tag of the container image.
+        error
+            The exception raised by the lookup.
+        """
+        self._store(registry, image, tag, error=error)
+
+    def clear(self) -> None:
+        """Remove every entry."""
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM metadata")
@@ -0,0 +1,827 @@
+"""Compose file updater.
+
+This module defines the engine behind compose-updater. A Compose/Stack file is read
+once, every ``image:`` reference in it is located with PyYAML, each unique image is
+looked up once, and all of the new version tags are written back in a single atomic
+write that leaves the rest of the file untouched.
+
+A whole directory tree can be scanned the same way: the images of every Compose/Stack
+file in it are looked up together, once per image, and the files are rewritten in
+parallel. With a ``scanindex.ScanIndex``, the files that are unchanged since the
+last scan are not read again unless they are updated.
+"""
+
+import difflib
+import fnmatch
+import functools
+import hashlib
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Iterator, Mapping, NamedTuple
+
+import yaml
+
+from . import auth, parser, registry, replay, skopeo
+from .policy import UpdatePolicy, parse_policies, policy_specs
+from .cache import MetadataCache
+from .scanindex import ScanIndex, ScannedFile
+
+
+COMPOSE_FILE_PATTERNS: tuple[str, ...] = (
+    "*compose*.yaml",
+    "*compose*.yml",
+    "*stack*.yaml",
+    "*stack*.yml",
+)
+"""The patterns of the file names that are scanned as Compose/Stack files."""
+
+SKIPPED_DIRECTORIES = frozenset({"node_modules", "venv", "__pycache__"})
+"""The directories that are not scanned, besides hidden ones."""
+
+_RACY_NS = 2_000_000_000
+_PROPERTY = re.compile(r"[&!]\S*\s*")
+
+
+class ImageReference(NamedTuple):
+    """The location of an ``image:`` value in a Compose file."""
+
+    image: str
+    """The image string, e.g., docker.io/alpine:3.19.1."""
+    line: int
+    """The line number of the value, starting from 1."""
+    start: int
+    """The offset of the first character of the value in the file."""
+    end: int
+    """The offset just past the last character of the value in the file."""
+
+
+def _value_start(text: str, index: int) -> int:
+    """Skip the anchor and tag of a node, e.g., &img, to the offset of its value."""
+    while match := _PROPERTY.match(text, index):
+        index = match.end()
+    return index
+
+
+def _walk(node: yaml.Node, text: str) -> Iterator[ImageReference]:
+    if isinstance(node, yaml.MappingNode):
+        for key, value in node.value:
+            if (
+                isinstance(key, yaml.ScalarNode)
+                and key.value == "image"
+                and isinstance(value, yaml.ScalarNode)
+            ):
+                mark = value.start_mark
+                start, end = _value_start(text, mark.index), value.end_mark.index
+                line = mark.line + text.count("\n", mark.index, start)
+                if value.style in ("'", '"'):
+                    start, end = start + 1, end - 1
+                yield ImageReference(value.value, line + 1, start, end)
+            else:
+                yield from _walk(value, text)
+    elif isinstance(node, yaml.SequenceNode):
+        for item in node.value:
+            yield from _walk(item, text)
+
+
+def find_images(text: str) -> list[ImageReference]:
+    """Find every ``image:`` value in a Compose file.
+
+    A value that is reused through an alias or a merge key, e.g., ``<<: *common``,
+    is only found where it is written.
+
+    Parameters
+    ----------
+    text
+        The contents of the Compose file. Every YAML document in it is searched.
+
+    Returns
+    -------
+        The image references in the order they appear in the file.
+
+    Examples
+    --------
+    >>> find_images("services:\\n  db:\\n    image: postgres:16.1.0\\n")
+    [ImageReference(image='postgres:16.1.0', line=3, start=29, end=44)]
+
+    """
+    # An alias is the node of its anchor, so it is found at the same offsets again
+    references = {
+        (reference.start, reference.end): reference
+        for document in yaml.compose_all(text)
+        if document is not None
+        for reference in _walk(document, text)
+    }
+    return sorted(references.values(), key=lambda reference: reference.start)
+
+
+def retag(image_string: str, tag: str) -> str:
+    """Replace the tag of an image string.
+
+    Examples
+    --------
+    >>> retag("lscr.io/linuxserver/mariadb:10.11.5", "10.11.6")
+    'lscr.io/linuxserver/mariadb:10.11.6'
+
+    """
+    return f"{image_string.split(':', 1)[0]}:{tag}"
+
+
+def resolve(
+    images: list[str],
+    base_tag: str = "latest",
+    rule: str = "default",
+    inspector: Callable = registry.inspect,
+    cache: MetadataCache | None = None,
+    verbose: bool = False,
+    lister: Callable | None = None,
+    policies: Mapping[str, UpdatePolicy] | None = None,
+    deadline: float | None = None,
+    priorities: Mapping[str, int] | None = None,
+    matcher: Callable | None = None,
+) -> tuple[dict[str, str], dict[str, BaseException]]:
+    """Find the newest version of every image.
+
+    Each unique registry and image is looked up once. All of its references are
+    moved to the newest of their current tags and the version of the base tag, so
+    that no reference is ever downgraded.
+
+    With policies, every reference is instead moved to the newest version that the
+    policy of its image allows from its own tag, so that references pinned to
+    different major versions of an image stay on them.
+
+    Parameters
+    ----------
+    images
+        The image strings, possibly with duplicates.
+    base_tag
+        The name of the base tag to refer against.
+    rule
+        Name of the ``RegexRules`` rule to parse the version tags.
+    inspector
+        The inspection method.
+    cache
+        A cache of previous lookups.
+    verbose
+        Specify the verbosity of the inspector function.
+    lister
+        The method that lists the tags, if the newest versions are to be found
+        among the tags of the images instead of their version labels.
+    policies
+        The update policies by image name or pattern.
+    deadline
+        The number of seconds that the lookups may take in total. The images that
+        are not looked up by then are left as they are, with a
+        ``skopeo.DeadlineExceeded`` error.
+    priorities
+        The priorities of the lookups by image name or pattern, see
+        ``skopeo.image_versions``.
+    matcher
+        The method that finds the version of an image without a version label, see
+        ``skopeo.image_versions``.
+
+    Returns
+    -------
+        The new image string of every image string that needs to be updated, and
+        the errors of the images that could not be resolved.
+    """
+    results = skopeo.image_versions(
+        list(dict.fromkeys(images)),
+        base_tag=base_tag,
+        inspector=inspector,
+        verbose=verbose,
+        cache=cache,
+        lister=lister,
+        rule=rule,
+        policies=policies,
+        deadline=deadline,
+        priorities=priorities,
+        matcher=matcher,
+    )
+    # With policies, every image string is resolved on its own
+    group = "image" if policies is not None else "name"
+    newest: dict[tuple[str, str], str] = {}
+    errors: dict[str, BaseException] = {}
+    for result in results:
+        key = (result.registry, getattr(result, group))
+        if result.version is None:
+            errors[result.image] = result.error or ValueError(result.image)
+            continue
+        try:
+            newest[key] = skopeo.compare_versions(
+                newest.get(key, result.version), result.tag, rule=rule
+            )
+        except ValueError as exc:
+            errors[result.image] = exc
+    updates = {}
+    for result in results:
+        key = (result.registry, getattr(result, group))
+        if result.image in errors or key not in newest:
+            continue
+        if result.tag != newest[key]:
+            updates[result.image] = retag(result.image, newest[key])
+    return updates, errors
+
+
+def rewrite(
+    text: str, references: list[ImageReference], updates: dict[str, str]
+) -> str:
+    """Replace image references in the text, leaving everything else as-is.
+
+    Parameters
+    ----------
+    text
+        The contents of the Compose file.
+    references
+        The image references found in the text.
+    updates
+        The new image string of every image string that needs to be updated.
+
+    Returns
+    -------
+        The updated contents of the Compose file.
+    """
+    chunks = []
+    position = 0
+    for reference in sorted(references, key=lambda reference: reference.start):
+        if reference.image not in updates:
+            continue
+        chunks.append(text[position : reference.start])
+        chunks.append(updates[reference.image])
+        position = reference.end
+    chunks.append(text[position:])
+    return "".join(chunks)
+
+
+def read_compose_file(path: str | Path) -> str:
+    """Read a Compose file as it is, keeping its line endings, e.g., CRLF."""
+    with open(path, encoding="utf-8", newline="") as compose_file:
+        return compose_file.read()
+
+
+def write_atomic(path: str | Path, text: str) -> None:
+    """Write a file by atomically replacing it, keeping its permissions.
+
+    The line endings of the text are written as they are.
+    """
+    path = Path(path)
+    fd, temp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as temp_file:
+            temp_file.write(text)
+        if path.exists():
+            os.chmod(temp_path, path.stat().st_mode)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+class FileUpdate(NamedTuple):
+    """The changes to a single Compose file of a scan."""
+
+    path: Path
+    """The path of the Compose file."""
+    changes: list[tuple[ImageReference, str]]
+    """Every image reference that is updated, with its new image string."""
+    diff: str
+    """The unified diff of the file, with paths relative to the scanned directory."""
+
+
+def discover(
+    root: str | Path, patterns: tuple[str, ...] = COMPOSE_FILE_PATTERNS
+) -> list[Path]:
+    """Find the Compose/Stack files in a directory tree.
+
+    Hidden directories and those in ``SKIPPED_DIRECTORIES`` are not searched.
+
+    Parameters
+    ----------
+    root
+        The directory to search.
+    patterns
+        The shell-style patterns that the file names are matched against.
+
+    Returns
+    -------
+        The paths of the files, sorted.
+    """
+    paths: list[Path] = []
+    for directory, directories, files in os.walk(root):
+        directories[:] = sorted(
+            name
+            for name in directories
+            if not name.startswith(".") and name not in SKIPPED_DIRECTORIES
+        )
+        paths.extend(
+            Path(directory, name)
+            for name in sorted(files)
+            if any(fnmatch.fnmatch(name, pattern) for pattern in patterns)
+        )
+    return paths
+
+
+def _scan_file(
+    path: Path, scan_index: ScanIndex | None = None
+) -> tuple[str | None, list[ImageReference]]:
+    """Read a Compose file and find its images, unless it is indexed as unchanged.
+
+    Returns
+    -------
+        The contents of the file, or None if it was not read, and its image
+        references.
+    """
+    if scan_index is None:
+        text = read_compose_file(path)
+        return text, find_images(text)
+    key = str(path.resolve())
+    stat = path.stat()
+    scanned = scan_index.get(key)
+    if scanned is not None and (scanned.size, scanned.mtime_ns) == (
+        stat.st_size,
+        stat.st_mtime_ns,
+    ):
+        return None, [ImageReference(*fields) for fields in scanned.references]
+    text = read_compose_file(path)
+    sha256 = hashlib.sha256(text.encode()).hexdigest()
+    if scanned is not None and scanned.sha256 == sha256:
+        references = [ImageReference(*fields) for fields in scanned.references]
+    else:
+        references = find_images(text)
+    # A file that is modified again within the resolution of its modification time
+    # keeps it, so the contents of a recently modified file are checked next time
+    mtime_ns = stat.st_mtime_ns
+    if time.time_ns() - mtime_ns < _RACY_NS:
+        mtime_ns = -1
+    scan_index.put(key, ScannedFile(stat.st_size, mtime_ns, sha256, references))
+    return text, references
+
+
+def scan(
+    root: str | Path,
+    image_name: str | None = None,
+    base_tag: str = "latest",
+    rule: str = "default",
+    inspector: Callable = registry.inspect,
+    cache: MetadataCache | None = None,
+    verbose: bool = False,
+    dry_run: bool = False,
+    jobs: int = 8,
+    lister: Callable | None = None,
+    policies: Mapping[str, UpdatePolicy] | None = None,
+    deadline: float | None = None,
+    priorities: Mapping[str, int] | None = None,
+    matcher: Callable | None = None,
+    scan_index: ScanIndex | None = None,
+) -> tuple[list[FileUpdate], dict[str, BaseException]]:
+    """Update the image version tags of every Compose file in a directory tree.
+
+    The image references of every file are collected first, so that each unique
+    registry and image is looked up once for the whole tree, and every reference to
+    it is moved to the same newest version. The files are then rewritten in
+    parallel.
+
+    Parameters
+    ----------
+    root
+        The directory to scan, see ``discover``.
+    image_name
+        Only update the references that contain this image name if given.
+    base_tag
+        The name of the base tag to refer against.
+    rule
+        Name of the ``RegexRules`` rule to parse the version tags.
+    inspector
+        The inspection method.
+    cache
+        A cache of previous lookups.
+    verbose
+        Specify the verbosity of the inspector function.
+    dry_run
+        Only compute the changes and their diffs, without writing any file.
+    jobs
+        The number of files that are rewritten at the same time.
+    lister
+        The method that lists the tags, see ``resolve``.
+    policies
+        The update policies by image name or pattern, see ``resolve``.
+    deadline
+        The number of seconds that the lookups may take in total, see ``resolve``.
+    priorities
+        The priorities of the lookups by image name or pattern, see ``resolve``.
+    matcher
+        The method that finds the version of an image without a version label, see
+        ``resolve``.
+    scan_index
+        The index of the files that have been scanned before. The files that are
+        unchanged since are neither read nor parsed unless they are updated.
+
+    Returns
+    -------
+        The changes to every file that is updated, in the order they were found, and
+        the errors of the images that could not be resolved and of the files that
+        could not be read, by image string and relative path respectively.
+
+    Raises
+    ------
+    LookupError
+        If image_name is not referenced in any Compose file.
+    """
+    root = Path(root)
+    texts: dict[Path, str] = {}
+    index: dict[Path, list[ImageReference]] = {}
+    errors: dict[str, BaseException] = {}
+
+    def selected(references: list[ImageReference]) -> list[ImageReference]:
+        return [
+            reference
+            for reference in references
+            if image_name is None or image_name in reference.image
+        ]
+
+    paths = discover(root)
+    for path in paths:
+        try:
+            text, references = _scan_file(path, scan_index)
+        except (OSError, UnicodeDecodeError, yaml.YAMLError) as exc:
+            errors[path.relative_to(root).as_posix()] = exc
+            continue
+        references = selected(references)
+        if references:
+            index[path] = references
+            if text is not None:
+                texts[path] = text
+    if scan_index is not None:
+        scan_index.prune(str(root.resolve()), [str(path.resolve()) for path in paths])
+    if image_name is not None and not index:
+        raise LookupError(f"{image_name} cannot be found in {root}")
+
+    updates, image_errors = resolve(
+        [reference.image for references in index.values() for reference in references],
+        base_tag=base_tag,
+        rule=rule,
+        inspector=inspector,
+        cache=cache,
+        verbose=verbose,
+        lister=lister,
+        policies=policies,
+        deadline=deadline,
+        priorities=priorities,
+        matcher=matcher,
+    )
+    errors.update(image_errors)
+
+    def update(path: Path) -> FileUpdate | None:
+        if not any(reference.image in updates for reference in index[path]):
+            return None
+        name = path.relative_to(root).as_posix()
+        original, references = texts.get(path), index[path]
+        if original is None:
+            # The file was not read since it was indexed, and may have changed since
+            try:
+                original = read_compose_file(path)
+                references = selected(find_images(original))
+            except (OSError, UnicodeDecodeError, yaml.YAMLError) as exc:
+                errors[name] = exc
+                return None
+        changes = [
+            (reference, updates[reference.image])
+            for reference in references
+            if reference.image in updates
+        ]
+        if not changes:
+            return None
+        text = rewrite(original, references, updates)
+        diff = difflib.unified_diff(
+            original.splitlines(keepends=True),
+            text.splitlines(keepends=True),
+            f"a/{name}",
+            f"b/{name}",
+        )
+        if not dry_run:
+            write_atomic(path, text)
+        return FileUpdate(path, changes, "".join(diff))
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        files = list(executor.map(update, index))
+    return [file for file in files if file is not None], errors
+
+
+def scan_summary(
+    root: str | Path, files: list[FileUpdate], errors: dict[str, BaseException]
+) -> dict[str, Any]:
+    """Summarise a scan as JSON-serialisable data.
+
+    Examples
+    --------
+    >>> scan_summary(".", *scan("."))
+    {'files': [{'path': 'compose.yaml', 'updates': [{'line': 3, 'image':
+    'postgres:16.1.0', 'new_image': 'postgres:16.2.0'}]}], 'errors': {}}
+
+    """
+    return {
+        "files": [
+            {
+                "path": file.path.relative_to(root).as_posix(),
+                "updates": [
+                    {"line": reference.line, "image": reference.image, "new_image": new}
+                    for reference, new in file.changes
+                ],
+            }
+            for file in files
+        ],
+        "errors": {key: str(error) for key, error in errors.items()},
+    }
+
+
+def write_summary(
+    path: str,
+    root: str | Path,
+    files: list[FileUpdate],
+    errors: dict[str, BaseException],
+) -> None:
+    """Write the ``scan_summary`` of a scan as JSON to a file, or to STDOUT if -."""
+    summary = json.dumps(scan_summary(root, files, errors), indent=2)
+    if path == "-":
+        print(summary)
+    else:
+        with open(path, "w", encoding="utf-8") as summary_file:
+            summary_file.write(summary + "\n")
+
+
+def git_outputs(updated: dict[str, str]) -> dict[str, str]:
+    """Prepare the variables of a Git commit for the updated images.
+
+    Parameters
+    ----------
+    updated
+        The new image string of every image string that was updated.
+
+    Returns
+    -------
+        The commit-message, commit-description and git-branch. They are empty if
+        nothing was updated.
+
+    Examples
+    --------
+    >>> git_outputs({"postgres:16.1.0": "postgres:16.2.0"})
+    {'commit-message': 'chore: bump postgres from 16.1.0 to 16.2.0',
+    'commit-description': '', 'git-branch': 'bump/postgres-16.2.0'}
+
+    """
+    outputs = {"commit-message": "", "commit-description": "", "git-branch": ""}
+    # An image may be bumped to several versions, e.g., one for each major version
+    bumps: dict[tuple[str, str], list[str]] = {}
+    for old_image, new_image in updated.items():
+        name = skopeo.parse(old_image)[1].rsplit("/", 1)[-1]
+        bumps.setdefault((name, new_image.split(":", 1)[-1]), []).append(
+            old_image.split(":", 1)[-1]
+        )
+
+    if len(bumps) == 1:
+        (((name, new_version), old_versions),) = bumps.items()
+        outputs["git-branch"] = f"bump/{name}-{new_version}"
+        if len(old_versions) == 1:
+            outputs["commit-message"] = (
+                f"chore: bump {name} from {old_versions[0]} to {new_version}"
+            )
+        else:
+            outputs["commit-message"] = f"chore: bump {name} to {new_version}"
+            outputs["commit-description"] = (
+                f"The following versions of {name} were updated:"
+                + "".join(f"\\n- {old_version}" for old_version in old_versions)
+            )
+    elif bumps:
+        names = sorted({name for name, _ in bumps})
+        if len(names) == 1:
+            outputs["commit-message"] = f"chore: bump {names[0]} to " + ", ".join(
+                new_version for _, new_version in sorted(bumps)
+            )
+        else:
+            outputs["commit-message"] = f"chore: bump {len(names)} images"
+        outputs["commit-description"] = "The following images were updated:" + "".join(
+            f"\\n- {name} to {new_version}" for name, new_version in sorted(bumps)
+        )
+        outputs["git-branch"] = "bump/" + "-".join(
+            f"{name}-{new_version}" for name, new_version in sorted(bumps)
+        )
+    return outputs
+
+
+def update_file(
+    path: str | Path,
+    image_name: str | None = None,
+    base_tag: str = "latest",
+    rule: str = "default",
+    inspector: Callable = registry.inspect,
+    cache: MetadataCache | None = None,
+    verbose: bool = False,
+    lister: Callable | None = None,
+    policies: Mapping[str, UpdatePolicy] | None = None,
+    deadline: float | None = None,
+    priorities: Mapping[str, int] | None = None,
+    matcher: Callable | None = None,
+) -> tuple[dict[str, str], dict[str, BaseException]]:
+    """Update the image version tags of a Compose file in place.
+
+    Parameters
+    ----------
+    path
+        The path of the Compose file.
+    image_name
+        Only update the references that contain this image name if given, like
+        ``grep "image:.*<image_name>"`` would select them.
+    base_tag
+        The name of the base tag to refer against.
+    rule
+        Name of the ``RegexRules`` rule to parse the version tags.
+    inspector
+        The inspection method.
+    cache
+        A cache of previous lookups.
+    verbose
+        Specify the verbosity of the inspector function.
+    lister
+        The method that lists the tags, see ``resolve``.
+    policies
+        The update policies by image name or pattern, see ``resolve``.
+    deadline
+        The number of seconds that the lookups may take in total, see ``resolve``.
+    priorities
+        The priorities of the lookups by image name or pattern, see ``resolve``.
+    matcher
+        The method that finds the version of an image without a version label, see
+        ``resolve``.
+
+    Returns
+    -------
+        The new image string of every image string that was updated, and the errors
+        of the images that could not be resolved.
+
+    Raises
+    ------
+    LookupError
+        If image_name is not referenced in the Compose file.
+    """
+    path = Path(path)
+    text = read_compose_file(path)
+    references = [
+        reference
+        for reference in find_images(text)
+        if image_name is None or image_name in reference.image
+    ]
+    if image_name is not None and not references:
+        raise LookupError(f"{image_name} cannot be found in {path}")
+
+    updates, errors = resolve(
+        [reference.image for reference in references],
+        base_tag=base_tag,
+        rule=rule,
+        inspector=inspector,
+        cache=cache,
+        verbose=verbose,
+        lister=lister,
+        policies=policies,
+        deadline=deadline,
+        priorities=priorities,
+        matcher=matcher,
+    )
+    for old_image, new_image in updates.items():
+        if verbose:
+            print(f"Updating {old_image} with {new_image}...")
+    if updates:
+        write_atomic(path, rewrite(text, references, updates))
+    return updates, errors
+
+
+def _backends(
+    args,
+) -> tuple[Callable, Callable | None, Callable | None, replay.ResponseArchive | None]:
+    """Get the inspector, tag lister, matcher and response archive of the arguments."""
+    inspector = registry.INSPECTORS[args.backend]
+    digester = registry.DIGESTERS[args.backend]
+    archive = None
+    if not (args.record or args.replay):
+        lister = registry.TAG_STREAMS[args.backend]
+    else:
+        # The recorded tag lists are kept whole
+        lister = registry.LISTERS[args.backend]
+        archive = replay.ResponseArchive(args.replay)
+        if args.record and os.path.exists(args.record):
+            archive.load(args.record)
+        if args.replay:
+            inspector, digester = archive.inspect, archive.digest
+            lister = archive.list_tags
+        else:
+            inspector, lister, digester = (
+                archive.recorder(inspector),
+                archive.list_recorder(lister),
+                archive.digest_recorder(digester),
+            )
+    matcher = None
+    if args.match_digest:
+        matcher = functools.partial(
+            skopeo.matching_version, digester=digester, lister=lister, rule=args.rule
+        )
+    return inspector, lister if args.list_tags else None, matcher, archive
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Run compose-updater.
+
+    The outputs are appended to the file named by GITHUB_OUTPUT if it is set, or
+    printed to STDOUT otherwise. When run as a GitHub Action, the Compose file, or
+    the scanned directory, is looked up in GITHUB_WORKSPACE. A dry run prints the
+    diffs of the files instead of the outputs.
+    """
+    args = parser.cu_parser.parse_args(argv)
+    if args.record and args.replay:
+        parser.cu_parser.error("--record and --replay cannot be used together")
+    metadata_cache = None
+    # Lookups served from the cache would be missing from the recording
+    if args.cache is not None and not args.record:
+        metadata_cache = MetadataCache(args.cache or None)
+    if args.token_cache is not None:
+        auth.TOKENS.open(args.token_cache)
+    if args.platform:
+        registry.default_client().platform = args.platform
+    if args.mirror:
+        registry.default_client().mirror = args.mirror
+    if args.lookup_timeout is not None:
+        registry.default_client().timeout = args.lookup_timeout
+        skopeo.PROCESS_TIMEOUT = args.lookup_timeout
+
+    try:
+        specs = policy_specs(args.policies, args.policy)
+    except (OSError, ValueError) as exc:
+        parser.cu_parser.error(str(exc))
+
+    inspector, lister, matcher, archive = _backends(args)
+    options: dict[str, Any] = {
+        "image_name": args.image,
+        "base_tag": args.tag,
+        "rule": args.rule,
+        "inspector": inspector,
+        "cache": metadata_cache,
+        "verbose": args.verbose,
+        "lister": lister,
+        "policies": None if specs is None else parse_policies(specs),
+        "deadline": args.deadline,
+        "priorities": dict(args.priority or []),
+        "matcher": matcher,
+    }
+    workspace = Path(os.environ.get("GITHUB_WORKSPACE", "."))
+    try:
+        if args.scan is not None:
+            scan_index = None
+            if args.scan_index is not None:
+                scan_index = ScanIndex(args.scan_index or None)
+            files, errors = scan(
+                workspace / args.scan,
+                dry_run=args.dry_run,
+                jobs=args.jobs,
+                scan_index=scan_index,
+                **options,
+            )
+            updated = {
+                reference.image: new_image
+                for file in files
+                for reference, new_image in file.changes
+            }
+        else:
+            updated, errors = update_file(workspace / args.file, **options)
+    except LookupError as exc:
+        print(exc)
+        return 2
+    finally:
+        if archive is not None and args.record:
+            archive.save(args.record)
+    for image, error in errors.items():
+        print(f"{image}: {error}", file=sys.stderr)
+
+    if args.scan is not None:
+        if args.summary:
+            write_summary(args.summary, workspace / args.scan, files, errors)
+        if args.dry_run:
+            sys.stdout.write("".join(file.diff for file in files))
+            return 1 if errors else 0
+
+    lines = "".join(
+        f"{key}={value}\n" for key, value in git_outputs(updated).items()
+    )
+    output_file = os.environ.get("GITHUB_OUTPUT")
+    if output_file:
+        with open(output_file, "a", encoding="utf-8") as output:
+            output.write(lines)
+    else:
+        sys.stdout.write(lines)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,471 @@
+"""Watch daemon.
+
+This module defines a long-running watcher that keeps an inventory of image
+references and re-checks each image on its own schedule, instead of checking
+everything at once from cron. How often an image is checked follows how often it
+actually changes: an image whose version has not changed for a long time is checked
+rarely, an image that changes often is checked often, and every interval is jittered
+so that the checks do not bunch up. A global budget bounds the number of checks that
+run at the same time. The latest results can be read at any time without looking
+anything up.
+
+Start the daemon with::
+
+    python -m docker_tag_updater.daemon --file compose.yaml --output status.json
+"""
+
+import heapq
+import json
+import os
+import random
+import signal
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Iterable, NamedTuple
+
+import yaml
+
+from . import compose, parser, registry, skopeo
+
+if TYPE_CHECKING:
+    from .cache import MetadataCache
+
+
+class WatchStatus(NamedTuple):
+    """The latest known state of a watched image reference."""
+
+    image: str
+    """The image string as it is referenced."""
+    registry: str
+    """The registry hosting the container image."""
+    name: str
+    """The name of the container image."""
+    tag: str
+    """The current tag of the reference."""
+    version: str | None
+    """The version of the base tag, if it has been found."""
+    newest: str | None
+    """The image string with the newest tag, if it has been found."""
+    error: str | None
+    """The reason that the last check failed, if it did."""
+    checked_at: float | None
+    """When the image was last checked, in seconds since the epoch."""
+    changed_at: float | None
+    """When the version of the base tag was last seen to change."""
+    next_check: float
+    """When the image is checked next."""
+
+
+def next_interval(
+    age: float,
+    change_period: float | None,
+    min_interval: float,
+    max_interval: float,
+    freshness: float,
+) -> float:
+    """Get the number of seconds until an image that did not fail is checked again.
+
+    Like the heuristic freshness of HTTP caches, an image is considered fresh for a
+    fraction of the time that its version has stayed the same. If the image has been
+    seen to change before, the typical time between its changes caps that time, so
+    that an image is not checked less often than it usually changes.
+
+    Parameters
+    ----------
+    age
+        The number of seconds since the version of the image was first seen.
+    change_period
+        The typical number of seconds between changes of the version, if any change
+        has been seen.
+    min_interval
+        The shortest interval.
+    max_interval
+        The longest interval.
+    freshness
+        The fraction of the age that the image is considered fresh for.
+
+    Examples
+    --------
+    >>> next_interval(86400, None, 300, 86400, 0.1)
+    8640.0
+
+    >>> next_interval(86400, 3600, 300, 86400, 0.1)
+    360.0
+
+    """
+    basis = age if change_period is None else min(age, change_period)
+    return min(max(freshness * basis, min_interval), max_interval)
+
+
+class _Target:
+    """The schedule and latest result of a single image lookup."""
+
+    __slots__ = (
+        "registry",
+        "name",
+        "images",
+        "version",
+        "error",
+        "failures",
+        "checked_at",
+        "version_since",
+        "changed_at",
+        "change_period",
+        "due",
+        "running",
+    )
+
+    def __init__(self, registry_name: str, name: str, due: float):
+        self.registry = registry_name
+        self.name = name
+        self.images: dict[str, str] = {}
+        self.version: str | None = None
+        self.error: str | None = None
+        self.failures = 0
+        self.checked_at: float | None = None
+        self.version_since: float | None = None
+        self.changed_at: float | None = None
+        self.change_period: float | None = None
+        self.due = due
+        self.running = False
+
+
+class Watcher:
+    """Re-check an inventory of images on staleness-driven schedules.
+
+    Every unique registry and image is looked up with ``skopeo.image_version``, and
+    every image reference is compared against the result with
+    ``skopeo.compare_versions``.
+
+    Parameters
+    ----------
+    base_tag
+        The name of the base tag to refer against.
+    rule
+        Name of the ``RegexRules`` rule to compare the versions with.
+    inspector
+        The inspection method.
+    cache
+        A cache of previous lookups.
+    budget
+        The number of checks that run at the same time.
+    min_interval
+        The shortest number of seconds between the checks of an image.
+    max_interval
+        The longest number of seconds between the checks of an image.
+    freshness
+        The fraction of the time that the version of an image has stayed the same
+        that it is not checked for, see ``next_interval``.
+    jitter
+        The fraction that every interval is randomly lengthened or shortened by.
+    verbose
+        Specify the verbosity of the inspector function.
+    on_check
+        Called with the watcher after every check.
+
+    Examples
+    --------
+    >>> watcher = Watcher(min_interval=600)
+    >>> watcher.watch(["traefik:v2.10.0", "lscr.io/linuxserver/mariadb:10.11.5"])
+    >>> threading.Thread(target=watcher.run).start()
+    >>> watcher.status()
+    [WatchStatus(image='traefik:v2.10.0', ..., newest='traefik:v2.11.0', ...), ...]
+
+    """
+
+    def __init__(
+        self,
+        base_tag: str = "latest",
+        rule: str = "default",
+        inspector: Callable = registry.INSPECTORS["native"],
+        cache: "MetadataCache | None" = None,
+        budget: int = 4,
+        min_interval: float = 300,
+        max_interval: float = 86400,
+        freshness: float = 0.1,
+        jitter: float = 0.1,
+        verbose: bool = False,
+        on_check: Callable[["Watcher"], None] | None = None,
+    ):
+        self.base_tag = base_tag
+        self.rule = rule
+        self.inspector = inspector
+        self.cache = cache
+        self.budget = budget
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.freshness = freshness
+        self.jitter = jitter
+        self.verbose = verbose
+        self.on_check = on_check
+        self._targets: dict[tuple[str, str], _Target] = {}
+        self._queue: list[tuple[float, tuple[str, str]]] = []
+        self._running = 0
+        self._stopped = False
+        self._condition = threading.Condition()
+
+    def watch(self, images: Iterable[str]) -> None:
+        """Replace the inventory of image references.
+
+        Images that are new to the inventory are checked as soon as possible, and
+        images that are no longer in it are forgotten.
+        """
+        now = time.time()
+        wanted: dict[tuple[str, str], dict[str, str]] = {}
+        for image in images:
+            registry_name, name, tag = skopeo.parse(image)
+            wanted.setdefault((registry_name, name), {})[image] = tag
+        with self._condition:
+            for key in set(self._targets) - set(wanted):
+                del self._targets[key]
+            for key, references in wanted.items():
+                target = self._targets.get(key)
+                if target is None:
+                    target = self._targets[key] = _Target(*key, due=now)
+                    heapq.heappush(self._queue, (now, key))
+                target.images = references
+            self._condition.notify_all()
+
+    def status(self) -> list[WatchStatus]:
+        """Get the latest known state of every image reference, without checking."""
+        statuses = []
+        with self._condition:
+            for target in self._targets.values():
+                for image, tag in target.images.items():
+                    statuses.append(self._status(target, image, tag))
+        return statuses
+
+    def _status(self, target: _Target, image: str, tag: str) -> WatchStatus:
+        newest = error = None
+        if target.version is not None:
+            try:
+                newest = compose.retag(
+                    image,
+                    skopeo.compare_versions(tag, target.version, rule=self.rule),
+                )
+            except ValueError as exc:
+                error = str(exc)
+        error = target.error or error
+        return WatchStatus(
+            image,
+            target.registry,
+            target.name,
+            tag,
+            target.version,
+            newest,
+            error,
+            target.checked_at,
+            target.changed_at,
+            target.due,
+        )
+
+    def _reschedule(self, target: _Target, now: float) -> None:
+        if target.failures:
+            interval = min(
+                self.min_interval * 2 ** (target.failures - 1), self.max_interval
+            )
+        else:
+            assert target.version_since is not None
+            interval = next_interval(
+                now - target.version_since,
+                target.change_period,
+                self.min_interval,
+                self.max_interval,
+                self.freshness,
+            )
+        interval *= random.uniform(1 - self.jitter, 1 + self.jitter)
+        target.due = now + interval
+        heapq.heappush(self._queue, (target.due, (target.registry, target.name)))
+
+    def check(self, key: tuple[str, str]) -> None:
+        """Look up an image now and schedule its next check.
+
+        Parameters
+        ----------
+        key
+            The registry and the name of the image.
+        """
+        registry_name, name = key
+        version = error = None
+        try:
+            version = skopeo.image_version(
+                name,
+                registry_name,
+                self.base_tag,
+                inspector=self.inspector,
+                verbose=self.verbose,
+                cache=self.cache,
+            )
+        except (KeyError, ValueError, OSError) as exc:
+            error = str(exc)
+        finally:
+            # Even a check that failed unexpectedly is finished and rescheduled
+            self._finish(key, version, error)
+        if self.on_check is not None:
+            self.on_check(self)
+
+    def _finish(
+        self, key: tuple[str, str], version: str | None, error: str | None
+    ) -> None:
+        """Record the result of a check and schedule the next one."""
+        now = time.time()
+        with self._condition:
+            target = self._targets.get(key)
+            if target is None:
+                return
+            target.checked_at = now
+            target.error = error
+            if version is None:
+                target.failures += 1
+            else:
+                target.failures = 0
+                if target.version_since is None:
+                    target.version_since = now
+                elif version != target.version:
+                    period = now - target.version_since
+                    target.change_period = (
+                        period
+                        if target.change_period is None
+                        else (target.change_period + period) / 2
+                    )
+                    target.version_since = target.changed_at = now
+                target.version = version
+            # The only place that a check is marked as finished, in the same locked
+            # block that queues the next one
+            target.running = False
+            self._reschedule(target, now)
+
+    def _next_due(self, now: float) -> tuple[str, str] | float | None:
+        """Pop the next due image, or get the time until the next one is due."""
+        while self._queue:
+            due, key = self._queue[0]
+            target = self._targets.get(key)
+            if target is None or target.running or target.due != due:
+                # The image is no longer watched, or has been rescheduled
+                heapq.heappop(self._queue)
+                continue
+            if due > now:
+                return due - now
+            heapq.heappop(self._queue)
+            target.running = True
+            return key
+        return None
+
+    def run(self) -> None:
+        """Check the images as they become due until ``stop`` is called."""
+        with ThreadPoolExecutor(max_workers=self.budget) as executor:
+            with self._condition:
+                while not self._stopped:
+                    if self._running >= self.budget:
+                        self._condition.wait()
+                        continue
+                    due = self._next_due(time.time())
+                    if isinstance(due, tuple):
+                        self._running += 1
+                        executor.submit(self._run_check, due)
+                    else:
+                        self._condition.wait(due)
+
+    def _run_check(self, key: tuple[str, str]) -> None:
+        try:
+            self.check(key)
+        finally:
+            with self._condition:
+                self._running -= 1
+                self._condition.notify_all()
+
+    def stop(self) -> None:
+        """Stop ``run`` after the checks that are running have finished."""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+
+
+def read_inventory(
+    images: Iterable[str], input_file: str | None, compose_files: Iterable[str]
+) -> list[str]:
+    """Collect the image references from the command line, a list and Compose files."""
+    inventory = list(images)
+    if input_file:
+        lines = Path(input_file).read_text(encoding="utf-8").splitlines()
+        inventory.extend(
+            line.strip() for line in lines if line.strip() and not line.startswith("#")
+        )
+    for compose_file in compose_files:
+        text = Path(compose_file).read_text(encoding="utf-8")
+        inventory.extend(reference.image for reference in compose.find_images(text))
+    return inventory
+
+
+def write_status(watcher: Watcher, path: str | Path) -> None:
+    """Write the latest known state of every image reference as JSON."""
+    statuses = [status._asdict() for status in watcher.status()]
+    compose.write_atomic(path, json.dumps(statuses, indent=2) + "\n")
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Run the watch daemon from the command line.
+
+    The inventory is read again whenever the image list or a Compose file changes,
+    and the status file is rewritten after every check.
+    """
+    # pylint: disable-next=import-outside-toplevel
+    from .cache import MetadataCache
+
+    args = parser.daemon_parser.parse_args(argv)
+    sources = [path for path in [args.input, *args.file] if path]
+    if not args.image and not sources:
+        parser.daemon_parser.error("at least one image or file is required")
+
+    if args.platform:
+        registry.default_client().platform = args.platform
+    if args.mirror:
+        registry.default_client().mirror = args.mirror
+    output_lock = threading.Lock()
+
+    def on_check(watcher: Watcher) -> None:
+        if args.output:
+            with output_lock:
+                write_status(watcher, args.output)
+
+    watcher = Watcher(
+        base_tag=args.tag,
+        rule=args.rule,
+        inspector=registry.INSPECTORS[args.backend],
+        cache=MetadataCache(args.cache or None) if args.cache is not None else None,
+        budget=args.budget,
+        min_interval=args.min_interval,
+        max_interval=args.max_interval,
+        jitter=args.jitter,
+        verbose=args.verbose,
+        on_check=on_check,
+    )
+    stopped = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: stopped.set())
+
+    # The inventory is always read on the first pass, even without any files
+    mtimes: dict[str, float] | None = None
+    thread = threading.Thread(target=watcher.run)
+    thread.start()
+    try:
+        while not stopped.is_set():
+            try:
+                current = {path: os.stat(path).st_mtime for path in sources}
+                if current != mtimes:
+                    watcher.watch(read_inventory(args.image, args.input, args.file))
+                    mtimes = current
+            except (OSError, ValueError, yaml.YAMLError) as exc:
+                print(f"Cannot read the inventory: {exc}", file=sys.stderr)
+            stopped.wait(args.reload_interval)
+    finally:
+        watcher.stop()
+        thread.join()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
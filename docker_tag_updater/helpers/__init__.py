@@ -1,12 +1,17 @@
 """A set of helpers."""
 
-import re
-from typing import Any
+from functools import lru_cache
+from typing import Any, Iterable
 
+from ..metrics import METRICS
+from .keys import VersionKey
 from .lscr import lscrRules
 from .regex_rules import DefaultRules, RegexRules
 from .datetime import yymmddRules, yyyymmddRules
 
+AUTO_RULE = "auto"
+"""The rule name that makes ``parse_version`` detect the rule by itself."""
+
 rules: RegexRules = \
     DefaultRules + lscrRules + yymmddRules + yyyymmddRules
 """The most general set of rules.
@@ -17,6 +22,8 @@ Supports:
 - Linuxserver semantic versions
 - Datetime-like version strings
 
+Rules are detected in the order lscr, default, yyyymmdd, and yymmdd.
+
 See also
 --------
 regex_rules.DefaultRules : For the aliases for the default set of rules.
@@ -26,6 +33,8 @@ datetime.yyyymmddRules: For the aliases for the datetime-like set of rules.
 
 """
 
+rules.set_detection_order("lscr", "default", "yyyymmdd", "yymmdd")
+
 
 def parse_version(
     version: str, rule_set: RegexRules = rules, rule_name: str = "default"
@@ -39,7 +48,8 @@ def parse_version(
     rules:
         A set of RegexRules.
     rule_name:
-        The name of the rule, or its alias.
+        The name of the rule, or its alias. Use "auto" to detect the rule with
+        ``RegexRules.detect``.
 
     Returns
     -------
@@ -66,13 +76,161 @@ def parse_version(
     regex_rules.RegexRules : For how the rules are generated.
     rules : For the default set of rules that will be used.
     """
+    if not METRICS.enabled:
+        return _parse_version(version, rule_set, rule_name)
+    with METRICS.stage("parse"):
+        return _parse_version(version, rule_set, rule_name)
+
+
+def _parse_version(
+    version: str, rule_set: RegexRules, rule_name: str
+) -> dict[str, Any]:
+    if rule_name == AUTO_RULE:
+        return rule_set.detect(version)[1]
     if not rule_set.has_rule(rule_name):
         raise KeyError(f"{rule_name} is not a valid rule or does not exist as a rule.")
-    rule_rx = rule_set[rule_name]
-    match_pattern = re.fullmatch(rule_rx, version)
+    match_pattern = rule_set.compiled(rule_name).fullmatch(version)
     if match_pattern:
         return match_pattern.groupdict("0")
     if rule_name != "default":
         # Try with the default rule if all else fails
-        return parse_version(version, rule_set, "default")
+        if not rule_set.has_rule("default"):
+            raise KeyError("default is not a valid rule or does not exist as a rule.")
+        rule_name = "default"
+        match_pattern = rule_set.compiled(rule_name).fullmatch(version)
+        if match_pattern:
+            return match_pattern.groupdict("0")
     raise ValueError(f"The {rule_name} rule cannot parse the version string {version}.")
+
+
+VERSION_KEY_CACHE_SIZE = 4096
+"""The number of version keys of the general rules that are memoized."""
+
+
+@lru_cache(maxsize=VERSION_KEY_CACHE_SIZE)
+def _memoized_version_key(version: str, rule_name: str) -> VersionKey:
+    return VersionKey(parse_version(version, rules, rule_name))
+
+
+def version_key(
+    version: str, rule_set: RegexRules = rules, rule_name: str = "default"
+) -> VersionKey:
+    """Parse a version into a sort key.
+
+    The keys of the general ``rules`` are memoized in a bounded LRU cache keyed by
+    the version and the rule name, so comparing the same versions again costs a
+    dictionary lookup instead of a regex match.
+
+    Parameters
+    ----------
+    version
+        A semver string.
+    rule_set
+        A set of RegexRules.
+    rule_name
+        The name of the rule, or its alias.
+
+    Returns
+    -------
+        The sort key of the version.
+
+    Raises
+    ------
+    KeyError
+        If rule_name is not the name or alias of a rule in rule_set.
+    ValueError
+        If the version cannot be parsed.
+
+    See Also
+    --------
+    keys.VersionKey : For how the key is ordered.
+    """
+    if rule_set is rules:
+        return _memoized_version_key(version, rule_name)
+    return VersionKey(parse_version(version, rule_set, rule_name))
+
+
+def sort_versions(
+    versions: Iterable[str], rule_set: RegexRules = rules, rule_name: str = "default"
+) -> list[str]:
+    """Sort the versions that can be parsed, oldest first.
+
+    Each version is parsed once into a precomputed sort key, and the versions that
+    cannot be parsed, e.g., latest, are left out. The memo of ``version_key`` is
+    bypassed so that long tag lists do not evict it.
+
+    Parameters
+    ----------
+    versions
+        The semver strings, e.g., the tags of an image.
+    rule_set
+        A set of RegexRules.
+    rule_name
+        The name of the rule, or its alias.
+
+    Returns
+    -------
+        The sorted semver strings.
+
+    Examples
+    --------
+    >>> sort_versions(["latest", "v1.10.0", "v1.9.2", "v1.10.0-rc1"])
+    ['v1.9.2', 'v1.10.0', 'v1.10.0-rc1']
+
+    """
+    keyed = []
+    for version in versions:
+        try:
+            keyed.append(
+                (VersionKey(parse_version(version, rule_set, rule_name)), version)
+            )
+        except ValueError:
+            continue
+    keyed.sort()
+    return [version for _, version in keyed]
+
+
+def newest_version(
+    versions: Iterable[str], rule_set: RegexRules = rules, rule_name: str = "default"
+) -> str | None:
+    """Find the newest of the versions that can be parsed.
+
+    Versions with the same key are told apart by preferring the highest numeric
+    build, e.g., 1.2.3-ls20 over 1.2.3-ls19 under the lscr rule, and then the
+    shortest version string, e.g., 1.2.3 over 1.2.3-alpine under the default rule.
+
+    Parameters
+    ----------
+    versions
+        The semver strings, e.g., the tags of an image.
+    rule_set
+        A set of RegexRules.
+    rule_name
+        The name of the rule, or its alias.
+
+    Returns
+    -------
+        The newest semver string, or None if none of them can be parsed.
+
+    Examples
+    --------
+    >>> newest_version(["latest", "v1.10.0", "v1.9.2", "v1.10.0-alpine"])
+    'v1.10.0'
+
+    """
+    newest = None
+    newest_rank: tuple = ()
+    for version in versions:
+        try:
+            fields = parse_version(version, rule_set, rule_name)
+        except ValueError:
+            continue
+        build = fields.get("build", "")
+        rank = (
+            VersionKey(fields),
+            int(build) if build.isdigit() else -1,
+            -len(version),
+        )
+        if newest is None or rank > newest_rank:
+            newest, newest_rank = version, rank
+    return newest
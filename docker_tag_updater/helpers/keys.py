@@ -0,0 +1,66 @@
+"""Compact sort keys for parsed versions."""
+
+from __future__ import annotations
+
+from typing import Any
+
+
+class VersionKey(tuple):
+    """An immutable, tuple-backed sort key of a version.
+
+    The key orders versions exactly like python-semver orders
+    ``semver.Version(**fields)``: by major, minor and patch numbers, then a release
+    sorts after all of its prereleases, and prereleases are compared identifier by
+    identifier. The build is ignored. The numbers are converted to integers once,
+    when the key is made, so comparing keys is a plain tuple comparison.
+
+    Parameters
+    ----------
+    fields
+        The fields returned by ``parse_version``.
+
+    Examples
+    --------
+    >>> VersionKey({'major': '1', 'minor': '2', 'patch': '3'})
+    VersionKey(1, 2, 3, 1)
+
+    >>> VersionKey({'major': '1', 'minor': '2', 'patch': '3', 'prerelease': '456'})
+    VersionKey(1, 2, 3, 0, 0, 456)
+
+    """
+
+    __slots__ = ()
+
+    def __new__(cls, fields: dict[str, Any]) -> VersionKey:
+        key: tuple = (int(fields["major"]), int(fields["minor"]), int(fields["patch"]))
+        prerelease = fields.get("prerelease")
+        if not prerelease:
+            return tuple.__new__(cls, key + (1,))
+        key += (0,)
+        for identifier in prerelease.split("."):
+            # Numeric identifiers sort before alphanumeric ones
+            key += (0, int(identifier)) if identifier.isdigit() else (1, identifier)
+        return tuple.__new__(cls, key)
+
+    def __repr__(self) -> str:
+        return f"VersionKey{tuple.__repr__(self)}"
+
+    @property
+    def major(self) -> int:
+        """The major version number."""
+        return self[0]
+
+    @property
+    def minor(self) -> int:
+        """The minor version number."""
+        return self[1]
+
+    @property
+    def patch(self) -> int:
+        """The patch version number."""
+        return self[2]
+
+    @property
+    def is_prerelease(self) -> bool:
+        """Whether the version has a prerelease."""
+        return self[3] == 0
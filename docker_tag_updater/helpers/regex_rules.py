@@ -5,6 +5,14 @@ this subpackage.
 """
 from __future__ import annotations
 
+import re
+
+_NAMED_GROUP = re.compile(r"\(\?P([<=])(\w+)")
+
+# The combined pattern of every rule, and the name and named groups of the rule
+# behind each of its alternatives
+_Detector = tuple[re.Pattern[str], dict[str, tuple[str, list[tuple[str, str]]]]]
+
 
 class RegexRules(dict):
     """An aliased dictionary with defined regex rules for version parsing.
@@ -30,6 +38,9 @@ class RegexRules(dict):
     RegexRules object. Do take note that a new rule is always prioritised over an
     existing rule with the same name, i.e., the operation does not always commute.
 
+    The regex strings are compiled once, when they are first used, and compiled
+    again only after the rules change.
+
     See Also
     --------
     DefaultRules : For an example of a RegexRules object.
@@ -38,12 +49,26 @@ class RegexRules(dict):
     def __init__(self, rules: dict[str, str]):
         dict.__init__(self, **rules)
         self._rule_aliases: dict[str, str] = {}
+        self._detection_order: tuple[str, ...] = ()
+        self._compiled: dict[str, re.Pattern[str]] = {}
+        self._detector: _Detector | None = None
 
     def __getitem__(self, rule):
         return dict.__getitem__(self, self._rule_aliases.get(rule, rule))
 
     def __setitem__(self, rule, value):
-        return dict.__setitem__(self, self._rule_aliases.get(rule, rule), value)
+        dict.__setitem__(self, self._rule_aliases.get(rule, rule), value)
+        self._invalidate()
+
+    def update(self, *args, **kwargs) -> None:  # type: ignore[override]
+        """Redefine the update function to recompile the rules."""
+        dict.update(self, *args, **kwargs)
+        self._invalidate()
+
+    def _invalidate(self) -> None:
+        """Drop the compiled patterns after the rules have changed."""
+        self._compiled = {}
+        self._detector = None
 
     def __repr__(self):
         return f"RegexRules[{' '.join(list(self.keys()))}]"
@@ -67,6 +92,104 @@ class RegexRules(dict):
         """
         return self[rule]
 
+    def compiled(self, rule: str) -> re.Pattern[str]:
+        """Get the compiled regex pattern of a rule.
+
+        Parameters
+        ----------
+        rule
+            The name of the rule or its alias.
+
+        Returns
+        -------
+            The compiled pattern, which is cached until the rules change.
+        """
+        name = self._rule_aliases.get(rule, rule)
+        pattern = self._compiled.get(name)
+        if pattern is None:
+            pattern = self._compiled[name] = re.compile(self[name])
+        return pattern
+
+    def set_detection_order(self, *rules: str) -> None:
+        """Set the order in which ``detect`` tries the rules.
+
+        Rules that are not named are tried after these, in the order they were added.
+
+        Parameters
+        ----------
+        rules
+            The names of the rules or their aliases, most specific first.
+        """
+        self._detection_order = tuple(
+            self._rule_aliases.get(rule, rule) for rule in rules
+        )
+        self._invalidate()
+
+    def _build_detector(self) -> _Detector:
+        """Combine every rule into a single pattern with one alternative per rule.
+
+        The named groups of the i-th rule are renamed to _i_<name>, and the whole
+        alternative is captured as _i so that the matching rule can be told apart.
+        """
+        if self._detector is not None:
+            return self._detector
+        names = [rule for rule in self._detection_order if rule in self.keys()]
+        names += [rule for rule in self.keys() if rule not in names]
+        alternatives = []
+        groups = {}
+        for index, name in enumerate(names):
+            pattern = _NAMED_GROUP.sub(rf"(?P\g<1>_{index}_\g<2>", self[name])
+            alternatives.append(f"(?P<_{index}>{pattern})")
+            fields = self.compiled(name).groupindex
+            groups[f"_{index}"] = (
+                name,
+                [(field, f"_{index}_{field}") for field in fields],
+            )
+        self._detector = (re.compile("|".join(alternatives)), groups)
+        return self._detector
+
+    def detect(self, version: str) -> tuple[str, dict[str, str]]:
+        """Find the rule that parses a version string, and parse it.
+
+        Every rule is evaluated in a single combined match. The rules are tried in
+        the order set by ``set_detection_order``, and otherwise in the order they
+        were added.
+
+        Parameters
+        ----------
+        version
+            A semver string.
+
+        Returns
+        -------
+            The name of the matching rule, and the named groups of the version string
+            where missing groups are "0".
+
+        Raises
+        ------
+        ValueError
+            If no rule can parse the version string.
+
+        Examples
+        --------
+        >>> rules.detect("v1.2.3.456-ls789")
+        ('lscr', {'major': '1', 'minor': '2', 'patch': '3', 'prerelease': '456',
+        'build': '789'})
+
+        >>> rules.detect("20240601")
+        ('yyyymmdd', {'major': '2024', 'minor': '06', 'patch': '01'})
+
+        """
+        detector, groups = self._build_detector()
+        match_pattern = detector.fullmatch(version)
+        if match_pattern is None or match_pattern.lastgroup is None:
+            raise ValueError(f"No rule can parse the version string {version}.")
+        name, fields = groups[match_pattern.lastgroup]
+        values = {field: match_pattern.group(group) for field, group in fields}
+        return name, {
+            field: "0" if value is None else value for field, value in values.items()
+        }
+
     def has_rule(self, rule: str) -> bool:
         """Check if the rule exists or is an alias.
 
@@ -120,6 +243,11 @@ class RegexRules(dict):
         new_rule._rule_aliases.update(self._rule_aliases)
         new_rule.update(other_rules)
         new_rule._rule_aliases.update(other_rules._rule_aliases)
+        new_rule._detection_order = self._detection_order + tuple(
+            rule
+            for rule in other_rules._detection_order
+            if rule not in self._detection_order
+        )
         return new_rule
 
     def add_alias(self, main_rule: str, *aliases: str) -> None:
@@ -147,6 +275,7 @@ class RegexRules(dict):
             raise NotImplementedError(f"Aliases for {main_rule} are not declared.")
         for alias in aliases:
             self._rule_aliases[alias] = main_rule
+        self._invalidate()
 
 
 DefaultRules: RegexRules = RegexRules(
@@ -0,0 +1,287 @@
+"""Run metrics.
+
+This module defines the instrumentation of a run: timers around the stages of every
+lookup and counters of notable events, which can be dumped as JSON or exported for
+Prometheus. It is disabled by default, and a disabled stage costs no more than
+entering a no-op context manager.
+"""
+
+import contextlib
+import os
+import threading
+import time
+from typing import ContextManager, Iterator, NamedTuple
+
+STAGES: tuple[str, ...] = (
+    "inspect",
+    "skopeo",
+    "request",
+    "throttle",
+    "decode",
+    "labels",
+    "list_tags",
+    "match_digest",
+    "parse",
+    "compare",
+)
+"""The instrumented stages.
+
+inspect
+    A call of the inspector, which includes the stages skopeo or request, and decode.
+skopeo
+    A skopeo process, from its startup to its exit.
+request
+    A single HTTP round trip to a registry.
+throttle
+    Waiting for a registry to accept requests again.
+decode
+    Decoding a JSON response.
+labels
+    Extracting the version label from an image configuration.
+list_tags
+    A call of the tag lister, and the parsing of the tags that it streams.
+match_digest
+    Looking up the digests of the tags of an image without a version label, to
+    find the tag that matches its base tag.
+parse
+    Parsing a version string with a regex rule.
+compare
+    Comparing two version strings.
+
+Stages nest, so the time of a stage includes the time of the stages within it.
+"""
+
+COUNTERS: tuple[str, ...] = (
+    "cache_hits",
+    "cache_misses",
+    "retries",
+    "throttled",
+    "fallbacks",
+    "failures",
+    "timeouts",
+)
+"""The counted events.
+
+cache_hits, cache_misses
+    Lookups that were, or were not, answered by the metadata cache.
+retries
+    Requests that were sent again, e.g., on a stale connection or after
+    authenticating.
+throttled
+    Requests that waited for a registry to accept requests again.
+fallbacks
+    Native lookups that fell back to skopeo.
+failures
+    Lookups that failed.
+timeouts
+    Lookups that took too long, or did not finish before the deadline of the run.
+"""
+
+_NO_TIMER = contextlib.nullcontext()
+
+
+class StageStats(NamedTuple):
+    """The accumulated timings of a stage."""
+
+    calls: int = 0
+    """The number of times the stage ran."""
+    seconds: float = 0.0
+    """The total time spent in the stage."""
+    max_seconds: float = 0.0
+    """The longest time spent in the stage at once."""
+
+
+class _Timer:
+    """Time a single run of a stage."""
+
+    __slots__ = ("_metrics", "_stage", "_start")
+
+    def __init__(self, metrics: "Metrics", stage: str):
+        self._metrics = metrics
+        self._stage = stage
+        self._start = 0.0
+
+    def __enter__(self) -> None:
+        self._start = time.perf_counter()
+
+    def __exit__(self, *exc_info) -> None:
+        self._metrics.record(self._stage, time.perf_counter() - self._start)
+
+
+class Metrics:
+    """Thread-safe stage timers and event counters.
+
+    Parameters
+    ----------
+    enabled
+        Whether anything is recorded. A disabled instance ignores every timer and
+        counter.
+
+    Examples
+    --------
+    >>> metrics = Metrics(enabled=True)
+    >>> with metrics.stage("inspect"):
+    ...     skopeo.inspect("traefik")
+    >>> metrics.count("failures")
+    >>> metrics.stats()
+    {'stages': {'inspect': {'calls': 1, ...}}, 'counters': {'failures': 1}}
+
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self._stages: dict[str, StageStats] = {}
+        self._counters: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def stage(self, name: str) -> ContextManager[None]:
+        """Time the code run within the returned context manager as a stage."""
+        if not self.enabled:
+            return _NO_TIMER
+        return _Timer(self, name)
+
+    def record(self, name: str, seconds: float) -> None:
+        """Add a single run of a stage that took the given number of seconds."""
+        if not self.enabled:
+            return
+        with self._lock:
+            calls, total, longest = self._stages.get(name, StageStats())
+            self._stages[name] = StageStats(
+                calls + 1, total + seconds, max(longest, seconds)
+            )
+
+    def count(self, name: str, value: int = 1) -> None:
+        """Increase a counter."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def reset(self) -> None:
+        """Forget everything that has been recorded."""
+        with self._lock:
+            self._stages.clear()
+            self._counters.clear()
+
+    def stats(self) -> dict:
+        """Get everything that has been recorded as a JSON-serialisable dictionary.
+
+        Every stage in ``STAGES`` and every counter in ``COUNTERS`` is included, even
+        if it has not been recorded.
+        """
+        with self._lock:
+            stages = {name: StageStats() for name in STAGES} | self._stages
+            counters = dict.fromkeys(COUNTERS, 0) | self._counters
+        return {
+            "stages": {name: stats._asdict() for name, stats in stages.items()},
+            "counters": counters,
+        }
+
+    def prometheus(self, prefix: str = "docker_tag_updater") -> str:
+        """Format everything that has been recorded in the Prometheus text format."""
+        stats = self.stats()
+        lines = []
+        for field, kind, description in (
+            ("calls", "counter", "The number of times a stage ran."),
+            ("seconds", "counter", "The total time spent in a stage."),
+            ("max_seconds", "gauge", "The longest time spent in a stage at once."),
+        ):
+            metric = f"{prefix}_stage_{field}" + ("_total" if kind == "counter" else "")
+            lines.append(f"# HELP {metric} {description}")
+            lines.append(f"# TYPE {metric} {kind}")
+            lines.extend(
+                f'{metric}{{stage="{stage}"}} {values[field]}'
+                for stage, values in stats["stages"].items()
+            )
+        for name, value in stats["counters"].items():
+            metric = f"{prefix}_{name}_total"
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str | os.PathLike) -> None:
+        """Write everything that has been recorded to a Prometheus text file.
+
+        The file is replaced atomically, so that it can be read by the text file
+        collector of the node exporter at any time.
+        """
+        import tempfile  # pylint: disable=import-outside-toplevel
+
+        directory, name = os.path.split(os.path.abspath(path))
+        fd, temp_path = tempfile.mkstemp(
+            dir=directory, prefix=f".{name}.", suffix=".tmp"
+        )
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as temp_file:
+                temp_file.write(self.prometheus())
+            os.chmod(temp_path, 0o644)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+
+METRICS = Metrics()
+"""The metrics of this process, which are recorded by every lookup once enabled."""
+
+
+@contextlib.contextmanager
+def profile(path: str | os.PathLike | None) -> Iterator[None]:
+    """Profile the code run within the context with cProfile.
+
+    The lookups run in worker threads, so every thread that is started within the
+    context is profiled too, and the profiles of all threads are merged.
+
+    Parameters
+    ----------
+    path
+        The file that the profile is dumped to, to be read with ``pstats``. Nothing
+        is profiled if it is None.
+
+    Examples
+    --------
+    >>> with profile("ivc.prof"):
+    ...     image_versions(images)
+    >>> pstats.Stats("ivc.prof").sort_stats("cumulative").print_stats(20)
+
+    """
+    if path is None:
+        yield
+        return
+    # pylint: disable=import-outside-toplevel
+    import cProfile
+    import pstats
+    import sys
+
+    profilers = [cProfile.Profile()]
+    lock = threading.Lock()
+
+    def profile_thread(*_) -> None:
+        # Called once by every new thread, whose profile function the profiler
+        # replaces
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # The profiler of the calling thread profiles every thread already
+            sys.setprofile(None)
+            return
+        with lock:
+            profilers.append(profiler)
+
+    threading.setprofile(profile_thread)
+    profilers[0].enable()
+    try:
+        yield
+    finally:
+        profilers[0].disable()
+        threading.setprofile(None)
+        stats = pstats.Stats(profilers[0])
+        with lock:
+            for profiler in profilers[1:]:
+                try:
+                    stats.add(profiler)
+                except TypeError:
+                    # A thread that was started but has not called anything yet
+                    pass
+        stats.dump_stats(path)
@@ -5,7 +5,40 @@ This module defines the parser that is used for the CLI tool (image-version-chec
 """
 
 import argparse
-from .helpers import rules
+from typing import Iterator
+
+
+class RuleChoices:
+    """The rule names accepted on the command line.
+
+    The rules are only imported when the choices are checked or listed, so that
+    parsing the command line does not compile them. Besides the names of the rules
+    and auto, the aliases of the rules are accepted.
+    """
+
+    def __contains__(self, name: object) -> bool:
+        # pylint: disable-next=import-outside-toplevel
+        from .helpers import AUTO_RULE, rules
+
+        return name == AUTO_RULE or (isinstance(name, str) and rules.has_rule(name))
+
+    def __iter__(self) -> Iterator[str]:
+        # pylint: disable-next=import-outside-toplevel
+        from .helpers import AUTO_RULE, rules
+
+        yield from rules.keys()
+        yield AUTO_RULE
+
+
+def priority(spec: str) -> tuple[str, int]:
+    """Parse a PATTERN=N priority of the command line."""
+    pattern, _, value = spec.rpartition("=")
+    try:
+        return pattern, int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f"{spec} is not a priority of the form PATTERN=N"
+        ) from None
 
 
 ivc_parser = argparse.ArgumentParser(
@@ -15,14 +48,90 @@ ivc_parser = argparse.ArgumentParser(
 
 Parameters
 ----------
-image : str
-    The name of the container image, e.g., docker.io/alpine:3.19.1
+image : list of str
+    The names of the container images, e.g., docker.io/alpine:3.19.1
+input : str, optional
+    A file listing more container images, one per line, or - to read them from STDIN.
+jobs : int, default: 8
+    The number of images that are checked at the same time.
+per_registry : int, default: 4
+    The number of images that are checked at the same time on any one registry.
 tag : str, default: latest
     The base tag to compare the container image to, e.g., latest, edge, etc.
 rule : str, default: default
     The rule used to parse the image tags/versions into a semantic version string for
     comparison. The available options now are (default, docker.io, docker, lscr,
-    lscr.io, linuxserver)
+    lscr.io, linuxserver), or auto to detect the rule of each version string.
+list_tags : bool, default: False
+    Find the newest version among all tags of each image, parsed with the rule,
+    instead of reading the version label of the base tag.
+sync_tags : str, optional
+    With list_tags, keep the tags of every image in this SQLite database and only
+    list the tags that were added since the last run. Without a path, the database
+    is kept in the user's cache directory. Only used by the native backend.
+match_digest : bool, default: False
+    Find the version of an image without a version label from the newest tag that
+    the rule can parse and that has the same manifest digest as the base tag.
+policy : str, optional
+    The update policy of every image without one in policies, e.g., major,stable.
+policies : str, optional
+    A YAML file of update policies by image name or pattern. See
+    ``docker_tag_updater.policy`` for the constraints of a policy.
+backend : str, default: native
+    The inspection backend. The native registry client falls back to skopeo when a
+    registry cannot be queried natively. The available options are (native, skopeo)
+platform : str, optional
+    The platform whose manifest is read from multi-platform images by the native
+    backend, e.g., linux/arm64/v8. linux/amd64 by default.
+mirror : str, optional
+    The URL of a registry caching proxy that the native backend reads the images
+    through, see ``docker_tag_updater.proxy``.
+cache : str, optional
+    Cache lookups in this SQLite database. Without a path, the database is kept in
+    the user's cache directory.
+cache_ttl : float, default: 3600
+    The number of seconds that a cached version stays valid.
+cache_error_ttl : float, default: 300
+    The number of seconds that a cached failure stays valid. Throttled and timed
+    out lookups are never cached.
+cache_size : int, default: 10000
+    The number of cached lookups kept before the least recently used are evicted.
+token_cache : str, optional
+    Keep the bearer tokens of the registries in this file, readable only by the
+    current user, so that the next runs reuse them. Without a path, the file is kept
+    in the user's cache directory.
+record : str, optional
+    Record the responses of the registries to this gzip-compressed archive. The
+    metadata cache is not used while recording.
+replay : str, optional
+    Replay the responses recorded in this archive without any network.
+stats : str, optional
+    Time the stages of every lookup and count cache hits, retries and failures, then
+    write them as JSON to this file, or to STDERR if no path is given.
+prometheus : str, optional
+    Write the same metrics to this file in the Prometheus text format.
+profile : str, optional
+    Profile the run with cProfile and dump the profile to this file.
+socket : str, optional
+    The socket of the resolver server, see ``server.default_socket_path``.
+deadline : float, optional
+    The number of seconds that the lookups may take in total. The images whose
+    lookups have not finished by then are reported as failed, and the lookups that
+    have not started are cancelled.
+lookup_timeout : float, optional
+    The number of seconds that a skopeo process, or a read from a registry, may
+    take before the lookup fails. 300 and 30 seconds by default. Only used when the
+    images are resolved in this process.
+priority : list of tuple of (str, int), optional
+    The priorities of the lookups by image name or pattern, e.g., postgres=10. The
+    lookups with the highest priority, and then those with the oldest cached
+    results, are started first. The default priority is 0.
+no_server : bool, default: False
+    Resolve the images in this process even if a resolver server is running.
+ndjson : bool, default: False
+    Print a JSON record for every image as soon as it is resolved, with its
+    registry, name, current tag, version, newest image, rule, the seconds since the
+    start of the run and error, instead of the newest images in order.
 verbose : bool, default: False
     Specify the verbosity of the inspector function.
 
@@ -34,10 +143,30 @@ docker_tag_updater.helpers.regex_rules : For more information about rules.
 
 ivc_parser.add_argument(
     "image",
-    help="""The name of the image that will be checked.
+    nargs="*",
+    help="""The names of the images that will be checked.
     Example: docker.io/alpine:3.19.1
     """,
 )
+ivc_parser.add_argument(
+    "-i",
+    "--input",
+    help="""A file listing more images to check, one per line. Blank lines and lines
+    starting with # are ignored. Use - to read the images from STDIN.""",
+)
+ivc_parser.add_argument(
+    "-j",
+    "--jobs",
+    type=int,
+    help="The number of images that are checked at the same time.",
+    default=8,
+)
+ivc_parser.add_argument(
+    "--per-registry",
+    type=int,
+    help="The number of images that are checked at the same time on any one registry.",
+    default=4,
+)
 ivc_parser.add_argument(
     "-t",
     "--tag",
@@ -47,13 +176,46 @@ ivc_parser.add_argument(
 ivc_parser.add_argument(
     "-r",
     "--rule",
-    choices=list(rules.keys()),
-    help=f"""
-    The semver regex rule. Other available options are their aliases, i.e.,
-    {list(rules._rule_aliases.keys())}
-    """,
+    choices=RuleChoices(),
+    metavar="RULE",
+    help="""The semver regex rule, i.e., default, lscr, yymmdd or yyyymmdd, or auto to
+    detect the rule of each version. The aliases of the rules, e.g., docker.io and
+    linuxserver, are accepted too.""",
     default="default",
 )
+ivc_parser.add_argument(
+    "-L",
+    "--list-tags",
+    action="store_true",
+    help="""Find the newest version among all tags of the image instead of the
+    version label of the base tag. Use this for images without a version label.""",
+)
+ivc_parser.add_argument(
+    "--sync-tags",
+    nargs="?",
+    const="",
+    help="""With --list-tags, keep the tags of every image in this SQLite database
+    and only list the tags added since the last run. The database is kept in the
+    user's cache directory if no path is given.""",
+)
+ivc_parser.add_argument(
+    "--policy",
+    help="""The update policy of every image without one in --policies, as
+    comma-separated constraints: major or minor to stay on the current major or
+    minor version, max=VERSION, stable to skip prereleases, variant=NAME, e.g.,
+    variant=alpine, or same-variant.""",
+)
+ivc_parser.add_argument(
+    "--match-digest",
+    action="store_true",
+    help="""Find the version of an image without a version label from the newest
+    version tag that has the same digest as the base tag.""",
+)
+ivc_parser.add_argument(
+    "--policies",
+    help="""A YAML file of update policies by image name, e.g., 'postgres: major'.
+    The names may include the registry and may be shell-style patterns.""",
+)
 ivc_parser.add_argument(
     "-P",
     "--parse",
@@ -61,6 +223,623 @@ ivc_parser.add_argument(
     help="Get the parsed image information, i.e., the registry, image name, and tag.",
 )
 ivc_parser.add_argument(
+    "-b",
+    "--backend",
+    choices=["native", "skopeo"],
+    help="The backend used to inspect the image on its registry.",
+    default="native",
+)
+ivc_parser.add_argument(
+    "--platform",
+    help="""The platform whose manifest is read from multi-platform images by the
+    native backend, in the form of os/architecture[/variant]. linux/amd64 by
+    default.""",
+)
+ivc_parser.add_argument(
+    "--mirror",
+    help="""The URL of a registry caching proxy, e.g., http://localhost:5050, that
+    the native backend reads the images through.""",
+)
+ivc_parser.add_argument(
+    "-c",
+    "--cache",
+    nargs="?",
+    const="",
+    help="""Cache lookups on disk in this SQLite database. The database is kept in
+    the user's cache directory if no path is given.""",
+)
+ivc_parser.add_argument(
+    "--cache-ttl",
+    type=float,
+    help="The number of seconds that a cached version stays valid.",
+    default=3600,
+)
+ivc_parser.add_argument(
+    "--cache-error-ttl",
+    type=float,
+    help="The number of seconds that a cached failure stays valid.",
+    default=300,
+)
+ivc_parser.add_argument(
+    "--cache-size",
+    type=int,
+    help="The number of cached lookups kept.",
+    default=10000,
+)
+ivc_parser.add_argument(
+    "--token-cache",
+    nargs="?",
+    const="",
+    help="""Keep the bearer tokens of the registries in this file, so that the next
+    runs reuse them. The file is kept in the user's cache directory if no path is
+    given.""",
+)
+ivc_parser.add_argument(
+    "--record",
+    metavar="ARCHIVE",
+    help="""Record the responses of the registries to this archive, adding them to
+    those that it already holds. The metadata cache is not used while recording.""",
+)
+ivc_parser.add_argument(
+    "--replay",
+    metavar="ARCHIVE",
+    help="""Replay the responses recorded with --record instead of querying the
+    registries, so that the check runs offline.""",
+)
+ivc_parser.add_argument(
+    "--deadline",
+    type=float,
+    metavar="SECONDS",
+    help="""The number of seconds that the lookups may take in total. The images
+    that are not resolved by then are reported as failed.""",
+)
+ivc_parser.add_argument(
+    "--lookup-timeout",
+    type=float,
+    metavar="SECONDS",
+    help="""The number of seconds that a skopeo process, or a read from a registry,
+    may take before the lookup fails.""",
+)
+ivc_parser.add_argument(
+    "--priority",
+    type=priority,
+    action="append",
+    metavar="PATTERN=N",
+    help="""Look the images matching this name or pattern up before those of a
+    lower priority, which is 0 by default. Can be given more than once.""",
+)
+ivc_parser.add_argument(
+    "--stats",
+    nargs="?",
+    const="-",
+    help="""Write the timings of every stage and the counters of the run as JSON to
+    this file, or to STDERR if no path is given.""",
+)
+ivc_parser.add_argument(
+    "--prometheus",
+    help="Write the metrics of the run to this file in the Prometheus text format.",
+)
+ivc_parser.add_argument(
+    "--profile",
+    help="Profile the run with cProfile and dump the profile to this file.",
+)
+ivc_parser.add_argument(
+    "--socket",
+    help="""The socket of the resolver server. The images are resolved by the server
+    when it is running, and in this process otherwise.""",
+)
+ivc_parser.add_argument(
+    "--no-server",
+    action="store_true",
+    help="Resolve the images in this process even if a resolver server is running.",
+)
+ivc_parser.add_argument(
+    "--ndjson",
+    action="store_true",
+    help="""Print a JSON record for every image as soon as it is resolved, instead of
+    the newest images in order.""",
+)
+ivc_parser.add_argument(
+    "-v",
+    "--verbose",
+    action="store_true",
+)
+
+
+cu_parser = argparse.ArgumentParser(
+    prog="compose-updater",
+    description="Update image version tags in your Compose/Stack file.",
+)
+"""The argument parser for compose-updater.
+
+Parameters
+----------
+image : str, optional
+    Only update the references to this container image. Every image in the
+    Compose/Stack file is updated if it is not given.
+tag : str, default: latest
+    The base tag to compare the container images to, e.g., latest, edge, etc.
+rule : str, default: default
+    The rule used to parse the image tags/versions into a semantic version string for
+    comparison, or auto to detect the rule of each version string.
+file : str, default: compose.yaml
+    The filename of the Compose/Stack file.
+list_tags : bool, default: False
+    Find the newest versions among all tags of the images, parsed with the rule,
+    instead of reading the version labels of the base tag.
+match_digest : bool, default: False
+    Find the version of an image without a version label from the newest tag that
+    the rule can parse and that has the same manifest digest as the base tag.
+policy : str, optional
+    The update policy of every image without one in policies, e.g., major,stable.
+policies : str, optional
+    A YAML file of update policies by image name or pattern. See
+    ``docker_tag_updater.policy`` for the constraints of a policy.
+scan : str, optional
+    Update every Compose/Stack file in this directory tree instead, or in the
+    current directory if no path is given. Each unique image is looked up once.
+dry_run : bool, default: False
+    With scan, print the diff of every file that would be updated instead of
+    updating it.
+summary : str, optional
+    With scan, write a JSON summary of the updates and errors to this file, or to
+    STDOUT if no path is given.
+scan_index : str, optional
+    With scan, keep the image references of every scanned file in this SQLite
+    database, so that the files that are unchanged since the last scan are not
+    parsed again. Without a path, the database is kept in the user's cache
+    directory.
+jobs : int, default: 8
+    With scan, the number of files that are rewritten at the same time.
+backend : str, default: native
+    The inspection backend, either native or skopeo.
+platform : str, optional
+    The platform whose manifest is read from multi-platform images by the native
+    backend, e.g., linux/arm64/v8. linux/amd64 by default.
+mirror : str, optional
+    The URL of a registry caching proxy that the native backend reads the images
+    through, see ``docker_tag_updater.proxy``.
+cache : str, optional
+    Cache lookups in this SQLite database, or in the user's cache directory if no
+    path is given.
+token_cache : str, optional
+    Keep the bearer tokens of the registries in this file, or in the user's cache
+    directory if no path is given.
+record : str, optional
+    Record the responses of the registries to this gzip-compressed archive. The
+    metadata cache is not used while recording.
+replay : str, optional
+    Replay the responses recorded in this archive without any network.
+deadline : float, optional
+    The number of seconds that the lookups may take in total. The images whose
+    lookups have not finished by then are reported as failed, and the lookups that
+    have not started are cancelled.
+lookup_timeout : float, optional
+    The number of seconds that a skopeo process, or a read from a registry, may
+    take before the lookup fails. 300 and 30 seconds by default.
+priority : list of tuple of (str, int), optional
+    The priorities of the lookups by image name or pattern, e.g., postgres=10. The
+    lookups with the highest priority, and then those with the oldest cached
+    results, are started first. The default priority is 0.
+verbose : bool, default: False
+    Specify the verbosity of the updater.
+
+See also
+--------
+docker_tag_updater.compose : For the updater itself.
+
+"""
+
+cu_parser.add_argument(
+    "image",
+    nargs="?",
+    help="""The name of the image to update. Every image in the Compose/Stack file
+    is updated if it is not given.""",
+)
+cu_parser.add_argument(
+    "-t",
+    "--tag",
+    help="The base tag to reference, e.g. latest, develop, alpine, etc.",
+    default="latest",
+)
+cu_parser.add_argument(
+    "-r",
+    "--rule",
+    choices=RuleChoices(),
+    metavar="RULE",
+    help="""The semver regex rule, i.e., default, lscr, yymmdd or yyyymmdd, or auto to
+    detect the rule of each version. The aliases of the rules, e.g., docker.io and
+    linuxserver, are accepted too.""",
+    default="default",
+)
+cu_parser.add_argument(
+    "-f",
+    "--file",
+    help="The filename of the Compose/Stack file.",
+    default="compose.yaml",
+)
+cu_parser.add_argument(
+    "-L",
+    "--list-tags",
+    action="store_true",
+    help="""Find the newest versions among all tags of the images instead of the
+    version labels of the base tag.""",
+)
+cu_parser.add_argument(
+    "--policy",
+    help="""The update policy of every image without one in --policies, as
+    comma-separated constraints: major or minor to stay on the current major or
+    minor version, max=VERSION, stable to skip prereleases, variant=NAME, e.g.,
+    variant=alpine, or same-variant.""",
+)
+cu_parser.add_argument(
+    "--match-digest",
+    action="store_true",
+    help="""Find the version of an image without a version label from the newest
+    version tag that has the same digest as the base tag.""",
+)
+cu_parser.add_argument(
+    "--policies",
+    help="""A YAML file of update policies by image name, e.g., 'postgres: major'.
+    The names may include the registry and may be shell-style patterns.""",
+)
+cu_parser.add_argument(
+    "-s",
+    "--scan",
+    nargs="?",
+    const=".",
+    help="""Update every Compose/Stack file found in this directory tree instead of
+    --file, looking each unique image up once. The current directory is scanned if
+    no path is given.""",
+)
+cu_parser.add_argument(
+    "-n",
+    "--dry-run",
+    action="store_true",
+    help="With --scan, print the diffs of the files instead of updating them.",
+)
+cu_parser.add_argument(
+    "--summary",
+    nargs="?",
+    const="-",
+    help="""With --scan, write a JSON summary of the updates and errors to this
+    file, or to STDOUT if no path is given.""",
+)
+cu_parser.add_argument(
+    "--scan-index",
+    nargs="?",
+    const="",
+    help="""With --scan, keep the image references of every file in this SQLite
+    database, and skip the files that are unchanged since the last scan. The
+    database is kept in the user's cache directory if no path is given.""",
+)
+cu_parser.add_argument(
+    "-j",
+    "--jobs",
+    type=int,
+    help="With --scan, the number of files that are rewritten at the same time.",
+    default=8,
+)
+cu_parser.add_argument(
+    "-b",
+    "--backend",
+    choices=["native", "skopeo"],
+    help="The backend used to inspect the images on their registries.",
+    default="native",
+)
+cu_parser.add_argument(
+    "--platform",
+    help="""The platform whose manifest is read from multi-platform images by the
+    native backend, in the form of os/architecture[/variant]. linux/amd64 by
+    default.""",
+)
+cu_parser.add_argument(
+    "--mirror",
+    help="""The URL of a registry caching proxy, e.g., http://localhost:5050, that
+    the native backend reads the images through.""",
+)
+cu_parser.add_argument(
+    "-c",
+    "--cache",
+    nargs="?",
+    const="",
+    help="""Cache lookups on disk in this SQLite database. The database is kept in
+    the user's cache directory if no path is given.""",
+)
+cu_parser.add_argument(
+    "--token-cache",
+    nargs="?",
+    const="",
+    help="""Keep the bearer tokens of the registries in this file, so that the next
+    runs reuse them. The file is kept in the user's cache directory if no path is
+    given.""",
+)
+cu_parser.add_argument(
+    "--record",
+    metavar="ARCHIVE",
+    help="""Record the responses of the registries to this archive, adding them to
+    those that it already holds. The metadata cache is not used while recording.""",
+)
+cu_parser.add_argument(
+    "--replay",
+    metavar="ARCHIVE",
+    help="""Replay the responses recorded with --record instead of querying the
+    registries, so that the update runs offline.""",
+)
+cu_parser.add_argument(
+    "--deadline",
+    type=float,
+    metavar="SECONDS",
+    help="""The number of seconds that the lookups may take in total. The images
+    that are not resolved by then are reported as failed.""",
+)
+cu_parser.add_argument(
+    "--lookup-timeout",
+    type=float,
+    metavar="SECONDS",
+    help="""The number of seconds that a skopeo process, or a read from a registry,
+    may take before the lookup fails.""",
+)
+cu_parser.add_argument(
+    "--priority",
+    type=priority,
+    action="append",
+    metavar="PATTERN=N",
+    help="""Look the images matching this name or pattern up before those of a
+    lower priority, which is 0 by default. Can be given more than once.""",
+)
+cu_parser.add_argument(
+    "-v",
+    "--verbose",
+    action="store_true",
+)
+
+
+server_parser = argparse.ArgumentParser(
+    prog="python -m docker_tag_updater.server",
+    description="Resolve images for image-version-checker in a long-lived process.",
+)
+"""The argument parser for the resolver server.
+
+Parameters
+----------
+socket : str, optional
+    The path of the Unix socket to listen on, see ``server.default_socket_path``.
+verbose : bool, default: False
+    Print out the requests that are answered.
+
+See also
+--------
+docker_tag_updater.server : For the server itself.
+
+"""
+
+server_parser.add_argument(
+    "-s",
+    "--socket",
+    help="The path of the Unix socket to listen on.",
+)
+server_parser.add_argument(
+    "-v",
+    "--verbose",
+    action="store_true",
+)
+
+
+proxy_parser = argparse.ArgumentParser(
+    prog="python -m docker_tag_updater.proxy",
+    description="Serve the manifests and configurations of images from a cache.",
+)
+"""The argument parser for the registry caching proxy.
+
+Parameters
+----------
+bind : str, default: 127.0.0.1
+    The address to listen on.
+port : int, default: 5050
+    The port to listen on.
+cache : str, optional
+    The SQLite database of the cached manifests and blobs. It is kept in the user's
+    cache directory by default.
+cache_size : int, default: 10000
+    The number of cached manifests and blobs kept before the least recently used
+    are evicted.
+tag_ttl : float, default: 60
+    The number of seconds that the digest of a tag is trusted before it is
+    revalidated with the registry.
+verbose : bool, default: False
+    Print out the requests that are answered.
+
+See also
+--------
+docker_tag_updater.proxy : For the proxy itself.
+
+"""
+
+proxy_parser.add_argument(
+    "-b",
+    "--bind",
+    help="The address to listen on.",
+    default="127.0.0.1",
+)
+proxy_parser.add_argument(
+    "-p",
+    "--port",
+    type=int,
+    help="The port to listen on.",
+    default=5050,
+)
+proxy_parser.add_argument(
+    "-c",
+    "--cache",
+    help="The SQLite database of the cached manifests and blobs.",
+)
+proxy_parser.add_argument(
+    "--cache-size",
+    type=int,
+    help="The number of cached manifests and blobs kept.",
+    default=10000,
+)
+proxy_parser.add_argument(
+    "--tag-ttl",
+    type=float,
+    help="""The number of seconds that the digest of a tag is trusted before it is
+    revalidated with the registry.""",
+    default=60,
+)
+proxy_parser.add_argument(
+    "-v",
+    "--verbose",
+    action="store_true",
+)
+
+
+daemon_parser = argparse.ArgumentParser(
+    prog="python -m docker_tag_updater.daemon",
+    description="Watch container images for new versions.",
+)
+"""The argument parser for the watch daemon.
+
+Parameters
+----------
+image : list of str
+    The names of the container images to watch.
+input : str, optional
+    A file listing more container images, one per line.
+file : list of str
+    Compose/Stack files whose images are watched.
+output : str, optional
+    Write the latest known state of every image to this file as JSON after every
+    check.
+tag : str, default: latest
+    The base tag to compare the container images to.
+rule : str, default: default
+    The rule used to compare the versions, or auto to detect it.
+backend : str, default: native
+    The inspection backend, either native or skopeo.
+platform : str, optional
+    The platform whose manifest is read from multi-platform images by the native
+    backend, e.g., linux/arm64/v8. linux/amd64 by default.
+mirror : str, optional
+    The URL of a registry caching proxy that the native backend reads the images
+    through, see ``docker_tag_updater.proxy``.
+cache : str, optional
+    Cache lookups in this SQLite database, or in the user's cache directory if no
+    path is given.
+budget : int, default: 4
+    The number of images that are checked at the same time.
+min_interval : float, default: 300
+    The shortest number of seconds between the checks of an image.
+max_interval : float, default: 86400
+    The longest number of seconds between the checks of an image.
+jitter : float, default: 0.1
+    The fraction that every interval is randomly lengthened or shortened by.
+reload_interval : float, default: 30
+    The number of seconds between looking for changes to the input and Compose
+    files.
+verbose : bool, default: False
+    Specify the verbosity of the inspector function.
+
+See also
+--------
+docker_tag_updater.daemon : For the daemon itself.
+
+"""
+
+daemon_parser.add_argument(
+    "image",
+    nargs="*",
+    help="The names of the images to watch.",
+)
+daemon_parser.add_argument(
+    "-i",
+    "--input",
+    help="""A file listing more images to watch, one per line. Blank lines and lines
+    starting with # are ignored.""",
+)
+daemon_parser.add_argument(
+    "-f",
+    "--file",
+    action="append",
+    default=[],
+    help="A Compose/Stack file whose images are watched. Can be given many times.",
+)
+daemon_parser.add_argument(
+    "-o",
+    "--output",
+    help="Write the latest known state of every image to this file as JSON.",
+)
+daemon_parser.add_argument(
+    "-t",
+    "--tag",
+    help="The base tag to reference, e.g. latest, develop, alpine, etc.",
+    default="latest",
+)
+daemon_parser.add_argument(
+    "-r",
+    "--rule",
+    choices=RuleChoices(),
+    metavar="RULE",
+    help="The semver regex rule, or auto to detect the rule of each version.",
+    default="default",
+)
+daemon_parser.add_argument(
+    "-b",
+    "--backend",
+    choices=["native", "skopeo"],
+    help="The backend used to inspect the images on their registries.",
+    default="native",
+)
+daemon_parser.add_argument(
+    "--platform",
+    help="""The platform whose manifest is read from multi-platform images by the
+    native backend, in the form of os/architecture[/variant]. linux/amd64 by
+    default.""",
+)
+daemon_parser.add_argument(
+    "--mirror",
+    help="""The URL of a registry caching proxy, e.g., http://localhost:5050, that
+    the native backend reads the images through.""",
+)
+daemon_parser.add_argument(
+    "-c",
+    "--cache",
+    nargs="?",
+    const="",
+    help="""Cache lookups on disk in this SQLite database. The database is kept in
+    the user's cache directory if no path is given.""",
+)
+daemon_parser.add_argument(
+    "--budget",
+    type=int,
+    help="The number of images that are checked at the same time.",
+    default=4,
+)
+daemon_parser.add_argument(
+    "--min-interval",
+    type=float,
+    help="The shortest number of seconds between the checks of an image.",
+    default=300,
+)
+daemon_parser.add_argument(
+    "--max-interval",
+    type=float,
+    help="The longest number of seconds between the checks of an image.",
+    default=86400,
+)
+daemon_parser.add_argument(
+    "--jitter",
+    type=float,
+    help="The fraction that every interval is randomly changed by.",
+    default=0.1,
+)
+daemon_parser.add_argument(
+    "--reload-interval",
+    type=float,
+    help="The number of seconds between looking for changes to the input files.",
+    default=30,
+)
+daemon_parser.add_argument(
     "-v",
     "--verbose",
     action="store_true",
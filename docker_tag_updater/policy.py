@@ -0,0 +1,305 @@
+"""Update policies.
+
+This module defines the constraints that an update of an image may be held to, e.g.,
+staying on the same major version or on the -alpine variant, and the sorted index of
+the versions of a repository that answers them. The index of a repository is built
+once per run from its parsed tags, and every reference to the repository is answered
+from it with a binary search, whichever version each of them is pinned to.
+
+A policy is written as a comma-separated list of constraints:
+
+- ``major`` or ``minor``: stay on the major, or the major and minor, version of the
+  current tag.
+- ``max=VERSION``: never update past this version.
+- ``stable``: skip prereleases, e.g., 2.0.0-rc1.
+- ``variant=NAME``: only update to tags of this variant, e.g., alpine for
+  16.2.0-alpine3.19. ``variant=`` selects the tags without a variant.
+- ``same-variant``: only update to tags of the variant of the current tag.
+
+Examples
+--------
+>>> index = VersionIndex(["15.5.0", "15.6.0", "15.6.0-alpine", "16.2.0"])
+>>> index.newest("15.5.0", parse_policy("major"))
+'15.6.0'
+"""
+
+import bisect
+import fnmatch
+import re
+from pathlib import Path
+from typing import Iterable, Mapping, NamedTuple, TypeVar
+
+from .helpers import parse_version
+from .helpers.keys import VersionKey
+
+_VARIANT = re.compile(r"^[vV]?\d+(?:\.\d+)*[-._+]?(?P<variant>.*?)[\d.]*$")
+_PRERELEASE = re.compile(r"(?:alpha|beta|rc|pre|dev|preview|snapshot|nightly)", re.I)
+
+T = TypeVar("T")
+
+
+class UpdatePolicy(NamedTuple):
+    """The constraints that the update of an image is held to.
+
+    The default policy allows any newer version.
+    """
+
+    pin: str | None = None
+    """Stay on the same major or minor version of the current tag, if set."""
+    max_version: str | None = None
+    """The newest version that is allowed, if any."""
+    stable: bool = False
+    """Skip prereleases."""
+    variant: str | None = None
+    """The variant of the tags that are allowed, if any."""
+    same_variant: bool = False
+    """Only allow the variant of the current tag."""
+
+
+def parse_policy(spec: str) -> UpdatePolicy:
+    """Parse a policy from its comma-separated constraints.
+
+    Raises
+    ------
+    ValueError
+        If a constraint is unknown.
+
+    Examples
+    --------
+    >>> parse_policy("minor,stable,variant=alpine")
+    UpdatePolicy(pin='minor', max_version=None, stable=True, variant='alpine',
+    same_variant=False)
+
+    """
+    fields: dict = {}
+    for constraint in filter(None, (part.strip() for part in spec.split(","))):
+        name, has_value, value = constraint.partition("=")
+        if name in ("major", "minor") and not has_value:
+            fields["pin"] = name
+        elif name == "max" and value:
+            fields["max_version"] = value
+        elif name == "stable" and not has_value:
+            fields["stable"] = True
+        elif name == "variant" and has_value:
+            fields["variant"] = value
+        elif name == "same-variant" and not has_value:
+            fields["same_variant"] = True
+        else:
+            raise ValueError(f"{constraint} is not a valid policy constraint.")
+    return UpdatePolicy(**fields)
+
+
+def read_policies(path: str | Path) -> dict[str, str]:
+    """Read the policies of images from a YAML file.
+
+    The file maps image names, which may be shell-style patterns and may include the
+    registry, to policies, e.g., ``postgres: major,variant=alpine``.
+
+    Returns
+    -------
+        The policy of every image name, as it is written.
+
+    Raises
+    ------
+    ValueError
+        If the file is not a mapping of names to valid policies.
+    """
+    # pylint: disable-next=import-outside-toplevel
+    import yaml
+
+    with open(path, encoding="utf-8") as policy_file:
+        policies = yaml.safe_load(policy_file) or {}
+    if not isinstance(policies, dict):
+        raise ValueError(f"{path} does not map image names to policies.")
+    policies = {str(name): str(spec or "") for name, spec in policies.items()}
+    for spec in policies.values():
+        parse_policy(spec)
+    return policies
+
+
+def policy_specs(
+    path: str | Path | None = None, spec: str | None = None
+) -> dict[str, str] | None:
+    """Collect the policies that are given on the command line.
+
+    Parameters
+    ----------
+    path
+        A YAML file of policies by image name, see ``read_policies``.
+    spec
+        The policy of every image that has none in the file.
+
+    Returns
+    -------
+        The policies by image name or pattern, or None if there are none.
+    """
+    if path is None and spec is None:
+        return None
+    specs = read_policies(path) if path is not None else {}
+    if spec is not None:
+        parse_policy(spec)
+        specs.setdefault("*", spec)
+    return specs
+
+
+def parse_policies(specs: Mapping[str, str]) -> dict[str, UpdatePolicy]:
+    """Parse the policies of ``policy_specs``."""
+    return {name: parse_policy(spec) for name, spec in specs.items()}
+
+
+def policy_for(policies: Mapping[str, T], registry: str, image: str) -> T | None:
+    """Find the policy of an image, or any other setting that is given by image name.
+
+    A policy for registry/image is preferred to one for the image alone, and both
+    are preferred to the first pattern that matches either.
+    """
+    for name in (f"{registry}/{image}", image):
+        if name in policies:
+            return policies[name]
+    for pattern, policy in policies.items():
+        if fnmatch.fnmatchcase(f"{registry}/{image}", pattern) or fnmatch.fnmatchcase(
+            image, pattern
+        ):
+            return policy
+    return None
+
+
+def tag_variant(tag: str) -> str:
+    """Get the variant of a tag, i.e., its suffix without the version numbers.
+
+    Examples
+    --------
+    >>> tag_variant("16.2.0-alpine3.19")
+    'alpine'
+    >>> tag_variant("v2.11.0")
+    ''
+
+    """
+    match = _VARIANT.match(tag)
+    return match["variant"] if match else tag
+
+
+class _Entry(NamedTuple):
+    key: VersionKey
+    build: int
+    shortness: int
+    tag: str
+    prerelease: bool
+
+    @property
+    def rank(self) -> tuple[VersionKey, int, int]:
+        """The order of the tags, as ``helpers.newest_version`` ranks them."""
+        return self.key, self.build, self.shortness
+
+
+class VersionIndex:
+    """The parsed tags of a repository, sorted by version within each variant.
+
+    Tags that cannot be parsed by the rule, e.g., latest, are left out.
+
+    Parameters
+    ----------
+    tags
+        The tags of the repository.
+    rule
+        Name of the ``RegexRules`` rule to parse the tags.
+    """
+
+    def __init__(self, tags: Iterable[str], rule: str = "default"):
+        self.rule = rule
+        variants: dict[str, list[_Entry]] = {}
+        for tag in tags:
+            try:
+                fields = parse_version(tag, rule_name=rule)
+            except ValueError:
+                continue
+            key = VersionKey(fields)
+            build = fields.get("build", "")
+            variant = tag_variant(tag)
+            variants.setdefault(variant, []).append(
+                _Entry(
+                    key,
+                    int(build) if build.isdigit() else -1,
+                    -len(tag),
+                    tag,
+                    key.is_prerelease or bool(_PRERELEASE.match(variant)),
+                )
+            )
+        self._entries = {
+            variant: sorted(entries) for variant, entries in variants.items()
+        }
+        self._keys = {
+            variant: [entry.key for entry in entries]
+            for variant, entries in self._entries.items()
+        }
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self._entries.values())
+
+    def newest_first(self) -> list[str]:
+        """Get every parsed tag of every variant, from the newest to the oldest."""
+        entries = [entry for entries in self._entries.values() for entry in entries]
+        entries.sort(key=lambda entry: entry.rank, reverse=True)
+        return [entry.tag for entry in entries]
+
+    def _rank(self, version: str) -> tuple[VersionKey, int]:
+        fields = parse_version(version, rule_name=self.rule)
+        build = fields.get("build", "")
+        return VersionKey(fields), int(build) if build.isdigit() else -1
+
+    def newest(self, current: str, policy: UpdatePolicy | None = None) -> str:
+        """Find the newest tag that the current tag may be updated to.
+
+        Parameters
+        ----------
+        current
+            The current tag.
+        policy
+            The constraints of the update. Any newer version is allowed by default.
+
+        Returns
+        -------
+            The newest allowed tag, or the current tag if no newer tag is allowed.
+
+        Raises
+        ------
+        ValueError
+            If the current tag, or the maximum version of the policy, cannot be
+            parsed.
+        """
+        policy = policy or UpdatePolicy()
+        current_rank = self._rank(current)
+        current_key = current_rank[0]
+        low: tuple = ()
+        high: tuple | None = None
+        if policy.pin == "major":
+            low, high = (current_key.major,), (current_key.major + 1,)
+        elif policy.pin == "minor":
+            low = (current_key.major, current_key.minor)
+            high = (current_key.major, current_key.minor + 1)
+        max_key = self._rank(policy.max_version)[0] if policy.max_version else None
+
+        if policy.same_variant:
+            variants = [tag_variant(current)]
+        elif policy.variant is not None:
+            variants = [policy.variant]
+        else:
+            variants = list(self._entries)
+
+        best: _Entry | None = None
+        for variant in variants:
+            entries, keys = self._entries.get(variant, []), self._keys.get(variant, [])
+            start = bisect.bisect_left(keys, low)
+            end = len(keys) if high is None else bisect.bisect_left(keys, high)
+            if max_key is not None:
+                end = min(end, bisect.bisect_right(keys, max_key))
+            for position in range(end - 1, start - 1, -1):
+                entry = entries[position]
+                if not (policy.stable and entry.prerelease):
+                    if best is None or entry.rank > best.rank:
+                        best = entry
+                    break
+        # Another tag of the same version, e.g., of another variant, is no update
+        if best is None or (best.key, best.build) <= current_rank:
+            return current
+        return best.tag
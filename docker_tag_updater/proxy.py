@@ -0,0 +1,480 @@
+"""Registry caching proxy.
+
+This module defines a small read-only registry mirror that many updater jobs can
+share, so that a manifest or image configuration is fetched from the registry once
+and served to every job from then on. It speaks the parts of the Docker Registry
+HTTP API V2 that the inspectors use, and serves every registry under its name:
+
+- ``/v2/<registry>/<repository>/manifests/<reference>``
+- ``/v2/<registry>/<repository>/blobs/<digest>``
+- ``/v2/<registry>/<repository>/tags/list``, which is passed through uncached.
+
+Manifests and blobs are immutable, so they are cached by digest for as long as they
+are used. The digest of a tag is trusted for a short while, and revalidated with a
+HEAD request after that, which is cheap and not counted against the pull rate limit
+of Docker Hub. Concurrent requests for the same content share one upstream request.
+
+Start the proxy with::
+
+    python -m docker_tag_updater.proxy --port 5050
+
+and point the native backend at it with ``--mirror http://localhost:5050``, or
+skopeo with a mirror of each registry in registries.conf.
+"""
+# pylint: disable=import-outside-toplevel
+
+import hashlib
+import http.client
+import json
+import signal
+import sqlite3
+import sys
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import NamedTuple
+
+from .cache import default_cache_dir
+from .registry import (
+    MANIFEST_MEDIA_TYPES,
+    RegistryClient,
+    RegistryError,
+    default_client,
+)
+from .singleflight import SingleFlight
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS content (
+    digest TEXT PRIMARY KEY,
+    media_type TEXT NOT NULL,
+    body BLOB NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS content_accessed_at ON content (accessed_at);
+CREATE TABLE IF NOT EXISTS tags (
+    registry TEXT NOT NULL,
+    repository TEXT NOT NULL,
+    tag TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    checked_at REAL NOT NULL,
+    PRIMARY KEY (registry, repository, tag)
+);
+"""
+
+_ROUTES = ("/manifests/", "/blobs/", "/tags/list")
+
+
+class Content(NamedTuple):
+    """A manifest or blob, as it is served."""
+
+    digest: str
+    """The digest of the body."""
+    media_type: str
+    """The media type of the body."""
+    body: bytes
+    """The manifest or blob itself."""
+
+
+class ContentStore:
+    """A size-bounded, least-recently-used store of manifests and blobs by digest.
+
+    The digests of tags are kept alongside, and everything is kept in an SQLite
+    database, which can be shared by several processes at the same time.
+
+    Parameters
+    ----------
+    path
+        The path of the SQLite database. Defaults to proxy.sqlite3 in
+        ``cache.default_cache_dir()``.
+    max_entries
+        The number of manifests and blobs kept. The least recently used ones are
+        evicted beyond this.
+    """
+
+    def __init__(self, path: str | Path | None = None, max_entries: int = 10000):
+        if path is None:
+            path = default_cache_dir() / "proxy.sqlite3"
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        """Close the database."""
+        with self._lock:
+            self._db.close()
+
+    def __enter__(self) -> "ContentStore":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def get(self, digest: str) -> Content | None:
+        """Get a manifest or blob and mark it as recently used."""
+        with self._lock, self._db:
+            row = self._db.execute(
+                "SELECT media_type, body FROM content WHERE digest = ?", (digest,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._db.execute(
+                "UPDATE content SET accessed_at = ? WHERE digest = ?",
+                (time.time(), digest),
+            )
+        return Content(digest, row[0], bytes(row[1]))
+
+    def put(self, content: Content) -> None:
+        """Store a manifest or blob."""
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO content VALUES (?, ?, ?, ?)",
+                (content.digest, content.media_type, content.body, time.time()),
+            )
+            self._db.execute(
+                "DELETE FROM content WHERE rowid IN (SELECT rowid FROM content"
+                " ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def tag(self, registry: str, repository: str, tag: str) -> tuple[str, float] | None:
+        """Get the digest of a tag, and when it was last checked."""
+        with self._lock:
+            return self._db.execute(
+                "SELECT digest, checked_at FROM tags"
+                " WHERE registry = ? AND repository = ? AND tag = ?",
+                (registry, repository, tag),
+            ).fetchone()
+
+    def set_tag(self, registry: str, repository: str, tag: str, digest: str) -> None:
+        """Store the digest of a tag, as it has just been checked."""
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO tags VALUES (?, ?, ?, ?, ?)",
+                (registry, repository, tag, digest, time.time()),
+            )
+
+
+def _verify(digest: str, body: bytes) -> None:
+    """Check that a body matches its sha256 digest, if it has one."""
+    algorithm, _, expected = digest.partition(":")
+    if algorithm == "sha256" and hashlib.sha256(body).hexdigest() != expected:
+        raise RegistryError(f"The content of {digest} does not match its digest.", 502)
+
+
+class RegistryProxy:
+    """Fetch manifests and blobs through a content store.
+
+    Parameters
+    ----------
+    store
+        The store of manifests, blobs and the digests of tags.
+    client
+        The client of the upstream registries. ``registry.default_client()`` by
+        default, which must not use a mirror itself.
+    tag_ttl
+        The number of seconds that the digest of a tag is trusted before it is
+        revalidated.
+    max_blob_size
+        The size in bytes of the largest blob that is served. Image configurations
+        are small, and larger blobs, e.g., layers, are refused so that clients fetch
+        them from the registry.
+    """
+
+    def __init__(
+        self,
+        store: ContentStore,
+        client: RegistryClient | None = None,
+        tag_ttl: float = 60,
+        max_blob_size: int = 4 * 1024 * 1024,
+    ):
+        self.store = store
+        self.client = default_client() if client is None else client
+        self.tag_ttl = tag_ttl
+        self.max_blob_size = max_blob_size
+        self._flight = SingleFlight()
+
+    def _fetch_manifest(
+        self, registry: str, repository: str, reference: str
+    ) -> Content:
+        resp = self.client.request(
+            registry,
+            repository,
+            f"/v2/{repository}/manifests/{reference}",
+            accept=", ".join(MANIFEST_MEDIA_TYPES),
+        )
+        digest = resp.headers.get("Docker-Content-Digest") or (
+            f"sha256:{hashlib.sha256(resp.body).hexdigest()}"
+        )
+        _verify(digest, resp.body)
+        media_type = resp.headers.get("Content-Type", MANIFEST_MEDIA_TYPES[-1])
+        content = Content(digest, media_type, resp.body)
+        self.store.put(content)
+        if not reference.startswith("sha256:"):
+            self.store.set_tag(registry, repository, reference, digest)
+        return content
+
+    def _revalidate(
+        self, registry: str, repository: str, tag: str, digest: str
+    ) -> Content:
+        resp = self.client.request(
+            registry,
+            repository,
+            f"/v2/{repository}/manifests/{tag}",
+            method="HEAD",
+            accept=", ".join(MANIFEST_MEDIA_TYPES),
+        )
+        content = self.store.get(digest)
+        if resp.headers.get("Docker-Content-Digest") != digest or content is None:
+            return self._fetch_manifest(registry, repository, tag)
+        self.store.set_tag(registry, repository, tag, digest)
+        return content
+
+    def manifest(self, registry: str, repository: str, reference: str) -> Content:
+        """Get a manifest by tag or digest.
+
+        Raises
+        ------
+        RegistryError
+            If the manifest cannot be fetched from the registry.
+        """
+        key = ("manifest", registry, repository, reference)
+        if ":" in reference:
+            content = self.store.get(reference)
+            if content is not None:
+                return content
+            return self._flight.do(
+                key, self._fetch_manifest, registry, repository, reference
+            )
+        known = self.store.tag(registry, repository, reference)
+        if known is None:
+            return self._flight.do(
+                key, self._fetch_manifest, registry, repository, reference
+            )
+        digest, checked_at = known
+        if time.time() - checked_at < self.tag_ttl:
+            content = self.store.get(digest)
+            if content is not None:
+                return content
+        return self._flight.do(
+            key, self._revalidate, registry, repository, reference, digest
+        )
+
+    def _fetch_blob(self, registry: str, repository: str, digest: str) -> Content:
+        resp = self.client.request(
+            registry, repository, f"/v2/{repository}/blobs/{digest}", stream=True
+        )
+        body = bytearray()
+        for chunk in resp.chunks or [resp.body]:
+            body += chunk
+            if len(body) > self.max_blob_size:
+                if resp.chunks is not None:
+                    resp.chunks.close()
+                raise RegistryError(f"The blob {digest} is too large to serve.", 413)
+        _verify(digest, bytes(body))
+        content = Content(digest, "application/octet-stream", bytes(body))
+        self.store.put(content)
+        return content
+
+    def blob(self, registry: str, repository: str, digest: str) -> Content:
+        """Get a blob by its digest.
+
+        Raises
+        ------
+        RegistryError
+            If the blob cannot be fetched from the registry, or it is too large.
+        """
+        content = self.store.get(digest)
+        if content is not None:
+            return content
+        return self._flight.do(
+            ("blob", registry, digest), self._fetch_blob, registry, repository, digest
+        )
+
+    def tags_list(
+        self, registry: str, repository: str, query: str
+    ) -> tuple[bytes, str | None]:
+        """Pass a page of the tags of a repository through.
+
+        Returns
+        -------
+            The page, and the link to the next page under the name of the registry,
+            if there is one.
+        """
+        path = f"/v2/{repository}/tags/list" + (f"?{query}" if query else "")
+        resp = self.client.request(registry, repository, path)
+        link = resp.headers.get("Link")
+        if link:
+            link = link.replace(f"</v2/{repository}/", f"</v2/{registry}/{repository}/")
+        return resp.body, link
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Answer the requests of the registry API."""
+
+    server: "ProxyServer"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _reply(
+        self,
+        status: int,
+        body: bytes = b"",
+        headers: dict[str, str] | None = None,
+    ) -> None:
+        self.send_response(status)
+        self.send_header("Docker-Distribution-API-Version", "registry/2.0")
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _error(self, status: int, code: str, message: str) -> None:
+        body = json.dumps({"errors": [{"code": code, "message": message}]})
+        self._reply(status, body.encode(), {"Content-Type": "application/json"})
+
+    def do_HEAD(self) -> None:  # pylint: disable=invalid-name
+        """Answer a request like GET, without the body."""
+        self.do_GET()
+
+    def do_GET(self) -> None:  # pylint: disable=invalid-name
+        """Answer a request of the registry API."""
+        url = urllib.parse.urlsplit(self.path)
+        if url.path.rstrip("/") == "/v2":
+            self._reply(200, b"{}", {"Content-Type": "application/json"})
+            return
+        route = max(_ROUTES, key=url.path.rfind)
+        name, found, reference = url.path.removeprefix("/v2/").rpartition(route)
+        registry, _, repository = name.partition("/")
+        if not (url.path.startswith("/v2/") and found and repository):
+            self._error(404, "NAME_UNKNOWN", "Not a repository of a known registry.")
+            return
+        proxy = self.server.proxy
+        try:
+            if route == "/tags/list":
+                body, link = proxy.tags_list(registry, repository, url.query)
+                headers = {"Content-Type": "application/json"}
+                if link:
+                    headers["Link"] = link
+                self._reply(200, body, headers)
+                return
+            if route == "/manifests/":
+                content = proxy.manifest(registry, repository, reference)
+            else:
+                content = proxy.blob(registry, repository, reference)
+        except RegistryError as exc:
+            # Anything but a missing image is a failure of the proxy to its clients
+            status = exc.status if exc.status in (404, 413, 429) else 502
+            self._error(status or 502, "UPSTREAM", str(exc))
+            return
+        except (OSError, http.client.HTTPException, ValueError) as exc:
+            self._error(502, "UPSTREAM", str(exc))
+            return
+        self._reply(
+            200,
+            content.body,
+            {
+                "Content-Type": content.media_type,
+                "Docker-Content-Digest": content.digest,
+            },
+        )
+
+
+class ProxyServer(ThreadingHTTPServer):
+    """An HTTP server that answers every connection in its own thread.
+
+    Parameters
+    ----------
+    address
+        The host and port to listen on.
+    proxy
+        The proxy that answers the requests.
+    verbose
+        Print out the requests to STDERR if True.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self, address: tuple[str, int], proxy: RegistryProxy, verbose: bool = False
+    ):
+        self.proxy = proxy
+        self.verbose = verbose
+        super().__init__(address, _Handler)
+
+
+def serve(
+    host: str = "127.0.0.1",
+    port: int = 5050,
+    path: str | None = None,
+    tag_ttl: float = 60,
+    max_entries: int = 10000,
+    verbose: bool = False,
+) -> None:
+    """Run a caching proxy until it is interrupted or terminated.
+
+    Parameters
+    ----------
+    host
+        The address to listen on.
+    port
+        The port to listen on.
+    path
+        The path of the content store. ``ContentStore`` picks it by default.
+    tag_ttl
+        The number of seconds that the digest of a tag is trusted.
+    max_entries
+        The number of manifests and blobs kept.
+    verbose
+        Print out the requests to STDERR if True.
+    """
+    with ContentStore(path, max_entries) as store:
+        server = ProxyServer(
+            (host, port), RegistryProxy(store, tag_ttl=tag_ttl), verbose
+        )
+        signal.signal(
+            signal.SIGTERM,
+            lambda *_: threading.Thread(target=server.shutdown).start(),
+        )
+        if verbose:
+            print(f"Listening on http://{host}:{server.server_port}", file=sys.stderr)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Run the caching proxy from the command line."""
+    from .parser import proxy_parser
+
+    args = proxy_parser.parse_args(argv)
+    try:
+        serve(
+            args.bind,
+            args.port,
+            args.cache,
+            args.tag_ttl,
+            args.cache_size,
+            args.verbose,
+        )
+    except OSError as exc:
+        print(exc, file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
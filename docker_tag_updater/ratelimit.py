@@ -0,0 +1,350 @@
+"""Registry rate limiting.
+
+This module defines how the requests to each registry are paced, so that large runs
+slow down instead of failing when a registry throttles them:
+
+- A token bucket per registry, which also honours the ``Retry-After`` and
+  ``RateLimit-Remaining`` headers of the registry.
+- An adaptive limit on the number of concurrent requests per registry, which is
+  halved when the registry throttles or its latency spikes, and grows back by one
+  request per round trip otherwise.
+- Exponential backoff with jitter between the retries of a throttled or failed
+  request.
+"""
+
+import contextlib
+import email.utils
+import random
+import re
+import threading
+import time
+from email.message import Message
+from typing import Iterator
+
+from .metrics import METRICS
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+"""The HTTP statuses of the responses that are retried."""
+
+THROTTLE_STATUSES = frozenset({429, 503})
+"""The HTTP statuses of the responses that mean that the registry is overloaded."""
+
+DEFAULT_RATES: dict[str, tuple[float, int]] = {
+    "docker.io": (10.0, 20),
+}
+"""The requests per second and the burst size allowed to registries by default.
+
+Registries that are not listed are not paced until they ask for it.
+"""
+
+_REMAINING = re.compile(r"\s*(\d+)\s*(?:;\s*w=(\d+))?")
+
+
+class RateLimitExceeded(ValueError):
+    """The allowance of a registry is used up for longer than is worth waiting.
+
+    Parameters
+    ----------
+    registry
+        The registry that is rate limited.
+    wait
+        The number of seconds until the registry accepts requests again.
+    """
+
+    def __init__(self, registry: str, wait: float):
+        super().__init__(
+            f"The rate limit of {registry} is exhausted for {wait:.0f} more seconds."
+        )
+        self.registry = registry
+        self.wait = wait
+
+
+def retry_after(headers: Message, now: float | None = None) -> float | None:
+    """Get the number of seconds that a response asks the client to wait.
+
+    Parameters
+    ----------
+    headers
+        The headers of the response.
+    now
+        The current time in seconds since the epoch, for a Retry-After date.
+
+    Returns
+    -------
+        The number of seconds, or None if the response does not say.
+
+    Examples
+    --------
+    >>> retry_after(Message({"Retry-After": "120"}))
+    120.0
+
+    """
+    value = headers.get("Retry-After")
+    if value is None:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = email.utils.parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when - (time.time() if now is None else now))
+
+
+def rate_limit_remaining(headers: Message) -> tuple[int, float | None] | None:
+    """Get the number of requests that a registry still allows.
+
+    Both the form of Docker Hub, ``RateLimit-Remaining: 76;w=21600``, and the form
+    of the IETF draft, ``RateLimit-Remaining: 76`` with ``RateLimit-Reset: 30``, are
+    understood.
+
+    Returns
+    -------
+        The number of requests and the number of seconds until the allowance is
+        reset, if it is known, or None if the response does not say.
+    """
+    match = _REMAINING.match(headers.get("RateLimit-Remaining", ""))
+    if not match:
+        return None
+    remaining, window = match.groups()
+    reset = headers.get("RateLimit-Reset", "").strip()
+    if reset.isdigit():
+        return int(remaining), float(reset)
+    return int(remaining), float(window) if window else None
+
+
+def backoff(attempt: int, base: float = 0.5, cap: float = 30.0) -> float:
+    """Get a random delay before a retry, with exponential backoff and full jitter.
+
+    Parameters
+    ----------
+    attempt
+        The number of retries so far.
+    base
+        The longest delay before the first retry.
+    cap
+        The longest delay before any retry.
+    """
+    return random.uniform(0, min(cap, base * 2**attempt))
+
+
+class TokenBucket:
+    """A token bucket that can be paused.
+
+    Parameters
+    ----------
+    rate
+        The number of tokens added per second. The bucket never runs out if it is
+        None, but it can still be paused.
+    burst
+        The number of tokens that the bucket holds.
+    """
+
+    def __init__(self, rate: float | None = None, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Take a token.
+
+        Returns
+        -------
+            The number of seconds to wait before the token may be used.
+        """
+        with self._lock:
+            now = time.monotonic()
+            wait = max(0.0, self._paused_until - now)
+            if self.rate is None:
+                return wait
+            self._tokens = min(
+                self.burst, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens < 0:
+                wait = max(wait, -self._tokens / self.rate)
+            return wait
+
+    def refund(self) -> None:
+        """Give back a reserved token that will not be used."""
+        with self._lock:
+            if self.rate is not None:
+                self._tokens += 1
+
+    def pause(self, seconds: float) -> None:
+        """Hand out no tokens for a number of seconds."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def limit(self, remaining: int) -> None:
+        """Hold no more tokens than the registry still allows."""
+        with self._lock:
+            self._tokens = min(self._tokens, float(remaining))
+
+
+class AdaptiveLimit:
+    """A concurrency limit that adapts to throttling and latency, like TCP does.
+
+    The limit is halved, at most once per round trip, when a request is throttled
+    or takes much longer than usual, and it grows by one request per round trip
+    otherwise.
+
+    Parameters
+    ----------
+    initial
+        The initial limit.
+    minimum
+        The lowest limit.
+    maximum
+        The highest limit.
+    spike
+        How many times longer than usual a request must take to count as a spike.
+    """
+
+    def __init__(
+        self, initial: int = 4, minimum: int = 1, maximum: int = 16, spike: float = 4.0
+    ):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.spike = spike
+        self.latency: float | None = None
+        self._in_use = 0
+        self._decreased_at = 0.0
+        self._condition = threading.Condition()
+
+    def acquire(self) -> None:
+        """Wait until a request may be sent."""
+        with self._condition:
+            while self._in_use >= int(self.limit):
+                self._condition.wait()
+            self._in_use += 1
+
+    def release(self) -> None:
+        """Mark a request as finished."""
+        with self._condition:
+            self._in_use -= 1
+            self._condition.notify()
+
+    def record(self, latency: float, throttled: bool = False) -> None:
+        """Adapt the limit to the outcome of a request."""
+        with self._condition:
+            spiked = self.latency is not None and latency > self.spike * self.latency
+            if throttled or spiked:
+                now = time.monotonic()
+                if now - self._decreased_at >= (self.latency or 0.0):
+                    self.limit = max(float(self.minimum), self.limit / 2)
+                    self._decreased_at = now
+            else:
+                self.limit = min(float(self.maximum), self.limit + 1 / self.limit)
+            if not throttled:
+                self.latency = (
+                    latency
+                    if self.latency is None
+                    else 0.8 * self.latency + 0.2 * latency
+                )
+            self._condition.notify_all()
+
+
+class RegistryLimits:
+    """The token buckets and concurrency limits of every registry.
+
+    Parameters
+    ----------
+    rates
+        The requests per second and the burst size allowed to each registry.
+        ``DEFAULT_RATES`` by default.
+    max_wait
+        The longest number of seconds that a request waits for its registry to
+        accept requests again. A request that would wait longer fails instead.
+    concurrency
+        The initial number of concurrent requests per registry.
+    max_concurrency
+        The highest number of concurrent requests per registry.
+
+    Examples
+    --------
+    >>> limits = RegistryLimits()
+    >>> with limits.slot("docker.io"):
+    ...     response = send(request)
+    >>> limits.observe("docker.io", response.status, response.headers, latency)
+
+    """
+
+    def __init__(
+        self,
+        rates: dict[str, tuple[float, int]] | None = None,
+        max_wait: float = 60.0,
+        concurrency: int = 4,
+        max_concurrency: int = 16,
+    ):
+        self.rates = DEFAULT_RATES if rates is None else rates
+        self.max_wait = max_wait
+        self.concurrency = concurrency
+        self.max_concurrency = max_concurrency
+        self._buckets: dict[str, TokenBucket] = {}
+        self._limits: dict[str, AdaptiveLimit] = {}
+        self._lock = threading.Lock()
+
+    def _state(self, registry: str) -> tuple[TokenBucket, AdaptiveLimit]:
+        with self._lock:
+            if registry not in self._buckets:
+                self._buckets[registry] = TokenBucket(*self.rates.get(registry, ()))
+                self._limits[registry] = AdaptiveLimit(
+                    self.concurrency, maximum=self.max_concurrency
+                )
+            return self._buckets[registry], self._limits[registry]
+
+    def concurrency_limit(self, registry: str) -> int:
+        """Get the current number of concurrent requests allowed to a registry."""
+        return int(self._state(registry)[1].limit)
+
+    @contextlib.contextmanager
+    def slot(self, registry: str) -> Iterator[None]:
+        """Wait for a token and a concurrency slot of a registry.
+
+        Raises
+        ------
+        RateLimitExceeded
+            If the registry would not accept the request within max_wait seconds.
+        """
+        bucket, limit = self._state(registry)
+        wait = bucket.reserve()
+        if wait > self.max_wait:
+            bucket.refund()
+            raise RateLimitExceeded(registry, wait)
+        if wait:
+            METRICS.count("throttled")
+            with METRICS.stage("throttle"):
+                time.sleep(wait)
+        limit.acquire()
+        try:
+            yield
+        finally:
+            limit.release()
+
+    def observe(
+        self, registry: str, status: int, headers: Message, latency: float
+    ) -> None:
+        """Adapt the pace of a registry to a response from it."""
+        bucket, limit = self._state(registry)
+        limit.record(latency, throttled=status in THROTTLE_STATUSES)
+        delay = retry_after(headers) if status in RETRY_STATUSES else None
+        if delay is not None:
+            bucket.pause(delay)
+        remaining = rate_limit_remaining(headers)
+        if remaining is not None:
+            allowed, reset = remaining
+            if allowed == 0:
+                bucket.pause(reset if reset is not None else self.max_wait)
+            else:
+                bucket.limit(allowed)
+
+
+LIMITS = RegistryLimits()
+"""The limits shared by every lookup of this process."""
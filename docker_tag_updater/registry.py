@@ -0,0 +1,936 @@
+"""Native registry client.
+
+This module defines a pure-Python client for the Docker Registry HTTP API V2. It is a
+drop-in replacement for ``skopeo.inspect`` that keeps pooled keep-alive connections
+per registry instead of spawning a skopeo process for every image.
+"""
+
+import datetime
+import hashlib
+import http.client
+import itertools
+import json
+import re
+import sys
+import threading
+import time
+import urllib.parse
+from typing import Generator, Iterator, NamedTuple
+
+from . import skopeo
+from .auth import TOKENS, TokenCache, docker_credentials
+from .jsonstream import iter_array
+from .metrics import METRICS
+from .ratelimit import (
+    LIMITS,
+    RETRY_STATUSES,
+    RateLimitExceeded,
+    RegistryLimits,
+    backoff,
+)
+from .singleflight import SingleFlight, coalesce
+
+MANIFEST_MEDIA_TYPES: tuple[str, ...] = (
+    "application/vnd.oci.image.index.v1+json",
+    "application/vnd.docker.distribution.manifest.list.v2+json",
+    "application/vnd.oci.image.manifest.v1+json",
+    "application/vnd.docker.distribution.manifest.v2+json",
+)
+"""The manifest media types accepted from a registry, in order of preference."""
+
+INDEX_MEDIA_TYPES: tuple[str, ...] = MANIFEST_MEDIA_TYPES[:2]
+"""The media types of manifests that list other, per-platform manifests."""
+
+REGISTRY_ENDPOINTS: dict[str, str] = {
+    "docker.io": "https://registry-1.docker.io",
+}
+"""Registries whose API is not served from ``https://<registry>``."""
+
+VERSION_ANNOTATION = "org.opencontainers.image.version"
+"""The annotation, and label, that holds the version of an image."""
+
+_REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+_CHALLENGE_PARAM = re.compile(r'(\w+)="([^"]*)"')
+_NEXT_LINK = re.compile(r'<([^>]+)>\s*;\s*rel="?next"?')
+
+
+class RegistryError(ValueError):
+    """An error response from a registry.
+
+    Parameters
+    ----------
+    message
+        A description of the failure.
+    status
+        The HTTP status code of the response, if any.
+    """
+
+    def __init__(self, message: str, status: int | None = None):
+        super().__init__(message)
+        self.status = status
+
+
+_CHUNK_SIZE = 64 * 1024
+
+
+class _Response(NamedTuple):
+    """An HTTP response, fully read unless it is streamed."""
+
+    status: int
+    headers: http.client.HTTPMessage
+    body: bytes
+    chunks: Generator[bytes, None, None] | None = None
+    """The body of a streamed response, which is read as it is iterated."""
+
+
+class _ConnectionPool:
+    """A thread-safe pool of keep-alive connections to a single host.
+
+    Parameters
+    ----------
+    scheme
+        Either http or https.
+    netloc
+        The host, and optionally the port, to connect to.
+    timeout
+        The socket timeout of every connection in seconds.
+    maxsize
+        The number of idle connections that are kept open.
+    """
+
+    def __init__(self, scheme: str, netloc: str, timeout: float, maxsize: int):
+        self._connection_class = (
+            http.client.HTTPSConnection
+            if scheme == "https"
+            else http.client.HTTPConnection
+        )
+        self._netloc = netloc
+        self._timeout = timeout
+        self._maxsize = maxsize
+        self._idle: list[http.client.HTTPConnection] = []
+        self._lock = threading.Lock()
+
+    def acquire(self) -> tuple[http.client.HTTPConnection, bool]:
+        """Get an idle connection, or open a new one.
+
+        Returns
+        -------
+            The connection and whether it has been used before.
+        """
+        with self._lock:
+            if self._idle:
+                return self._idle.pop(), True
+        return self._connection_class(self._netloc, timeout=self._timeout), False
+
+    def release(self, conn: http.client.HTTPConnection, reuse: bool = True) -> None:
+        """Return a connection to the pool, closing it if it cannot be reused."""
+        if reuse:
+            with self._lock:
+                if len(self._idle) < self._maxsize:
+                    self._idle.append(conn)
+                    return
+        conn.close()
+
+    def close(self) -> None:
+        """Close every idle connection."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+
+class RegistryClient:
+    """A registry V2 client with bearer-token authentication and pooled connections.
+
+    Parameters
+    ----------
+    endpoints
+        A mapping of registry names to the base URL of their API, e.g.,
+        ``{"localhost:5000": "http://localhost:5000"}``. Registries that are not
+        listed are reached at ``https://<registry>``.
+    platform
+        The platform whose manifest is selected from multi-platform images, in the
+        form of os/architecture[/variant].
+    timeout
+        The socket timeout of each request in seconds.
+    pool_size
+        The number of idle keep-alive connections kept per host.
+    limits
+        The pace of the requests to each registry. The limits shared by the process,
+        ``ratelimit.LIMITS``, by default.
+    retries
+        The number of times a throttled or failed request is retried.
+    tokens
+        The cache of bearer tokens. The tokens shared by the process,
+        ``auth.TOKENS``, by default.
+    mirror
+        The base URL of a registry mirror that serves every registry under its
+        name, e.g., /v2/ghcr.io/linuxserver/mariadb/manifests/latest, like the
+        caching proxy of ``docker_tag_updater.proxy``. Registries are reached
+        directly if it is not set.
+
+    Examples
+    --------
+    The client can be used as the inspector of ``skopeo.image_version``.
+
+    >>> client = RegistryClient()
+    >>> skopeo.image_version("traefik", inspector=client.inspect)
+    v2.11.0
+
+    """
+
+    def __init__(
+        self,
+        endpoints: dict[str, str] | None = None,
+        platform: str = "linux/amd64",
+        timeout: float = 30.0,
+        pool_size: int = 4,
+        limits: RegistryLimits | None = None,
+        retries: int = 4,
+        tokens: TokenCache | None = None,
+        mirror: str | None = None,
+    ):
+        self.endpoints = {**REGISTRY_ENDPOINTS, **(endpoints or {})}
+        self.platform = platform
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.limits = LIMITS if limits is None else limits
+        self.retries = retries
+        self.tokens = TOKENS if tokens is None else tokens
+        self.mirror = mirror
+        self._pools: dict[tuple[str, str], _ConnectionPool] = {}
+        self._challenges: dict[str, str] = {}
+        self._credentials: dict[str, str | None] = {}
+        self._lock = threading.Lock()
+
+    def close(self) -> None:
+        """Close every pooled connection."""
+        with self._lock:
+            pools, self._pools = list(self._pools.values()), {}
+        for pool in pools:
+            pool.close()
+
+    def _pool(self, scheme: str, netloc: str) -> _ConnectionPool:
+        with self._lock:
+            pool = self._pools.get((scheme, netloc))
+            if pool is None:
+                pool = _ConnectionPool(scheme, netloc, self.timeout, self.pool_size)
+                self._pools[(scheme, netloc)] = pool
+            return pool
+
+    @staticmethod
+    def _read_chunks(
+        pool: _ConnectionPool,
+        conn: http.client.HTTPConnection,
+        resp: http.client.HTTPResponse,
+    ) -> Generator[bytes, None, None]:
+        """Read the body of a response in chunks, releasing its connection after."""
+        finished = False
+        try:
+            while chunk := resp.read(_CHUNK_SIZE):
+                yield chunk
+            finished = True
+        finally:
+            if finished:
+                pool.release(conn, reuse=not resp.will_close)
+            else:
+                conn.close()
+
+    def _send(
+        self, url: str, method: str, headers: dict[str, str], stream: bool = False
+    ) -> _Response:
+        """Send a single request over a pooled connection.
+
+        A reused connection that has been closed by the server in the meantime is
+        retried once on a fresh connection. The body of a successful response is
+        left unread if stream is True, and the connection is only released once it
+        has been read.
+        """
+        parts = urllib.parse.urlsplit(url)
+        pool = self._pool(parts.scheme, parts.netloc)
+        path = parts.path + (f"?{parts.query}" if parts.query else "")
+        while True:
+            conn, reused = pool.acquire()
+            try:
+                # No read outlasts the deadline of the lookup, if it has one
+                conn.timeout = skopeo.time_left(self.timeout)
+                if conn.sock is not None:
+                    conn.sock.settimeout(conn.timeout)
+                with METRICS.stage("request"):
+                    conn.request(method, path, headers=headers)
+                    resp = conn.getresponse()
+                    if stream and resp.status == 200:
+                        chunks = self._read_chunks(pool, conn, resp)
+                        return _Response(resp.status, resp.headers, b"", chunks)
+                    body = resp.read()
+            except (http.client.RemoteDisconnected, ConnectionError):
+                conn.close()
+                if reused:
+                    METRICS.count("retries")
+                    continue
+                raise
+            except BaseException:
+                conn.close()
+                raise
+            pool.release(conn, reuse=not resp.will_close)
+            return _Response(resp.status, resp.headers, body)
+
+    def _send_paced(
+        self,
+        registry: str,
+        url: str,
+        method: str,
+        headers: dict[str, str],
+        stream: bool = False,
+    ) -> _Response:
+        """Send a request at the pace of its registry, retrying it if it fails.
+
+        Throttled and failed requests, i.e., those with a status in
+        ``ratelimit.RETRY_STATUSES``, are retried after the delay that the registry
+        asks for, or after an exponential backoff with jitter. The last response is
+        returned if every retry fails.
+
+        Raises
+        ------
+        RegistryError
+            If the rate limit of the registry is exhausted for too long.
+        """
+        attempt = 0
+        while True:
+            try:
+                with self.limits.slot(registry):
+                    start = time.monotonic()
+                    resp = self._send(url, method, headers, stream)
+            except RateLimitExceeded as exc:
+                raise RegistryError(str(exc), 429) from exc
+            self.limits.observe(
+                registry, resp.status, resp.headers, time.monotonic() - start
+            )
+            if resp.status not in RETRY_STATUSES or attempt >= self.retries:
+                return resp
+            METRICS.count("retries")
+            if resp.headers.get("Retry-After") is None:
+                # Otherwise, the registry has been paused for as long as it asked
+                time.sleep(backoff(attempt))
+            attempt += 1
+
+    def endpoint(self, registry: str) -> str:
+        """Get the base URL of the API of a registry."""
+        return self.endpoints.get(registry, f"https://{registry}").rstrip("/")
+
+    @staticmethod
+    def repository(image: str, registry: str = "docker.io") -> str:
+        """Get the repository name of an image as it is known to the registry.
+
+        Examples
+        --------
+        >>> RegistryClient.repository("alpine")
+        'library/alpine'
+
+        """
+        if registry == "docker.io" and "/" not in image:
+            return f"library/{image}"
+        return image
+
+    def _authenticate(self, registry: str, scope: str, challenge: str) -> str:
+        """Get a bearer token for the scope as requested by a 401 challenge.
+
+        The credentials that ``docker login`` stored for the registry are sent to
+        the token realm, if there are any. The token is stored in the token cache,
+        and the challenge is remembered so that the tokens of other scopes on the
+        registry are requested without being challenged first.
+
+        Raises
+        ------
+        RegistryError
+            If the challenge is not a bearer challenge, or the token cannot be
+            obtained.
+        """
+        scheme, _, params_string = challenge.partition(" ")
+        if scheme.lower() != "bearer":
+            raise RegistryError(
+                f"Unsupported authentication challenge from {registry}: {challenge}",
+                401,
+            )
+        params = dict(_CHALLENGE_PARAM.findall(params_string))
+        if "realm" not in params:
+            raise RegistryError(f"{registry} did not specify a token realm.", 401)
+        query = {"scope": scope}
+        if "service" in params:
+            query["service"] = params["service"]
+        url = f"{params['realm']}?{urllib.parse.urlencode(query)}"
+        with self._lock:
+            if registry not in self._credentials:
+                self._credentials[registry] = docker_credentials(registry)
+            credentials = self._credentials[registry]
+        resp = self._send(
+            url, "GET", {"Authorization": credentials} if credentials else {}
+        )
+        if resp.status != 200:
+            raise RegistryError(
+                f"The token request to {params['realm']} failed.", resp.status
+            )
+        with METRICS.stage("decode"):
+            payload = json.loads(resp.body)
+        token = payload.get("token") or payload.get("access_token")
+        if not token:
+            raise RegistryError(f"{params['realm']} did not grant a token.", 401)
+        try:
+            issued = datetime.datetime.fromisoformat(payload["issued_at"])
+            issued_at: float | None = issued.timestamp()
+        except (KeyError, TypeError, ValueError):
+            issued_at = None
+        self.tokens.set(registry, scope, token, payload.get("expires_in"), issued_at)
+        with self._lock:
+            self._challenges[registry] = challenge
+        return token
+
+    def request(
+        self,
+        registry: str,
+        repository: str,
+        path: str,
+        method: str = "GET",
+        accept: str | None = None,
+        stream: bool = False,
+    ) -> _Response:
+        """Request an API path of a registry, authenticating and following redirects.
+
+        Parameters
+        ----------
+        registry
+            The registry to send the request to.
+        repository
+            The repository that the request is scoped to.
+        path
+            The API path, e.g., /v2/library/alpine/manifests/latest.
+        method
+            The HTTP method.
+        accept
+            The value of the Accept header.
+        stream
+            Leave the body of the successful response unread, to be read from its
+            chunks, if True.
+
+        Returns
+        -------
+            The successful response.
+
+        Raises
+        ------
+        RegistryError
+            If the registry does not respond with 200 OK.
+        """
+        url = self.endpoint(registry) + path
+        pace = registry
+        if self.mirror:
+            url = self.mirror.rstrip("/") + path.replace(
+                f"/v2/{repository}/", f"/v2/{registry}/{repository}/", 1
+            )
+            # The mirror answers from its cache, and paces the registry itself
+            pace = urllib.parse.urlsplit(url).netloc
+        scope = f"repository:{repository}:pull"
+        headers = {"Accept": accept} if accept else {}
+        token = self.tokens.get(registry, scope)
+        if token is None and registry in self._challenges:
+            # Skip the round trip of the challenge that is known to come
+            token = self._authenticate(registry, scope, self._challenges[registry])
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        resp = self._send_paced(pace, url, method, headers, stream)
+        if resp.status == 401:
+            token = self._authenticate(
+                registry, scope, resp.headers.get("WWW-Authenticate", "")
+            )
+            headers["Authorization"] = f"Bearer {token}"
+            METRICS.count("retries")
+            resp = self._send_paced(pace, url, method, headers, stream)
+        for _ in range(5):
+            if resp.status not in _REDIRECT_STATUSES:
+                break
+            location = urllib.parse.urljoin(url, resp.headers["Location"])
+            if urllib.parse.urlsplit(location).netloc != urllib.parse.urlsplit(
+                url
+            ).netloc:
+                # Blob storage behind a redirect must not see the registry token
+                headers.pop("Authorization", None)
+            url = location
+            resp = self._send_paced(pace, url, method, headers, stream)
+        if resp.status != 200:
+            raise RegistryError(
+                f"{method} {url} failed with status {resp.status}.", resp.status
+            )
+        return resp
+
+    def manifest(
+        self, image: str, registry: str = "docker.io", reference: str = "latest"
+    ) -> tuple[dict, str]:
+        """Fetch a manifest, which may be an image index.
+
+        Parameters
+        ----------
+        image
+            The name of the container image.
+        registry
+            The registry hosting the container image.
+        reference
+            A tag or a digest.
+
+        Returns
+        -------
+            The manifest and its digest.
+        """
+        repository = self.repository(image, registry)
+        resp = self.request(
+            registry,
+            repository,
+            f"/v2/{repository}/manifests/{reference}",
+            accept=", ".join(MANIFEST_MEDIA_TYPES),
+        )
+        manifest_digest = resp.headers.get("Docker-Content-Digest") or (
+            f"sha256:{hashlib.sha256(resp.body).hexdigest()}"
+        )
+        with METRICS.stage("decode"):
+            return json.loads(resp.body), manifest_digest
+
+    def digest(
+        self,
+        image: str,
+        registry: str = "docker.io",
+        reference: str = "latest",
+        verbose: bool = False,
+    ) -> str:
+        """Get the digest of a manifest with a HEAD request.
+
+        The manifest is only fetched if the registry does not report the digest.
+
+        Parameters
+        ----------
+        image
+            The name of the container image.
+        registry
+            The registry hosting the container image.
+        reference
+            A tag or a digest.
+        verbose
+            Print out the requests that are made to STDERR if True.
+
+        Returns
+        -------
+            The digest of the manifest, which may be an image index.
+        """
+        if verbose:
+            print(
+                f"Fetching the digest of {registry}/{image}:{reference}",
+                file=sys.stderr,
+            )
+        repository = self.repository(image, registry)
+        resp = self.request(
+            registry,
+            repository,
+            f"/v2/{repository}/manifests/{reference}",
+            method="HEAD",
+            accept=", ".join(MANIFEST_MEDIA_TYPES),
+        )
+        manifest_digest = resp.headers.get("Docker-Content-Digest")
+        if manifest_digest:
+            return manifest_digest
+        return self.manifest(image, registry, reference)[1]
+
+    def blob(self, image: str, registry: str, blob_digest: str) -> bytes:
+        """Fetch a blob by its digest."""
+        repository = self.repository(image, registry)
+        return self.request(
+            registry, repository, f"/v2/{repository}/blobs/{blob_digest}"
+        ).body
+
+    def iter_tags(
+        self,
+        image: str,
+        registry: str = "docker.io",
+        verbose: bool = False,
+        page_size: int = 1000,
+        last: str | None = None,
+    ) -> Iterator[str]:
+        """Yield every tag of an image as it is read, following the pagination.
+
+        The tag list responses are parsed as they are streamed from the registry, so
+        that memory stays flat however many tags a repository has.
+
+        Parameters
+        ----------
+        image
+            The name of the container image.
+        registry
+            The registry hosting the container image.
+        verbose
+            Print out the requests that are made to STDERR if True.
+        page_size
+            The number of tags requested per page.
+        last
+            Only list the tags that sort lexically after this tag, as the registry
+            sorts them, if given.
+
+        Raises
+        ------
+        RegistryError
+            If a page of tags cannot be fetched.
+        ValueError
+            If a page of tags is not valid JSON.
+        """
+        repository = self.repository(image, registry)
+        query = {"n": str(page_size)}
+        if last:
+            query["last"] = last
+        path: str | None = (
+            f"/v2/{repository}/tags/list?{urllib.parse.urlencode(query)}"
+        )
+        while path:
+            if verbose:
+                print(
+                    f"Listing the tags of {registry}/{image}: {path}", file=sys.stderr
+                )
+            resp = self.request(registry, repository, path, stream=True)
+            link = _NEXT_LINK.search(resp.headers.get("Link", ""))
+            chunks = resp.chunks or iter([resp.body])
+            yield from iter_array(chunks, "tags")
+            # Read to the end of the body, so that the connection can be reused
+            for _ in chunks:
+                pass
+            if link:
+                next_url = urllib.parse.urlsplit(link[1])
+                path = next_url.path + (f"?{next_url.query}" if next_url.query else "")
+            else:
+                path = None
+
+    def list_tags(
+        self,
+        image: str,
+        registry: str = "docker.io",
+        verbose: bool = False,
+        page_size: int = 1000,
+        last: str | None = None,
+    ) -> list[str]:
+        """List every tag of an image, following the pagination of the registry.
+
+        Returns
+        -------
+            Every tag of the container image, or those after last.
+
+        See also
+        --------
+        iter_tags : For the parameters.
+
+        """
+        return list(self.iter_tags(image, registry, verbose, page_size, last))
+
+    def platform_entry(self, index: dict) -> dict:
+        """Select the descriptor of the manifest for this client's platform.
+
+        Raises
+        ------
+        RegistryError
+            If the index does not list a manifest for the platform.
+        """
+        os_name, arch, *variant = self.platform.split("/")
+        for entry in index.get("manifests", []):
+            platform = entry.get("platform", {})
+            if (
+                platform.get("os") == os_name
+                and platform.get("architecture") == arch
+                and (not variant or platform.get("variant") == variant[0])
+            ):
+                return entry
+        raise RegistryError(f"No manifest is available for {self.platform}.", 404)
+
+    def select_platform(self, index: dict) -> str:
+        """Select the digest of the manifest for this client's platform."""
+        return self.platform_entry(index)["digest"]
+
+    def inspect(
+        self,
+        image: str,
+        registry: str = "docker.io",
+        base_tag: str = "latest",
+        verbose: bool = False,
+    ) -> dict:
+        """Fetch the image configuration, like 'skopeo inspect --config' does.
+
+        The manifests are read first. If the index, the descriptor of the platform
+        manifest or the platform manifest itself is annotated with
+        ``VERSION_ANNOTATION``, the configuration is not fetched and only its
+        version label is filled in from the annotation. Otherwise the configuration
+        of the selected platform, and only that, is fetched.
+
+        Parameters
+        ----------
+        image
+            The name of the container image.
+        registry
+            The registry hosting the container image.
+        base_tag
+            The tag of the container image.
+        verbose
+            Print out the requests that are made to STDERR if True.
+
+        Returns
+        -------
+        dict
+            The image configuration as a dictionary. The manifest digest of the tag is
+            added to it as Digest, like 'skopeo inspect' reports it.
+
+        Raises
+        ------
+        RegistryError
+            If the registry does not serve the image.
+        ValueError
+            If the image configuration is empty or invalid.
+        """
+        if verbose:
+            print(
+                f"Fetching the manifest of {registry}/{image}:{base_tag}",
+                file=sys.stderr,
+            )
+        manifest, manifest_digest = self.manifest(image, registry, base_tag)
+        annotations = dict(manifest.get("annotations") or {})
+        if manifest.get("mediaType") in INDEX_MEDIA_TYPES or "manifests" in manifest:
+            entry = self.platform_entry(manifest)
+            annotations = {**(entry.get("annotations") or {}), **annotations}
+            if VERSION_ANNOTATION not in annotations:
+                manifest, _ = self.manifest(image, registry, entry["digest"])
+                annotations.update(manifest.get("annotations") or {})
+        version = annotations.get(VERSION_ANNOTATION)
+        if version:
+            labels = {VERSION_ANNOTATION: version}
+            return {"config": {"Labels": labels}, "Digest": manifest_digest}
+
+        if verbose:
+            print(
+                f"Fetching the configuration of {registry}/{image}:{base_tag}",
+                file=sys.stderr,
+            )
+        try:
+            config_digest = manifest["config"]["digest"]
+            body = self.blob(image, registry, config_digest)
+            with METRICS.stage("decode"):
+                config = json.loads(body)
+        except (KeyError, TypeError, json.JSONDecodeError) as exc:
+            raise ValueError(
+                f"The registry response for {registry}/{image}:{base_tag} is invalid."
+            ) from exc
+        if not config:
+            raise ValueError(
+                f"The registry response for {registry}/{image}:{base_tag} is invalid."
+            )
+        config.setdefault("Digest", manifest_digest)
+        return config
+
+
+_default_client: RegistryClient | None = None
+_default_client_lock = threading.Lock()
+
+
+def default_client() -> RegistryClient:
+    """Get the client that is shared by every lookup of this process."""
+    global _default_client  # pylint: disable=global-statement
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = RegistryClient()
+        return _default_client
+
+
+def inspect(
+    image: str,
+    registry: str = "docker.io",
+    base_tag: str = "latest",
+    verbose: bool = False,
+) -> dict:
+    """Inspect an image natively, falling back to 'skopeo inspect'.
+
+    The shared ``default_client`` is tried first. Skopeo is only run when the
+    registry cannot be reached or spoken to natively, e.g., because it requires
+    credentials that skopeo knows about. An image that the registry reports as
+    missing, or a registry whose rate limit is exhausted, is not retried with skopeo.
+
+    Parameters
+    ----------
+    image
+        The name of the container image.
+    registry
+        The registry hosting the container image.
+    base_tag
+        The tag of the container image.
+    verbose
+        Print out the error messages from the registry and skopeo to STDERR if True.
+
+    Returns
+    -------
+    dict
+        The image configuration as a dictionary.
+
+    See also
+    --------
+    docker_tag_updater.skopeo.inspect : For the fallback inspector.
+
+    """
+    try:
+        return default_client().inspect(image, registry, base_tag, verbose)
+    except RegistryError as exc:
+        if exc.status in (404, 429):
+            raise
+        reason: Exception = exc
+    except (OSError, http.client.HTTPException, ValueError) as exc:
+        reason = exc
+    METRICS.count("fallbacks")
+    if verbose:
+        print(f"Falling back to skopeo: {reason}", file=sys.stderr)
+    return skopeo.inspect(image, registry, base_tag, verbose)
+
+
+def list_tags(
+    image: str,
+    registry: str = "docker.io",
+    verbose: bool = False,
+) -> list[str]:
+    """List the tags of an image natively, falling back to 'skopeo list-tags'.
+
+    Parameters
+    ----------
+    image
+        The name of the container image.
+    registry
+        The registry hosting the container image.
+    verbose
+        Print out the error messages from the registry and skopeo to STDERR if True.
+
+    Returns
+    -------
+        Every tag of the container image.
+
+    See also
+    --------
+    inspect : For when skopeo is used as the fallback.
+
+    """
+    try:
+        return default_client().list_tags(image, registry, verbose)
+    except RegistryError as exc:
+        if exc.status in (404, 429):
+            raise
+        reason: Exception = exc
+    except (OSError, http.client.HTTPException, ValueError) as exc:
+        reason = exc
+    METRICS.count("fallbacks")
+    if verbose:
+        print(f"Falling back to skopeo: {reason}", file=sys.stderr)
+    return skopeo.list_tags(image, registry, verbose)
+
+
+def iter_tags(
+    image: str,
+    registry: str = "docker.io",
+    verbose: bool = False,
+) -> Iterator[str]:
+    """Stream the tags of an image natively, falling back to 'skopeo list-tags'.
+
+    The first page of tags is requested before this returns, so that skopeo is only
+    run if the registry cannot be spoken to natively at all. A listing that fails
+    after that raises a ``RegistryError`` while it is iterated.
+
+    Returns
+    -------
+        The tags of the container image, as they are read.
+
+    See also
+    --------
+    list_tags : For the parameters, and the fallback.
+
+    """
+    tags = default_client().iter_tags(image, registry, verbose)
+    try:
+        first = next(tags, None)
+    except RegistryError as exc:
+        if exc.status in (404, 429):
+            raise
+        reason: Exception = exc
+    except (OSError, http.client.HTTPException, ValueError) as exc:
+        reason = exc
+    else:
+        return iter(()) if first is None else itertools.chain([first], tags)
+    METRICS.count("fallbacks")
+    if verbose:
+        print(f"Falling back to skopeo: {reason}", file=sys.stderr)
+    return iter(skopeo.list_tags(image, registry, verbose))
+
+
+def digest(
+    image: str,
+    registry: str = "docker.io",
+    reference: str = "latest",
+    verbose: bool = False,
+) -> str:
+    """Get the digest of a manifest natively, falling back to 'skopeo inspect'.
+
+    Returns
+    -------
+        The digest of the manifest.
+
+    See also
+    --------
+    inspect : For the parameters, and the fallback.
+
+    """
+    try:
+        return default_client().digest(image, registry, reference, verbose)
+    except RegistryError as exc:
+        if exc.status in (404, 429):
+            raise
+        reason: Exception = exc
+    except (OSError, http.client.HTTPException, ValueError) as exc:
+        reason = exc
+    METRICS.count("fallbacks")
+    if verbose:
+        print(f"Falling back to skopeo: {reason}", file=sys.stderr)
+    return skopeo.digest(image, registry, reference, verbose)
+
+
+IN_FLIGHT = SingleFlight()
+"""The lookups of the backends that are in flight in this process."""
+
+INSPECTORS = {
+    "native": coalesce(inspect, IN_FLIGHT),
+    "skopeo": coalesce(skopeo.inspect, IN_FLIGHT),
+}
+"""The inspection backends by name.
+
+Concurrent lookups of the same image and base tag share a single request.
+"""
+
+LISTERS = {
+    "native": coalesce(list_tags, IN_FLIGHT),
+    "skopeo": coalesce(skopeo.list_tags, IN_FLIGHT),
+}
+"""The tag listing backends by name.
+
+Concurrent listings of the same image share a single request.
+"""
+
+DIGESTERS = {
+    "native": coalesce(digest, IN_FLIGHT),
+    "skopeo": coalesce(skopeo.digest, IN_FLIGHT),
+}
+"""The manifest digest backends by name.
+
+Concurrent lookups of the same tag share a single request.
+"""
+
+TAG_STREAMS = {
+    "native": iter_tags,
+    "skopeo": skopeo.list_tags,
+}
+"""The tag listing backends by name, for callers that read the tags once.
+
+The native backend parses the tags as they arrive instead of holding the whole tag
+list. Listings are not shared between concurrent callers, since a stream can only be
+read once.
+"""
@@ -0,0 +1,264 @@
+"""Record and replay of registry responses.
+
+This module defines an archive of the responses of inspectors, tag listers and
+digesters, so that a run against live registries can be recorded once and replayed
+later without any network, e.g., in CI. The archive is a gzip-compressed JSON file
+that is written deterministically, so that it can be committed next to the Compose
+files it is for.
+
+Examples
+--------
+Record the responses of a run,
+
+>>> archive = ResponseArchive()
+>>> skopeo.image_version("traefik", inspector=archive.recorder(registry.inspect))
+v2.11.0
+>>> archive.save("fixtures.json.gz")
+
+and replay them.
+
+>>> archive = ResponseArchive("fixtures.json.gz")
+>>> skopeo.image_version("traefik", inspector=archive.inspect)
+v2.11.0
+"""
+
+import functools
+import gzip
+import json
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, Callable
+
+
+class MissingResponse(ValueError):
+    """The archive has no response for a lookup."""
+
+
+def _essentials(response: Any) -> Any:
+    """Keep only the labels and the digest of an inspector response.
+
+    A response without labels is kept whole, so that it fails the same way when it
+    is replayed.
+    """
+    try:
+        essentials = {"config": {"Labels": response["config"]["Labels"]}}
+    except (KeyError, TypeError):
+        return response
+    if "Digest" in response:
+        essentials["Digest"] = response["Digest"]
+    return essentials
+
+
+class ResponseArchive:
+    """A thread-safe archive of recorded inspector, tag lister and digester responses.
+
+    The inspector responses and digests are kept by registry, image and tag, and the
+    tag lists by registry and image. A lookup that failed is kept as its error message,
+    and fails again with a ValueError when it is replayed.
+
+    Parameters
+    ----------
+    path
+        Load the responses that are recorded in this file if given.
+    """
+
+    def __init__(self, path: str | Path | None = None):
+        self.inspections: dict[str, dict[str, Any]] = {}
+        self.tag_lists: dict[str, dict[str, Any]] = {}
+        self.digests: dict[str, dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        if path is not None:
+            self.load(path)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self.inspections) + len(self.tag_lists) + len(self.digests)
+
+    def load(self, path: str | Path) -> None:
+        """Add the responses that are recorded in a file.
+
+        Raises
+        ------
+        OSError
+            If the file cannot be read.
+        ValueError
+            If the file is not an archive of responses.
+        """
+        with gzip.open(path, "rt", encoding="utf-8") as archive_file:
+            try:
+                data = json.load(archive_file)
+                inspections, tag_lists = data["inspect"], data["list_tags"]
+                # Older archives have no digests
+                digests = data.get("digest", {})
+            except (KeyError, TypeError) as exc:
+                raise ValueError(f"{path} is not an archive of responses.") from exc
+        with self._lock:
+            self.inspections.update(inspections)
+            self.tag_lists.update(tag_lists)
+            self.digests.update(digests)
+
+    def save(self, path: str | Path) -> None:
+        """Write every response to a file, replacing it atomically."""
+        path = Path(path)
+        with self._lock:
+            data = {
+                "inspect": self.inspections,
+                "list_tags": self.tag_lists,
+                "digest": self.digests,
+            }
+            body = json.dumps(data, sort_keys=True, separators=(",", ":")).encode()
+        fd, temp_path = tempfile.mkstemp(
+            dir=path.parent, prefix=f".{path.name}.", suffix=".tmp"
+        )
+        try:
+            with os.fdopen(fd, "wb") as temp_file, gzip.GzipFile(
+                fileobj=temp_file, mode="wb", mtime=0
+            ) as archive_file:
+                archive_file.write(body)
+            # The archive is meant to be shared, unlike the files of mkstemp
+            os.chmod(temp_path, path.stat().st_mode if path.exists() else 0o644)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    def _store(
+        self,
+        entries: dict,
+        key: str,
+        func: Callable,
+        *args: Any,
+        keep: Callable[[Any], Any] = lambda result: result,
+    ) -> Any:
+        try:
+            result = func(*args)
+        except ValueError as exc:
+            with self._lock:
+                entries[key] = {"error": str(exc)}
+            raise
+        with self._lock:
+            entries[key] = {"result": keep(result)}
+        return result
+
+    def recorder(self, inspector: Callable) -> Callable:
+        """Wrap an inspector so that its responses are recorded.
+
+        Only the labels and the digest of each response are recorded, which is all
+        that a lookup reads from it. The lookups must not be served by a
+        ``MetadataCache`` while they are recorded, or they are missing from the
+        archive.
+        """
+
+        @functools.wraps(inspector)
+        def recorded(
+            image: str,
+            registry: str = "docker.io",
+            base_tag: str = "latest",
+            verbose: bool = False,
+        ) -> dict:
+            key = f"{registry}/{image}:{base_tag}"
+            return self._store(
+                self.inspections,
+                key,
+                inspector,
+                image,
+                registry,
+                base_tag,
+                verbose,
+                keep=_essentials,
+            )
+
+        return recorded
+
+    def list_recorder(self, lister: Callable) -> Callable:
+        """Wrap a tag lister so that its responses are recorded."""
+
+        @functools.wraps(lister)
+        def recorded(
+            image: str, registry: str = "docker.io", verbose: bool = False
+        ) -> list[str]:
+            key = f"{registry}/{image}"
+            return self._store(self.tag_lists, key, lister, image, registry, verbose)
+
+        return recorded
+
+    def digest_recorder(self, digester: Callable) -> Callable:
+        """Wrap a digester so that its responses are recorded."""
+
+        @functools.wraps(digester)
+        def recorded(
+            image: str,
+            registry: str = "docker.io",
+            reference: str = "latest",
+            verbose: bool = False,
+        ) -> str:
+            key = f"{registry}/{image}:{reference}"
+            return self._store(
+                self.digests, key, digester, image, registry, reference, verbose
+            )
+
+        return recorded
+
+    def _replay(self, entries: dict, key: str) -> Any:
+        with self._lock:
+            entry = entries.get(key)
+        if entry is None:
+            raise MissingResponse(f"No response for {key} is recorded.")
+        if "error" in entry:
+            raise ValueError(entry["error"])
+        return entry["result"]
+
+    def inspect(
+        self,
+        image: str,
+        registry: str = "docker.io",
+        base_tag: str = "latest",
+        verbose: bool = False,  # pylint: disable=unused-argument
+    ) -> dict:
+        """Replay the response of an inspector, like ``skopeo.inspect`` returns it.
+
+        Raises
+        ------
+        MissingResponse
+            If no response is recorded for the image.
+        ValueError
+            If the recorded lookup failed.
+        """
+        return self._replay(self.inspections, f"{registry}/{image}:{base_tag}")
+
+    def list_tags(
+        self,
+        image: str,
+        registry: str = "docker.io",
+        verbose: bool = False,  # pylint: disable=unused-argument
+    ) -> list[str]:
+        """Replay the response of a tag lister, like ``skopeo.list_tags`` returns it.
+
+        Raises
+        ------
+        MissingResponse
+            If no tag list is recorded for the image.
+        ValueError
+            If the recorded listing failed.
+        """
+        return self._replay(self.tag_lists, f"{registry}/{image}")
+
+    def digest(
+        self,
+        image: str,
+        registry: str = "docker.io",
+        reference: str = "latest",
+        verbose: bool = False,  # pylint: disable=unused-argument
+    ) -> str:
+        """Replay the response of a digester, like ``skopeo.digest`` returns it.
+
+        Raises
+        ------
+        MissingResponse
+            If no digest is recorded for the tag.
+        ValueError
+            If the recorded lookup failed.
+        """
+        return self._replay(self.digests, f"{registry}/{image}:{reference}")
@@ -0,0 +1,138 @@
+"""Persistent scan index.
+
+This module defines an index of the Compose/Stack files that have been scanned, with
+the image references that were found in each of them, so that a rescan of a large
+tree only reads and parses the files that changed since the last scan. A file is
+trusted to be unchanged while its size and modification time are, and a file whose
+modification time changed, e.g., after a checkout, is only parsed again if its
+contents changed too.
+"""
+
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Iterable, NamedTuple, Sequence
+
+from .cache import default_cache_dir
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    sha256 TEXT NOT NULL,
+    image_references TEXT NOT NULL
+);
+"""
+
+
+class ScannedFile(NamedTuple):
+    """The state of a file when it was last scanned."""
+
+    size: int
+    """The size of the file in bytes."""
+    mtime_ns: int
+    """The modification time of the file in nanoseconds since the epoch."""
+    sha256: str
+    """The SHA-256 digest of the contents of the file."""
+    references: Sequence[tuple[str, int, int, int]]
+    """The fields of every ``compose.ImageReference`` in the file."""
+
+
+class ScanIndex:
+    """The scanned files of every directory tree, kept in an SQLite database.
+
+    Parameters
+    ----------
+    path
+        The path of the SQLite database. Defaults to scan.sqlite3 in
+        ``cache.default_cache_dir()``.
+
+    Examples
+    --------
+    >>> with ScanIndex() as index:
+    ...     compose.scan("stacks", scan_index=index)
+
+    """
+
+    def __init__(self, path: str | Path | None = None):
+        if path is None:
+            path = default_cache_dir() / "scan.sqlite3"
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        """Close the database."""
+        with self._lock:
+            self._db.close()
+
+    def __enter__(self) -> "ScanIndex":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+
+    def get(self, path: str) -> ScannedFile | None:
+        """Get the state of a file when it was last scanned, if it was."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT size, mtime_ns, sha256, image_references FROM files"
+                " WHERE path = ?",
+                (path,),
+            ).fetchone()
+        if row is None:
+            return None
+        size, mtime_ns, sha256, references = row
+        return ScannedFile(
+            size, mtime_ns, sha256, [tuple(fields) for fields in json.loads(references)]
+        )
+
+    def put(self, path: str, scanned: ScannedFile) -> None:
+        """Store the state of a file that has just been scanned."""
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)",
+                (
+                    path,
+                    scanned.size,
+                    scanned.mtime_ns,
+                    scanned.sha256,
+                    json.dumps(scanned.references),
+                ),
+            )
+
+    def prune(self, root: str, paths: Iterable[str]) -> None:
+        """Remove the files of a directory tree that were not found in it any more.
+
+        Parameters
+        ----------
+        root
+            The directory tree, as an absolute path.
+        paths
+            The paths of the files that are still in the tree.
+        """
+        prefix = root.rstrip("/") + "/"
+        keep = set(paths)
+        with self._lock, self._db:
+            indexed = self._db.execute(
+                "SELECT path FROM files WHERE substr(path, 1, ?) = ?",
+                (len(prefix), prefix),
+            ).fetchall()
+            self._db.executemany(
+                "DELETE FROM files WHERE path = ?",
+                [(path,) for (path,) in indexed if path not in keep],
+            )
+
+    def clear(self) -> None:
+        """Remove every file."""
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM files")
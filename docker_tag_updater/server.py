@@ -0,0 +1,530 @@
+"""Resolver server.
+
+This module defines a long-lived process that resolves the newest tags of images for
+image-version-checker over a local Unix socket. The server keeps its registry
+connections, bearer tokens, metadata caches and memoized version keys between
+requests, so a short check does not pay for the interpreter startup and the imports
+again. The command line tool forwards its work to the server when it is running, and
+resolves the images in-process when it is not.
+
+The protocol is line-delimited JSON, with a single request per connection. A request is
+``{"images": [...], "options": {...}}``, where the options are the keyword arguments
+of ``Resolver.resolve``, and the response is ``{"results": [[image, newest, error],
+...]}`` or ``{"error": message}``. A request with ``"stream": true`` is answered
+with a line of ``{"index": ..., "record": {...}}`` for every image instead, as soon
+as it is resolved.
+
+Start the server with::
+
+    python -m docker_tag_updater.server
+"""
+# pylint: disable=import-outside-toplevel
+
+import json
+import os
+import signal
+import socket
+import socketserver
+import sys
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Callable, Iterable, Iterator, NamedTuple
+
+if TYPE_CHECKING:
+    from .cache import MetadataCache
+    from .tagsync import TagSync
+
+_OPTIONS = frozenset(
+    {
+        "base_tag",
+        "rule",
+        "backend",
+        "list_tags",
+        "jobs",
+        "per_registry",
+        "cache",
+        "cache_ttl",
+        "cache_error_ttl",
+        "cache_size",
+        "tag_store",
+        "policies",
+        "deadline",
+        "priorities",
+        "match_digest",
+    }
+)
+
+
+class ServerError(ValueError):
+    """An error response from the resolver server."""
+
+
+class Resolution(NamedTuple):
+    """The outcome of checking a single image.
+
+    Exactly one of newest and error is set.
+    """
+
+    image: str
+    """The image string as it was given."""
+    newest: str | None = None
+    """The image string with the newest tag, if it was found."""
+    error: str | None = None
+    """The reason that the newest tag could not be found."""
+
+
+class Record(NamedTuple):
+    """The details of checking a single image, as they are streamed.
+
+    Exactly one of newest and error is set.
+    """
+
+    image: str
+    """The image string as it was given."""
+    registry: str
+    """The registry hosting the container image."""
+    name: str
+    """The name of the container image."""
+    tag: str
+    """The current tag of the container image."""
+    version: str | None = None
+    """The version that was found, if any."""
+    newest: str | None = None
+    """The image string with the newest tag, if it was found."""
+    rule: str = "default"
+    """The rule that the versions were compared with."""
+    seconds: float = 0.0
+    """The number of seconds from the start of the run until the image resolved."""
+    error: str | None = None
+    """The reason that the newest tag could not be found."""
+
+    def resolution(self) -> Resolution:
+        """Get the outcome of the check."""
+        return Resolution(self.image, self.newest, self.error)
+
+
+def default_socket_path() -> str:
+    """Get the path of the socket of the resolver server.
+
+    This is ``$DOCKER_TAG_UPDATER_SOCKET`` if it is set, or
+    ``$XDG_RUNTIME_DIR/docker-tag-updater.sock``, or
+    ``/tmp/docker-tag-updater-<uid>.sock`` if XDG_RUNTIME_DIR is not set either.
+    """
+    if os.environ.get("DOCKER_TAG_UPDATER_SOCKET"):
+        return os.environ["DOCKER_TAG_UPDATER_SOCKET"]
+    if os.environ.get("XDG_RUNTIME_DIR"):
+        return os.path.join(os.environ["XDG_RUNTIME_DIR"], "docker-tag-updater.sock")
+    return os.path.join(
+        os.environ.get("TMPDIR", "/tmp"), f"docker-tag-updater-{os.getuid()}.sock"
+    )
+
+
+class Resolver:
+    """Resolve the newest tags of images, keeping state between calls.
+
+    Parameters
+    ----------
+    inspectors
+        The inspection backends by name. Those of ``registry.INSPECTORS`` by default.
+    listers
+        The tag listing backends by name. Those of ``registry.TAG_STREAMS`` by
+        default.
+    digesters
+        The manifest digest backends by name. Those of ``registry.DIGESTERS`` by
+        default.
+
+    Examples
+    --------
+    >>> with Resolver() as resolver:
+    ...     resolver.resolve(["traefik:v2.10.0"])
+    [Resolution(image='traefik:v2.10.0', newest='traefik:v2.11.0', error=None)]
+
+    """
+
+    def __init__(
+        self,
+        inspectors: dict[str, Callable] | None = None,
+        listers: dict[str, Callable] | None = None,
+        digesters: dict[str, Callable] | None = None,
+    ):
+        if inspectors is None or listers is None or digesters is None:
+            from . import registry
+
+            inspectors = registry.INSPECTORS if inspectors is None else inspectors
+            listers = registry.TAG_STREAMS if listers is None else listers
+            digesters = registry.DIGESTERS if digesters is None else digesters
+        self.inspectors = inspectors
+        self.listers = listers
+        self.digesters = digesters
+        self._caches: dict[tuple, "MetadataCache"] = {}
+        self._tag_syncs: dict[str, "TagSync"] = {}
+        self._lock = threading.Lock()
+
+    def close(self) -> None:
+        """Close every metadata cache and tag store that has been opened."""
+        with self._lock:
+            caches, self._caches = list(self._caches.values()), {}
+            tag_syncs, self._tag_syncs = list(self._tag_syncs.values()), {}
+        for metadata_cache in caches:
+            metadata_cache.close()
+        for tag_sync in tag_syncs:
+            tag_sync.store.close()
+
+    def __enter__(self) -> "Resolver":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _cache(
+        self, path: str, ttl: float, error_ttl: float, max_entries: int
+    ) -> "MetadataCache":
+        from .cache import MetadataCache
+
+        key = (path, ttl, error_ttl, max_entries)
+        with self._lock:
+            if key not in self._caches:
+                self._caches[key] = MetadataCache(
+                    path or None, ttl=ttl, error_ttl=error_ttl, max_entries=max_entries
+                )
+            return self._caches[key]
+
+    def _tag_sync(self, path: str) -> "TagSync":
+        from .tagsync import TagStore, TagSync
+
+        with self._lock:
+            if path not in self._tag_syncs:
+                self._tag_syncs[path] = TagSync(TagStore(path or None))
+            return self._tag_syncs[path]
+
+    def iter_resolve(
+        self,
+        images: Iterable[str],
+        base_tag: str = "latest",
+        rule: str = "default",
+        backend: str = "native",
+        list_tags: bool = False,
+        jobs: int = 8,
+        per_registry: int = 4,
+        cache: str | None = None,
+        cache_ttl: float = 3600,
+        cache_error_ttl: float = 300,
+        cache_size: int = 10000,
+        tag_store: str | None = None,
+        policies: dict[str, str] | None = None,
+        deadline: float | None = None,
+        priorities: dict[str, int] | None = None,
+        match_digest: bool = False,
+        verbose: bool = False,
+    ) -> Iterator[tuple[int, Record]]:
+        """Find the newest tagged image of each image, as soon as it is found.
+
+        The parameters are those of image-version-checker.
+
+        Yields
+        ------
+            The position of each image in images, and its record, in the order that
+            the images are resolved.
+
+        See also
+        --------
+        docker_tag_updater.parser.ivc_parser : For the meaning of the parameters.
+
+        """
+        import functools
+
+        from . import skopeo
+        from .policy import parse_policies
+
+        start = time.monotonic()
+        lister = None
+        if list_tags:
+            lister = self.listers[backend]
+            if tag_store is not None and backend == "native":
+                lister = self._tag_sync(tag_store).list_tags
+        matcher = None
+        if match_digest:
+            matcher = functools.partial(
+                skopeo.matching_version,
+                digester=self.digesters[backend],
+                lister=self.listers[backend],
+                rule=rule,
+                max_workers=per_registry,
+            )
+        results = skopeo.iter_image_versions(
+            images,
+            base_tag=base_tag,
+            inspector=self.inspectors[backend],
+            max_workers=jobs,
+            per_registry=per_registry,
+            verbose=verbose,
+            cache=(
+                None
+                if cache is None
+                else self._cache(cache, cache_ttl, cache_error_ttl, cache_size)
+            ),
+            lister=lister,
+            rule=rule,
+            policies=None if policies is None else parse_policies(policies),
+            deadline=deadline,
+            priorities=priorities,
+            matcher=matcher,
+        )
+
+        for index, result in results:
+            record = Record(
+                result.image,
+                result.registry,
+                result.name,
+                result.tag,
+                result.version,
+                rule=rule,
+                seconds=round(time.monotonic() - start, 6),
+            )
+            if result.version is None:
+                yield index, record._replace(error=str(result.error))
+                continue
+            try:
+                newest_tag = skopeo.compare_versions(
+                    source_ver=result.tag, target_ver=result.version, rule=rule
+                )
+            except ValueError as exc:
+                yield index, record._replace(error=str(exc))
+                continue
+            yield index, record._replace(
+                newest=result.image.replace(result.tag, newest_tag)
+            )
+
+    def resolve(self, images: Iterable[str], **options: Any) -> list[Resolution]:
+        """Find the newest tagged image of each image.
+
+        Returns
+        -------
+            The resolutions in the same order as the images.
+
+        See also
+        --------
+        iter_resolve : For the parameters.
+
+        """
+        records = dict(self.iter_resolve(images, **options))
+        return [records[index].resolution() for index in range(len(records))]
+
+
+def forward(
+    images: list[str],
+    options: dict[str, Any],
+    path: str | None = None,
+    timeout: float | None = None,
+) -> list[Resolution]:
+    """Resolve images on the resolver server.
+
+    Parameters
+    ----------
+    images
+        The container images possibly with the registry and tag included.
+    options
+        The keyword arguments of ``Resolver.resolve``, apart from verbose. A cache
+        path must be absolute.
+    path
+        The path of the socket of the server. ``default_socket_path`` by default.
+    timeout
+        The number of seconds to wait for the server. There is no limit by default.
+
+    Returns
+    -------
+        The resolutions in the same order as the images.
+
+    Raises
+    ------
+    OSError
+        If no server is listening on the socket.
+    ServerError
+        If the server rejects the request, or its response is invalid.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(path or default_socket_path())
+        sock.sendall(json.dumps({"images": images, "options": options}).encode())
+        sock.sendall(b"\n")
+        with sock.makefile("rb") as response_file:
+            line = response_file.readline()
+    try:
+        response = json.loads(line)
+        if "error" in response:
+            raise ServerError(response["error"])
+        return [Resolution(*result) for result in response["results"]]
+    except (KeyError, TypeError, json.JSONDecodeError) as exc:
+        raise ServerError("The response of the resolver server is invalid.") from exc
+
+
+def stream(
+    images: list[str],
+    options: dict[str, Any],
+    path: str | None = None,
+    timeout: float | None = None,
+) -> Iterator[tuple[int, Record]]:
+    """Resolve images on the resolver server, as soon as each of them is resolved.
+
+    The request is sent before this returns, so that a server that is not running
+    is noticed before any record is read.
+
+    Returns
+    -------
+        The position of each image in images and its record, in the order that the
+        images are resolved.
+
+    Raises
+    ------
+    OSError
+        If no server is listening on the socket.
+    ServerError
+        If the server rejects the request, or its response is invalid, while the
+        records are read.
+
+    See also
+    --------
+    forward : For the parameters.
+
+    """
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.settimeout(timeout)
+        sock.connect(path or default_socket_path())
+        request = {"images": images, "options": options, "stream": True}
+        sock.sendall(json.dumps(request).encode() + b"\n")
+    except BaseException:
+        sock.close()
+        raise
+
+    def records() -> Iterator[tuple[int, Record]]:
+        with sock, sock.makefile("rb") as response_file:
+            for _ in images:
+                try:
+                    response = json.loads(response_file.readline())
+                    if "error" in response:
+                        raise ServerError(response["error"])
+                    record = Record(**response["record"])
+                    index = response["index"]
+                except (KeyError, TypeError, json.JSONDecodeError) as exc:
+                    raise ServerError(
+                        "The response of the resolver server is invalid."
+                    ) from exc
+                yield index, record
+
+    return records()
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    """Answer a single request."""
+
+    server: "ResolverServer"
+
+    def _stream(self, images: list[str], options: dict[str, Any]) -> None:
+        """Write a line for every image as soon as it is resolved."""
+        try:
+            for index, record in self.server.resolver.iter_resolve(images, **options):
+                line = {"index": index, "record": record._asdict()}
+                self.wfile.write(json.dumps(line).encode() + b"\n")
+                self.wfile.flush()
+        except (KeyError, TypeError, ValueError) as exc:
+            error = {"error": f"Invalid request: {exc!r}"}
+            self.wfile.write(json.dumps(error).encode() + b"\n")
+
+    def handle(self) -> None:
+        try:
+            request = json.loads(self.rfile.readline())
+            images = request["images"]
+            options = request.get("options", {})
+            unknown = set(options) - _OPTIONS
+            if unknown:
+                raise ValueError(f"Unknown options: {', '.join(sorted(unknown))}")
+            if self.server.verbose:
+                print(f"Resolving {len(images)} images", file=sys.stderr)
+            if request.get("stream"):
+                self._stream(images, options)
+                return
+            results = self.server.resolver.resolve(images, **options)
+            response: dict[str, Any] = {"results": [list(result) for result in results]}
+        except (KeyError, TypeError, ValueError) as exc:
+            response = {"error": f"Invalid request: {exc!r}"}
+        self.wfile.write(json.dumps(response).encode() + b"\n")
+
+
+class ResolverServer(socketserver.ThreadingUnixStreamServer):
+    """A Unix socket server that answers every connection in its own thread.
+
+    Parameters
+    ----------
+    path
+        The path of the socket. It is only accessible by the current user.
+    resolver
+        The resolver that answers the requests.
+    verbose
+        Print out the requests to STDERR if True.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, path: str, resolver: Resolver, verbose: bool = False):
+        self.resolver = resolver
+        self.verbose = verbose
+        umask = os.umask(0o077)
+        try:
+            super().__init__(path, _Handler)
+        finally:
+            os.umask(umask)
+
+
+def serve(path: str | None = None, verbose: bool = False) -> None:
+    """Run a resolver server until it is interrupted or terminated.
+
+    A stale socket that no server is listening on is replaced.
+
+    Raises
+    ------
+    OSError
+        If another server is already listening on the socket.
+    """
+    path = path or default_socket_path()
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(path)
+        except OSError:
+            if os.path.exists(path):
+                os.unlink(path)
+        else:
+            raise OSError(f"A resolver server is already listening on {path}.")
+
+    with Resolver() as resolver:
+        server = ResolverServer(path, resolver, verbose)
+        signal.signal(
+            signal.SIGTERM,
+            lambda *_: threading.Thread(target=server.shutdown).start(),
+        )
+        if verbose:
+            print(f"Listening on {path}", file=sys.stderr)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            os.unlink(path)
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Run the resolver server from the command line."""
+    from .parser import server_parser
+
+    args = server_parser.parse_args(argv)
+    try:
+        serve(args.socket, args.verbose)
+    except OSError as exc:
+        print(exc, file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
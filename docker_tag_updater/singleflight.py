@@ -0,0 +1,116 @@
+"""Request coalescing.
+
+This module defines a single-flight layer: while a lookup is outstanding, identical
+lookups from other threads wait for it and share its result or error instead of
+sending their own request to the registry.
+"""
+
+import functools
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """A set of outstanding calls, keyed by what they look up.
+
+    Examples
+    --------
+    >>> flight = SingleFlight()
+    >>> flight.do(("docker.io", "traefik", "latest"), inspect, "traefik")
+    {...}
+
+    """
+
+    def __init__(self) -> None:
+        self._calls: dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+    def do(
+        self, key: Hashable, func: Callable[..., T], *args: Any, **kwargs: Any
+    ) -> T:
+        """Call a function, unless a call with the same key is already in flight.
+
+        Parameters
+        ----------
+        key
+            What the call looks up.
+        func
+            The function to call.
+        args
+            The positional arguments of the function.
+        kwargs
+            The keyword arguments of the function.
+
+        Returns
+        -------
+            The result of the call, which is the same object for every caller that
+            shared it.
+
+        Raises
+        ------
+        Exception
+            Whatever the shared call raised.
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if future is None:
+                future = self._calls[key] = Future()
+        if not leader:
+            return future.result()
+
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+
+def coalesce(
+    func: Callable[..., T], flight: SingleFlight | None = None
+) -> Callable[..., T]:
+    """Wrap an inspector, or a tag lister, so that identical calls in flight are shared.
+
+    Calls are identical when they are made with the same arguments, e.g., the same
+    image, registry, base tag and verbosity of an inspector. Results are shared and
+    not copied, so callers must not modify them.
+
+    Parameters
+    ----------
+    func
+        The function to wrap.
+    flight
+        The outstanding calls to share with. A new SingleFlight is used by default.
+        A SingleFlight can be shared by several functions.
+
+    Returns
+    -------
+        The wrapped function.
+
+    Examples
+    --------
+    >>> inspector = coalesce(skopeo.inspect)
+    >>> skopeo.image_versions(images, inspector=inspector)
+
+    """
+    flight = flight if flight is not None else SingleFlight()
+
+    @functools.wraps(func)
+    def coalesced(*args: Any, **kwargs: Any) -> T:
+        key = (func, args, tuple(sorted(kwargs.items())))
+        return flight.do(key, func, *args, **kwargs)
+
+    return coalesced
@@ -1,15 +1,32 @@
 """Tools for Skopeo.
 
 This module defines the functions that are used for the CLI tool (image-version-checker).
+
+The heavier modules are imported by the functions that use them, so that ``parse`` is
+available without importing them.
 """
+# pylint: disable=import-outside-toplevel
+
+import sys
+import threading
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Iterable,
+    Iterator,
+    Mapping,
+    NamedTuple,
+    Never,
+    TypeVar,
+)
 
-import json
-import subprocess
-from typing import Callable, Never
+from .metrics import METRICS
 
-import semver
+if TYPE_CHECKING:
+    from .cache import MetadataCache
+    from .policy import UpdatePolicy, VersionIndex
 
-from .helpers import parse_version
+T = TypeVar("T")
 
 
 def parse(image_string: str) -> tuple[str, str, str]:
@@ -46,6 +63,127 @@ def parse(image_string: str) -> tuple[str, str, str]:
     return (registry, image_string, tag)
 
 
+_THROTTLED_MESSAGES = ("toomanyrequests", "429 Too Many Requests")
+
+PROCESS_TIMEOUT: float | None = 300.0
+"""The number of seconds that a skopeo process may run before it is killed."""
+
+
+class DeadlineExceeded(TimeoutError):
+    """The deadline of a batch passed before the lookup of an image finished."""
+
+
+_DEADLINE = threading.local()
+"""The ``time.monotonic`` deadline of the lookup that this thread runs, if any."""
+
+
+def time_left(timeout: float | None) -> float | None:
+    """Clamp a timeout to the time left before the deadline of the current lookup.
+
+    Parameters
+    ----------
+    timeout
+        The timeout of a single process or request in seconds, if any.
+
+    Raises
+    ------
+    DeadlineExceeded
+        If the deadline of the current lookup has passed.
+    """
+    import time
+
+    deadline = getattr(_DEADLINE, "at", None)
+    if deadline is None:
+        return timeout
+    left = deadline - time.monotonic()
+    if left <= 0:
+        raise DeadlineExceeded("The deadline has passed.")
+    return left if timeout is None else min(timeout, left)
+
+
+def _transient(error: BaseException) -> bool:
+    """Tell whether a lookup failed for a reason that may soon pass, e.g., throttling.
+
+    Such failures are never cached, unlike definitive ones such as a missing image
+    or an invalid manifest, so that the next lookup tries again.
+    """
+    import subprocess
+
+    from .ratelimit import RETRY_STATUSES, RateLimitExceeded
+
+    transient = (RateLimitExceeded, TimeoutError, subprocess.TimeoutExpired)
+    cause: BaseException | None = error
+    while cause is not None:
+        if isinstance(cause, transient):
+            return True
+        if getattr(cause, "status", None) in RETRY_STATUSES:
+            return True
+        if isinstance(cause, subprocess.CalledProcessError):
+            errors = (cause.stderr or b"").decode(errors="replace")
+            if any(message in errors for message in _THROTTLED_MESSAGES):
+                return True
+        cause = cause.__cause__
+    return False
+
+
+def _run(arguments: list[str], registry: str, verbose: bool, retries: int = 4) -> bytes:
+    """Run skopeo at the pace of the registry, retrying it while it is throttled.
+
+    Returns
+    -------
+        The output of the skopeo process.
+
+    Raises
+    ------
+    subprocess.CalledProcessError
+        If the skopeo process fails.
+    ValueError
+        If the skopeo process runs for longer than ``PROCESS_TIMEOUT``.
+    ratelimit.RateLimitExceeded
+        If the rate limit of the registry is exhausted for too long.
+    """
+    import subprocess
+    import time
+    from email.message import Message
+
+    from .ratelimit import LIMITS, backoff
+
+    attempt = 0
+    while True:
+        with LIMITS.slot(registry):
+            start = time.monotonic()
+            timeout = time_left(PROCESS_TIMEOUT)
+            try:
+                with METRICS.stage("skopeo"):
+                    response = subprocess.run(
+                        ["skopeo", *arguments],
+                        capture_output=True,
+                        check=False,
+                        timeout=timeout,
+                    )
+            except subprocess.TimeoutExpired as exc:
+                METRICS.count("timeouts")
+                raise ValueError(
+                    f"skopeo {arguments[0]} {arguments[-1]} timed out after"
+                    f" {timeout:.0f} seconds."
+                ) from exc
+        errors = response.stderr.decode(errors="replace")
+        if verbose:
+            sys.stderr.write(errors)
+        throttled = response.returncode != 0 and any(
+            message in errors for message in _THROTTLED_MESSAGES
+        )
+        LIMITS.observe(
+            registry, 429 if throttled else 200, Message(), time.monotonic() - start
+        )
+        if not throttled or attempt >= retries:
+            response.check_returncode()
+            return response.stdout
+        METRICS.count("retries")
+        time.sleep(backoff(attempt))
+        attempt += 1
+
+
 def inspect(
     image: str,
     registry: str = "docker.io",
@@ -74,6 +212,9 @@ def inspect(
         The result of the skopeo process as a dictionary.
 
     """
+    import json
+    import subprocess
+
     def _failed_response(
         image: str, registry: str, base_tag: str, exc: Exception = ValueError()
     ) -> Never:
@@ -102,18 +243,13 @@ def inspect(
         ) from exc
 
     try:
-        response = subprocess.run(
-            [
-                "skopeo",
-                "inspect",
-                "--config",
-                f"docker://{registry}/{image}:{base_tag}",
-            ],
-            stdout=subprocess.PIPE,
-            stderr=None if verbose else subprocess.DEVNULL,
-            check=True,
+        stdout = _run(
+            ["inspect", "--config", f"docker://{registry}/{image}:{base_tag}"],
+            registry,
+            verbose,
         )
-        json_response = json.loads(response.stdout.decode())
+        with METRICS.stage("decode"):
+            json_response = json.loads(stdout.decode())
         if not json_response:
             _failed_response(image, registry, base_tag)
         return json_response
@@ -127,6 +263,7 @@ def image_version(
     base_tag: str = "latest",
     inspector: Callable = inspect,
     verbose: bool = False,
+    cache: "MetadataCache | None" = None,
 ) -> str:
     """Get the container image version from its annotations.
 
@@ -142,6 +279,9 @@ def image_version(
         The inspection method.
     verbose
         Specify the verbosity of the inspector function.
+    cache
+        A cache of previous lookups. A fresh cached version or failure is returned or
+        raised without inspecting the image, and every new lookup is stored in it.
 
     Returns
     -------
@@ -152,6 +292,8 @@ def image_version(
     ------
     KeyError
         If annotations of the container image is not set.
+    ValueError
+        If the inspector cannot inspect the container image.
 
     Examples
     --------
@@ -168,21 +310,652 @@ def image_version(
     KeyError: 'The version label for docker.io/hello-world:latest is not set.'
 
     """
+    if cache is not None:
+        entry = cache.get(registry, image, base_tag)
+        if entry is not None:
+            METRICS.count("cache_hits")
+            if verbose:
+                print(f"Using the cached lookup of {image} tagged with {base_tag}")
+            return entry.result()
+        METRICS.count("cache_misses")
+
     if verbose:
         print(f"Inspecting {image} tagged with {base_tag} on {registry}")
 
-    inspect_resp = inspector(image, registry, base_tag, verbose)
     try:
-        version = inspect_resp["config"]["Labels"]["org.opencontainers.image.version"]
-        if verbose:
-            print(f"The latest version of {base_tag} for {image} is {version}.")
-        return version
-    except KeyError as exc:
-        raise KeyError(
+        with METRICS.stage("inspect"):
+            inspect_resp = inspector(image, registry, base_tag, verbose)
+    except ValueError as exc:
+        METRICS.count("failures")
+        if cache is not None and not _transient(exc):
+            cache.set_error(registry, image, base_tag, exc)
+        raise
+    try:
+        with METRICS.stage("labels"):
+            labels = inspect_resp["config"]["Labels"]
+            version = labels["org.opencontainers.image.version"]
+    except (KeyError, TypeError) as exc:
+        METRICS.count("failures")
+        error = KeyError(
             f"The version label for {registry}/{image}:{base_tag} is not set."
+        )
+        if cache is not None:
+            cache.set_error(registry, image, base_tag, error)
+        raise error from exc
+    if verbose:
+        print(f"The latest version of {base_tag} for {image} is {version}.")
+    if cache is not None:
+        cache.set_version(
+            registry, image, base_tag, version, inspect_resp.get("Digest")
+        )
+    return version
+
+
+def list_tags(
+    image: str,
+    registry: str = "docker.io",
+    verbose: bool = False,
+) -> list[str]:
+    """Run 'skopeo list-tags'.
+
+    Parameters
+    ----------
+    image
+        The name of the container image.
+    registry
+        The registry hosting the container image.
+    verbose
+        Print out the error messages from the skopeo process to STDERR if True.
+
+    Returns
+    -------
+        Every tag of the container image.
+
+    Raises
+    ------
+    ValueError
+        If the tags cannot be listed.
+
+    """
+    import json
+    import subprocess
+
+    try:
+        stdout = _run(["list-tags", f"docker://{registry}/{image}"], registry, verbose)
+        with METRICS.stage("decode"):
+            return json.loads(stdout.decode())["Tags"]
+    except (subprocess.CalledProcessError, KeyError, json.JSONDecodeError) as exc:
+        raise ValueError(
+            f"The skopeo response for the tags of {registry}/{image} is invalid."
         ) from exc
 
 
+def digest(
+    image: str,
+    registry: str = "docker.io",
+    reference: str = "latest",
+    verbose: bool = False,
+) -> str:
+    """Run 'skopeo inspect' for the manifest digest of an image.
+
+    Parameters
+    ----------
+    image
+        The name of the container image.
+    registry
+        The registry hosting the container image.
+    reference
+        The tag of the container image.
+    verbose
+        Print out the error messages from the skopeo process to STDERR if True.
+
+    Returns
+    -------
+        The digest of the manifest, which may be an image index.
+
+    Raises
+    ------
+    ValueError
+        If the image cannot be inspected.
+
+    """
+    import subprocess
+
+    try:
+        stdout = _run(
+            [
+                "inspect",
+                "--no-tags",
+                "--format",
+                "{{.Digest}}",
+                f"docker://{registry}/{image}:{reference}",
+            ],
+            registry,
+            verbose,
+        )
+    except subprocess.CalledProcessError as exc:
+        raise ValueError(
+            f"The skopeo response for {registry}/{image}:{reference} is invalid."
+        ) from exc
+    found = stdout.decode().strip()
+    if not found:
+        raise ValueError(
+            f"The skopeo response for {registry}/{image}:{reference} is invalid."
+        )
+    return found
+
+
+def _read_tags(
+    image: str,
+    registry: str,
+    lister: Callable,
+    verbose: bool,
+    read: Callable[[Iterable[str]], T],
+) -> T:
+    """List the tags of an image and read them, e.g., into the newest version.
+
+    A lister may return an iterator of the tags as they are streamed from the
+    registry, so the tags are read, once, within the listing.
+    """
+    if verbose:
+        print(f"Listing the tags of {image} on {registry}")
+    try:
+        with METRICS.stage("list_tags"):
+            return read(lister(image, registry, verbose))
+    except ValueError:
+        METRICS.count("failures")
+        raise
+
+
+def newest_tag(
+    image: str,
+    registry: str = "docker.io",
+    rule: str = "default",
+    lister: Callable = list_tags,
+    verbose: bool = False,
+) -> str:
+    """Get the newest version among all tags of a container image.
+
+    This finds a version for images that do not have a version label. Every tag is
+    parsed once into a precomputed sort key, and tags that cannot be parsed, e.g.,
+    latest, are skipped. Only the newest tag is kept while the tags are read, so a
+    lister that streams them, e.g., ``registry.iter_tags``, needs no more memory for
+    a repository of a hundred thousand tags than for one of ten.
+
+    Parameters
+    ----------
+    image
+        The container image, e.g., hello-world.
+    registry
+        The registry where the image is hosted on.
+    rule
+        Name of the ``RegexRules`` rule to parse the tags.
+    lister
+        The method that lists the tags. It may return an iterator.
+    verbose
+        Specify the verbosity of the lister function.
+
+    Returns
+    -------
+        The newest tag.
+
+    Raises
+    ------
+    ValueError
+        If no tag can be parsed.
+
+    See also
+    --------
+    docker_tag_updater.helpers.newest_version : For how the newest tag is chosen.
+
+    """
+    from .helpers import newest_version
+
+    count = 0
+
+    def counted(tags: Iterable[str]) -> Iterator[str]:
+        nonlocal count
+        for count, tag in enumerate(tags, 1):
+            yield tag
+
+    newest = _read_tags(
+        image,
+        registry,
+        lister,
+        verbose,
+        lambda tags: newest_version(counted(tags), rule_name=rule),
+    )
+    if newest is None:
+        METRICS.count("failures")
+        raise ValueError(f"No tag of {registry}/{image} can be parsed by {rule}.")
+    if verbose:
+        print(f"The newest tag of {image} out of {count} is {newest}.")
+    return newest
+
+
+def version_index(
+    image: str,
+    registry: str = "docker.io",
+    rule: str = "default",
+    lister: Callable = list_tags,
+    verbose: bool = False,
+) -> "VersionIndex":
+    """List the tags of a container image into a sorted index of its versions.
+
+    Parameters
+    ----------
+    image
+        The container image, e.g., postgres.
+    registry
+        The registry where the image is hosted on.
+    rule
+        Name of the ``RegexRules`` rule to parse the tags.
+    lister
+        The method that lists the tags.
+    verbose
+        Specify the verbosity of the lister function.
+
+    Raises
+    ------
+    ValueError
+        If the tags cannot be listed.
+
+    See also
+    --------
+    docker_tag_updater.policy.VersionIndex : For the queries that the index answers.
+
+    """
+    from .policy import VersionIndex
+
+    return _read_tags(
+        image, registry, lister, verbose, lambda tags: VersionIndex(tags, rule)
+    )
+
+
+def matching_version(
+    image: str,
+    registry: str = "docker.io",
+    base_tag: str = "latest",
+    digester: Callable = digest,
+    lister: Callable = list_tags,
+    rule: str = "default",
+    verbose: bool = False,
+    cache: "MetadataCache | None" = None,
+    max_workers: int = 8,
+) -> str:
+    """Get the version of an image without a version label from its tags.
+
+    The version is the newest tag that the rule can parse and that has the same
+    manifest digest as the base tag. The digests of the candidate tags are looked
+    up newest first, max_workers at a time, and the search stops at the first batch
+    with a match.
+
+    Parameters
+    ----------
+    image
+        The container image, e.g., hello-world.
+    registry
+        The registry where the image is hosted on.
+    base_tag
+        The name of the base tag to refer against.
+    digester
+        The method that gets the manifest digest of a tag.
+    lister
+        The method that lists the tags.
+    rule
+        Name of the ``RegexRules`` rule to parse the tags.
+    verbose
+        Specify the verbosity of the digester and lister functions.
+    cache
+        A cache of previous lookups. The version is cached by the digest of the base
+        tag, so that a repeated lookup only gets that digest.
+    max_workers
+        The number of digests that are looked up at the same time.
+
+    Raises
+    ------
+    KeyError
+        If no tag that the rule can parse has the digest of the base tag.
+    ValueError
+        If the digest of the base tag, or the tags, cannot be looked up.
+
+    Examples
+    --------
+    The official redis images are not labelled with their version.
+
+    >>> matching_version("redis")
+    '7.2.4'
+
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    from .policy import VersionIndex
+
+    with METRICS.stage("inspect"):
+        base_digest = digester(image, registry, base_tag, verbose)
+    if cache is not None:
+        entry = cache.get(registry, image, base_digest)
+        if entry is not None:
+            METRICS.count("cache_hits")
+            return entry.result()
+        METRICS.count("cache_misses")
+
+    def tag_digest(tag: str) -> str | None:
+        try:
+            return digester(image, registry, tag, verbose)
+        except ValueError:
+            # A tag that is removed while it is searched does not end the search
+            return None
+
+    candidates = [
+        tag
+        for tag in _read_tags(
+            image,
+            registry,
+            lister,
+            verbose,
+            lambda tags: VersionIndex(tags, rule).newest_first(),
+        )
+        if tag != base_tag
+    ]
+    with METRICS.stage("match_digest"), ThreadPoolExecutor(max_workers) as executor:
+        for start in range(0, len(candidates), max_workers):
+            batch = candidates[start : start + max_workers]
+            for tag, found in zip(batch, executor.map(tag_digest, batch)):
+                if found == base_digest:
+                    if verbose:
+                        print(f"{image} tagged with {base_tag} is {tag}.")
+                    if cache is not None:
+                        cache.set_version(
+                            registry, image, base_digest, tag, base_digest
+                        )
+                    return tag
+    METRICS.count("failures")
+    error = KeyError(
+        f"No version tag of {registry}/{image} matches the digest of {base_tag}."
+    )
+    if cache is not None:
+        cache.set_error(registry, image, base_digest, error)
+    raise error
+
+
+class ImageResult(NamedTuple):
+    """The result of looking up the version of a single image in a batch.
+
+    Exactly one of version and error is set.
+    """
+
+    image: str
+    """The image string as it was given."""
+    registry: str
+    """The registry hosting the container image."""
+    name: str
+    """The name of the container image."""
+    tag: str
+    """The current tag of the container image."""
+    version: str | None = None
+    """The version of the base tag, if it was found."""
+    error: BaseException | None = None
+    """The error that stopped the version from being found."""
+
+
+def iter_image_versions(
+    images: Iterable[str],
+    base_tag: str = "latest",
+    inspector: Callable = inspect,
+    max_workers: int = 8,
+    per_registry: int = 4,
+    verbose: bool = False,
+    cache: "MetadataCache | None" = None,
+    lister: Callable | None = None,
+    rule: str = "default",
+    policies: "Mapping[str, UpdatePolicy] | None" = None,
+    deadline: float | None = None,
+    priorities: Mapping[str, int] | None = None,
+    matcher: Callable | None = None,
+) -> Iterator[tuple[int, ImageResult]]:
+    """Get the versions of many container images concurrently, as they are found.
+
+    This is ``image_versions``, but the result of each image is yielded as soon as
+    the lookup of its registry and image completes, so that the first results can
+    be used while the rest are still being looked up. The images that are left when
+    the deadline passes are yielded last, with a ``DeadlineExceeded`` error.
+
+    Yields
+    ------
+        The position of each image in images, and its result, in the order that the
+        lookups complete.
+
+    See also
+    --------
+    image_versions : For the parameters.
+
+    """
+    import time
+    from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+
+    from .policy import VersionIndex, policy_for
+
+    semaphores: dict[str, threading.BoundedSemaphore] = {}
+    semaphores_lock = threading.Lock()
+    expired = threading.Event()
+    end = None if deadline is None else time.monotonic() + deadline
+
+    def lookup(registry: str, name: str) -> "str | VersionIndex":
+        with semaphores_lock:
+            semaphore = semaphores.setdefault(
+                registry, threading.BoundedSemaphore(per_registry)
+            )
+        with semaphore:
+            # A lookup that was still waiting for its registry is not started late
+            if expired.is_set():
+                raise DeadlineExceeded("The deadline has passed.")
+            # The processes and requests of the lookup time out by the deadline, so
+            # that the workers do not outlive it for long
+            _DEADLINE.at = end
+            try:
+                return find(registry, name)
+            finally:
+                _DEADLINE.at = None
+
+    def find(registry: str, name: str) -> "str | VersionIndex":
+        if lister is not None and policies is not None:
+            return version_index(name, registry, rule, lister, verbose)
+        if lister is not None:
+            return newest_tag(name, registry, rule, lister, verbose)
+        try:
+            return image_version(name, registry, base_tag, inspector, verbose, cache)
+        except KeyError:
+            if matcher is None:
+                raise
+            return matcher(name, registry, base_tag, verbose=verbose, cache=cache)
+
+    def select(registry: str, name: str, tag: str, found: "str | VersionIndex") -> str:
+        image_policy = policy_for(policies or {}, registry, name)
+        if isinstance(found, VersionIndex):
+            return found.newest(tag, image_policy)
+        if image_policy is None:
+            return found
+        return VersionIndex([found], rule).newest(tag, image_policy)
+
+    def results(
+        future: Future, registry: str, name: str
+    ) -> Iterator[tuple[int, ImageResult]]:
+        for index, image, tag in waiting[(registry, name)]:
+            error = future.exception()
+            if error is None:
+                try:
+                    version = select(registry, name, tag, future.result())
+                except ValueError as exc:
+                    error = exc
+            if error is None:
+                yield index, ImageResult(image, registry, name, tag, version)
+            else:
+                yield index, ImageResult(image, registry, name, tag, error=error)
+
+    waiting: dict[tuple[str, str], list[tuple[int, str, str]]] = {}
+    for index, image in enumerate(images):
+        registry, name, tag = parse(image)
+        waiting.setdefault((registry, name), []).append((index, image, tag))
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    futures = {
+        executor.submit(lookup, registry, name): (registry, name)
+        for registry, name in sorted(
+            waiting, key=lambda key: _lookup_order(key, base_tag, cache, priorities)
+        )
+    }
+    pending = set(futures)
+    try:
+        for future in as_completed(
+            futures, timeout=None if end is None else end - time.monotonic()
+        ):
+            pending.remove(future)
+            yield from results(future, *futures[future])
+    except TimeoutError:
+        expired.set()
+        for future in futures:
+            if future not in pending:
+                continue
+            registry, name = futures[future]
+            if future.done():
+                yield from results(future, registry, name)
+                continue
+            METRICS.count("timeouts")
+            error = DeadlineExceeded(
+                f"The lookup of {registry}/{name} did not finish before the deadline."
+            )
+            for index, image, tag in waiting[(registry, name)]:
+                yield index, ImageResult(image, registry, name, tag, error=error)
+    finally:
+        # Lookups that are already running cannot be interrupted, but their
+        # processes and requests time out by the deadline
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _lookup_order(
+    key: tuple[str, str],
+    base_tag: str,
+    cache: "MetadataCache | None",
+    priorities: Mapping[str, int] | None,
+) -> tuple[int, float]:
+    """Sort the lookups by priority, and then by the age of their cached results.
+
+    Lookups without a cached result are the oldest.
+    """
+    from .policy import policy_for
+
+    registry, name = key
+    priority = policy_for(priorities or {}, registry, name) or 0
+    stored_at = cache.stored_at(registry, name, base_tag) if cache else None
+    return -priority, float("-inf") if stored_at is None else stored_at
+
+
+def image_versions(
+    images: Iterable[str],
+    base_tag: str = "latest",
+    inspector: Callable = inspect,
+    max_workers: int = 8,
+    per_registry: int = 4,
+    verbose: bool = False,
+    cache: "MetadataCache | None" = None,
+    lister: Callable | None = None,
+    rule: str = "default",
+    policies: "Mapping[str, UpdatePolicy] | None" = None,
+    deadline: float | None = None,
+    priorities: Mapping[str, int] | None = None,
+    matcher: Callable | None = None,
+) -> list[ImageResult]:
+    """Get the versions of many container images concurrently.
+
+    Every image string is parsed with ``parse`` and looked up with ``image_version``
+    in a bounded pool of worker threads. Each unique registry and image is only looked
+    up once, and no more than per_registry lookups are sent to the same registry at a
+    time. A failed lookup is recorded in its result instead of aborting the batch.
+
+    With a lister, the version of each image is the newest of its tags as found by
+    ``newest_tag`` instead.
+
+    With policies, the version of each image is the newest version that its policy
+    allows it to be updated to, or its current tag if there is none. With a lister,
+    the tags of each unique registry and image are listed and indexed once, and
+    every image with that name is answered from the same index.
+
+    With a matcher, the version of an image without a version label is found by
+    the matcher instead.
+
+    The lookups with the highest priority, and then those with the oldest cached
+    results, are started first. The images whose lookups have not finished by the
+    deadline get a ``DeadlineExceeded`` error, the lookups that have not started yet
+    are cancelled, and the processes and requests of the running lookups time out
+    by the deadline, see ``time_left``.
+
+    Parameters
+    ----------
+    images
+        The container images possibly with the registry and tag included.
+    base_tag
+        The name of the base tag to refer against.
+    inspector
+        The inspection method.
+    max_workers
+        The number of lookups that run at the same time.
+    per_registry
+        The number of lookups that run at the same time against any one registry.
+    verbose
+        Specify the verbosity of the inspector function.
+    cache
+        A cache of previous lookups.
+    lister
+        The method that lists the tags, if the tags are to be listed.
+    rule
+        Name of the ``RegexRules`` rule to parse the tags with a lister, and the
+        versions with policies.
+    policies
+        The update policies by image name or pattern, see ``policy.policy_for``.
+    deadline
+        The number of seconds that the lookups may take in total, if limited.
+    priorities
+        The priorities of the lookups by image name or pattern, see
+        ``policy.policy_for``. The default priority is 0.
+    matcher
+        The method that finds the version of an image without a version label, e.g.,
+        ``matching_version`` with its digester, lister and rule filled in. Such
+        images fail with a KeyError if it is not given.
+
+    Returns
+    -------
+        The results in the same order as the images.
+
+    Examples
+    --------
+    >>> image_versions(["traefik:v2.10.0", "hello-world"])
+    [ImageResult(image='traefik:v2.10.0', registry='docker.io', name='traefik',
+    tag='v2.10.0', version='v2.11.0', error=None), ImageResult(image='hello-world',
+    registry='docker.io', name='hello-world', tag='0', version=None,
+    error=KeyError('The version label for docker.io/hello-world:latest is not
+    set.'))]
+
+    """
+    results: dict[int, ImageResult] = dict(
+        iter_image_versions(
+            images,
+            base_tag,
+            inspector,
+            max_workers,
+            per_registry,
+            verbose,
+            cache,
+            lister,
+            rule,
+            policies,
+            deadline,
+            priorities,
+            matcher,
+        )
+    )
+    return [results[index] for index in range(len(results))]
+
+
 def compare_versions(
     source_ver: str,
     target_ver: str,
@@ -191,8 +964,8 @@ def compare_versions(
 ) -> str:
     """Compare the current and newest semver, return the neweset version.
 
-    The comparision will be done using the python-semver package. A simple comparison of
-    the major, minor, and patch versions only, is implemented in this version.
+    The comparision is done on the memoized ``VersionKey`` of each semver string, which
+    orders versions like the python-semver package does.
 
     Parameters
     ----------
@@ -212,6 +985,7 @@ def compare_versions(
     See also
     --------
     docker_tag_updater.helpers.regex_rules : For more information about ``RegexRules``.
+    docker_tag_updater.helpers.keys : For more information about ``VersionKey``.
 
     Examples
     --------
@@ -233,9 +1007,10 @@ def compare_versions(
     if source_ver == target_ver:
         return source_ver
 
-    source_semver = parse_version(source_ver, rule_name=rule)
-    target_semver = parse_version(target_ver, rule_name=rule)
+    from .helpers import version_key
 
-    if semver.Version(**target_semver) > semver.Version(**source_semver):
-        return target_ver
-    return source_ver
+    with METRICS.stage("compare"):
+        target_key = version_key(target_ver, rule_name=rule)
+        if target_key > version_key(source_ver, rule_name=rule):
+            return target_ver
+        return source_ver
@@ -0,0 +1,226 @@
+"""Incremental tag list synchronisation.
+
+This module defines a local store of the tags of every repository, and a tag lister
+that keeps it up to date by only asking the registry for the tags that sort after
+the last tag it has seen, with the ``n`` and ``last`` pagination parameters of the
+tags/list API. Repositories with many thousands of tags then cost a single short
+page per check instead of their whole tag list.
+
+Registries return tags in lexical order, so a new tag that sorts before the last
+seen tag, e.g., 10.0.0 after 9.9.9, and removed tags are only noticed by a full
+relist. A full relist is made when the stored state is missing, older than a day, or
+inconsistent with what the registry returns.
+"""
+
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import NamedTuple
+
+from .cache import default_cache_dir
+from .registry import RegistryClient, RegistryError, default_client
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS repositories (
+    registry TEXT NOT NULL,
+    image TEXT NOT NULL,
+    last TEXT,
+    synced_at REAL NOT NULL,
+    full_synced_at REAL NOT NULL,
+    PRIMARY KEY (registry, image)
+);
+CREATE TABLE IF NOT EXISTS tags (
+    registry TEXT NOT NULL,
+    image TEXT NOT NULL,
+    tag TEXT NOT NULL,
+    PRIMARY KEY (registry, image, tag)
+);
+"""
+
+
+class TagState(NamedTuple):
+    """The stored tags of a repository."""
+
+    tags: list[str]
+    """Every known tag, in lexical order."""
+    last: str | None
+    """The last tag in lexical order that the registry has returned."""
+    synced_at: float
+    """When the tags were last synchronised, in seconds since the epoch."""
+    full_synced_at: float
+    """When the tags were last listed in full, in seconds since the epoch."""
+
+
+class TagStore:
+    """The known tags of every repository, kept in an SQLite database.
+
+    Parameters
+    ----------
+    path
+        The path of the SQLite database. Defaults to tags.sqlite3 in
+        ``cache.default_cache_dir()``.
+    """
+
+    def __init__(self, path: str | Path | None = None):
+        if path is None:
+            path = default_cache_dir() / "tags.sqlite3"
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        """Close the database."""
+        with self._lock:
+            self._db.close()
+
+    def __enter__(self) -> "TagStore":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def get(self, registry: str, image: str) -> TagState | None:
+        """Get the stored tags of a repository, or None if it was never listed."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT last, synced_at, full_synced_at FROM repositories"
+                " WHERE registry = ? AND image = ?",
+                (registry, image),
+            ).fetchone()
+            if row is None:
+                return None
+            tags = self._db.execute(
+                "SELECT tag FROM tags WHERE registry = ? AND image = ? ORDER BY tag",
+                (registry, image),
+            ).fetchall()
+        return TagState([tag for (tag,) in tags], *row)
+
+    def replace(self, registry: str, image: str, tags: list[str]) -> None:
+        """Store the full tag list of a repository."""
+        now = time.time()
+        with self._lock, self._db:
+            self._db.execute(
+                "DELETE FROM tags WHERE registry = ? AND image = ?", (registry, image)
+            )
+            self._db.executemany(
+                "INSERT OR IGNORE INTO tags VALUES (?, ?, ?)",
+                [(registry, image, tag) for tag in tags],
+            )
+            self._db.execute(
+                "INSERT OR REPLACE INTO repositories VALUES (?, ?, ?, ?, ?)",
+                (registry, image, max(tags, default=None), now, now),
+            )
+
+    def extend(self, registry: str, image: str, tags: list[str]) -> None:
+        """Add the tags that sort after the last known tag of a repository."""
+        now = time.time()
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT OR IGNORE INTO tags VALUES (?, ?, ?)",
+                [(registry, image, tag) for tag in tags],
+            )
+            self._db.execute(
+                "UPDATE repositories SET synced_at = ?, last = MAX(last, ?)"
+                " WHERE registry = ? AND image = ?",
+                (now, max(tags, default=""), registry, image),
+            )
+
+    def clear(self) -> None:
+        """Remove every repository."""
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM tags")
+            self._db.execute("DELETE FROM repositories")
+
+
+class TagSync:
+    """A tag lister that only fetches the tags that are new since the last listing.
+
+    The tags are always listed with the native registry client, since skopeo cannot
+    resume a listing.
+
+    Parameters
+    ----------
+    store
+        The stored tags of every repository.
+    client
+        The registry client. ``registry.default_client()`` by default.
+    full_interval
+        The number of seconds after which the tags of a repository are listed in
+        full again, so that tags that sort before the last known tag, and removed
+        tags, are noticed.
+
+    Examples
+    --------
+    >>> sync = TagSync(TagStore())
+    >>> skopeo.newest_tag("traefik", lister=sync.list_tags)
+    'v2.11.0'
+
+    """
+
+    def __init__(
+        self,
+        store: TagStore,
+        client: RegistryClient | None = None,
+        full_interval: float = 86400,
+    ):
+        self.store = store
+        self.client = default_client() if client is None else client
+        self.full_interval = full_interval
+
+    def _relist(self, image: str, registry: str, verbose: bool) -> list[str]:
+        tags = self.client.list_tags(image, registry, verbose)
+        self.store.replace(registry, image, tags)
+        return sorted(set(tags))
+
+    def list_tags(
+        self,
+        image: str,
+        registry: str = "docker.io",
+        verbose: bool = False,
+    ) -> list[str]:
+        """List every tag of an image, fetching only the new ones if possible.
+
+        Parameters
+        ----------
+        image
+            The name of the container image.
+        registry
+            The registry hosting the container image.
+        verbose
+            Print out the requests that are made to STDERR if True.
+
+        Returns
+        -------
+            Every known tag of the container image, in lexical order.
+        """
+        state = self.store.get(registry, image)
+        if (
+            state is None
+            or state.last is None
+            or state.last not in state.tags
+            or time.time() - state.full_synced_at >= self.full_interval
+        ):
+            return self._relist(image, registry, verbose)
+
+        new_tags: list[str] | None
+        try:
+            new_tags = self.client.list_tags(image, registry, verbose, last=state.last)
+        except RegistryError as exc:
+            # A registry that does not know the last tag any more may reject it
+            if exc.status not in (400, 404):
+                raise
+            new_tags = None
+        if new_tags is None or any(tag <= state.last for tag in new_tags):
+            if verbose:
+                print(
+                    f"The stored tags of {registry}/{image} are inconsistent",
+                    file=sys.stderr,
+                )
+            return self._relist(image, registry, verbose)
+        self.store.extend(registry, image, new_tags)
+        return sorted(set(state.tags).union(new_tags))
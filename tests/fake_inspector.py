@@ -0,0 +1,64 @@
+"""A stand-in for the skopeo and native inspectors.
+
+The inspector serves version labels by image name, without any process or request,
+and records its calls so that tests can assert on the lookups that were made.
+"""
+
+import threading
+import time
+
+VERSION_LABEL = "org.opencontainers.image.version"
+
+
+def fake_inspector(
+    versions, calls=None, delay=0.0, error=None, digest=None, running=None
+):
+    """Make an inspector that serves version labels by image name.
+
+    Parameters
+    ----------
+    versions
+        The version label of every image, or of all of them if it is a string. An
+        image whose version is None has no labels, and an unknown image is invalid.
+    calls
+        A list to append the registry, image and base tag of every call to.
+    delay
+        The time that each call takes, in seconds.
+    error
+        An exception to raise from every call instead.
+    digest
+        The manifest digest of every image, if any.
+    running
+        A dictionary to count the calls that are running in, under "now", and the
+        most that ever ran at once, under "peak".
+    """
+    lock = threading.Lock()
+
+    def inspector(image, registry, base_tag, verbose):
+        with lock:
+            if calls is not None:
+                calls.append((registry, image, base_tag))
+            if running is not None:
+                running["now"] = running.get("now", 0) + 1
+                running["peak"] = max(running.get("peak", 0), running["now"])
+        time.sleep(delay)
+        if running is not None:
+            with lock:
+                running["now"] -= 1
+        if error is not None:
+            raise error
+        if isinstance(versions, str):
+            version = versions
+        elif image in versions:
+            version = versions[image]
+        else:
+            raise ValueError(
+                f"The registry response for {registry}/{image} is invalid."
+            )
+        labels = None if version is None else {VERSION_LABEL: version}
+        response = {"config": {"Labels": labels}}
+        if digest is not None:
+            response["Digest"] = digest
+        return response
+
+    return inspector
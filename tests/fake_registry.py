@@ -0,0 +1,296 @@
+"""A local stand-in for a registry V2 server.
+
+The server implements just enough of the distribution API for the native client:
+manifests, blobs, paginated tag lists and a bearer-token realm. It counts requests and connections so that
+tests can assert on round-trips and connection reuse.
+"""
+
+import hashlib
+import json
+import random
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+OCI_INDEX = "application/vnd.oci.image.index.v1+json"
+OCI_MANIFEST = "application/vnd.oci.image.manifest.v1+json"
+OCI_CONFIG = "application/vnd.oci.image.config.v1+json"
+
+
+def _digest(data: bytes) -> str:
+    return f"sha256:{hashlib.sha256(data).hexdigest()}"
+
+
+class FakeRegistry:
+    """A threaded registry server listening on localhost.
+
+    Parameters
+    ----------
+    auth
+        Require a bearer token obtained from the /token realm if True.
+    latency
+        The number of seconds every response is delayed by.
+    error_rate
+        The fraction of API requests that fail with 503 Service Unavailable.
+        Failures can also be forced with ``fail``, and headers, e.g., RateLimit-*,
+        can be added to every response through ``headers``.
+    seed
+        The seed of the random failures.
+    """
+
+    def __init__(
+        self,
+        auth: bool = False,
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        seed: int = 0,
+    ):
+        self.auth = auth
+        self.latency = latency
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self.token = "fake-token"
+        self.tags: dict[str, dict[str, str]] = {}
+        self.manifests: dict[str, tuple[str, bytes]] = {}
+        self.blobs: dict[str, bytes] = {}
+        self.requests: list[tuple[str, str]] = []
+        self.connections = 0
+        self.headers: dict[str, str] = {}
+        self._failures: list[tuple[int, dict[str, str]]] = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, args=(0.01,), daemon=True
+        )
+
+    @property
+    def netloc(self) -> str:
+        """The host and port the server listens on."""
+        host, port = self._server.server_address[:2]
+        return f"{host}:{port}"
+
+    @property
+    def url(self) -> str:
+        """The base URL of the server."""
+        return f"http://{self.netloc}"
+
+    def __enter__(self) -> "FakeRegistry":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _put_manifest(self, media_type: str, manifest: dict) -> str:
+        body = json.dumps(manifest).encode()
+        digest = _digest(body)
+        self.manifests[digest] = (media_type, body)
+        return digest
+
+    def _put_blob(self, blob: bytes) -> str:
+        digest = _digest(blob)
+        self.blobs[digest] = blob
+        return digest
+
+    def add_image(
+        self,
+        repository: str,
+        tag: str,
+        labels: dict[str, str] | None = None,
+        platforms: list[str] | None = None,
+        annotations: dict[str, str] | None = None,
+    ) -> str:
+        """Add an image and tag it.
+
+        Parameters
+        ----------
+        repository
+            The repository name, e.g., library/alpine.
+        tag
+            The tag of the image.
+        labels
+            The labels of the image configuration.
+        platforms
+            Serve an image index with one manifest per os/architecture if given.
+        annotations
+            The annotations of the tagged manifest, i.e., of the index if there is one.
+
+        Returns
+        -------
+            The digest of the tagged manifest.
+        """
+        def image_manifest(
+            platform: str, manifest_annotations: dict[str, str] | None = None
+        ) -> str:
+            os_name, arch = platform.split("/")[:2]
+            config = {
+                "architecture": arch,
+                "os": os_name,
+                "config": {"Labels": labels} if labels is not None else {},
+            }
+            config_blob = json.dumps(config).encode()
+            manifest = {
+                "schemaVersion": 2,
+                "mediaType": OCI_MANIFEST,
+                "config": {
+                    "mediaType": OCI_CONFIG,
+                    "digest": self._put_blob(config_blob),
+                    "size": len(config_blob),
+                },
+                "layers": [],
+            }
+            if manifest_annotations is not None:
+                manifest["annotations"] = manifest_annotations
+            return self._put_manifest(OCI_MANIFEST, manifest)
+
+        if platforms:
+            entries = []
+            for platform in platforms:
+                os_name, arch = platform.split("/")[:2]
+                entries.append(
+                    {
+                        "mediaType": OCI_MANIFEST,
+                        "digest": image_manifest(platform),
+                        "platform": {"os": os_name, "architecture": arch},
+                    }
+                )
+            index = {"schemaVersion": 2, "mediaType": OCI_INDEX, "manifests": entries}
+            if annotations is not None:
+                index["annotations"] = annotations
+            digest = self._put_manifest(OCI_INDEX, index)
+        else:
+            digest = image_manifest("linux/amd64", annotations)
+        self.tags.setdefault(repository, {})[tag] = digest
+        return digest
+
+    def add_tags(self, repository: str, tags: list[str]) -> None:
+        """Add tags that all point at the same image without a version label."""
+        digest = self.add_image(repository, tags[0])
+        self.tags[repository].update(dict.fromkeys(tags, digest))
+
+    def fail(
+        self, status: int, count: int = 1, headers: dict[str, str] | None = None
+    ) -> None:
+        """Fail the next API requests with a status and headers, e.g., 429."""
+        with self._lock:
+            self._failures.extend([(status, headers or {})] * count)
+
+    def _handler(self) -> type[BaseHTTPRequestHandler]:
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                with registry._lock:
+                    registry.connections += 1
+
+            def log_message(self, *args):  # pylint: disable=arguments-differ
+                pass
+
+            def _reply(
+                self,
+                status: int,
+                body: bytes = b"",
+                headers: dict[str, str] | None = None,
+            ) -> None:
+                self.send_response(status)
+                for key, value in {**registry.headers, **(headers or {})}.items():
+                    self.send_header(key, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                if self.command != "HEAD":
+                    self.wfile.write(body)
+
+            def do_HEAD(self):  # pylint: disable=invalid-name
+                self.do_GET()
+
+            def do_GET(self):  # pylint: disable=invalid-name
+                url = urllib.parse.urlsplit(self.path)
+                with registry._lock:
+                    registry.requests.append((self.command, url.path))
+                    failed = registry._random.random() < registry.error_rate
+                    forced = (
+                        registry._failures.pop(0)
+                        if registry._failures and url.path != "/token"
+                        else None
+                    )
+                if registry.latency:
+                    time.sleep(registry.latency)
+                if url.path == "/token":
+                    body = json.dumps({"token": registry.token, "expires_in": 300})
+                    self._reply(200, body.encode())
+                    return
+                if registry.auth and (
+                    self.headers.get("Authorization") != f"Bearer {registry.token}"
+                ):
+                    self._reply(
+                        401,
+                        headers={
+                            "WWW-Authenticate": f'Bearer realm="{registry.url}/token",'
+                            'service="fake-registry"'
+                        },
+                    )
+                    return
+                if forced is not None:
+                    self._reply(forced[0], b'{"errors": []}', forced[1])
+                    return
+                if failed:
+                    self._reply(503, b'{"errors": [{"code": "UNAVAILABLE"}]}')
+                    return
+                self.route(url)
+
+            def route(self, url: urllib.parse.SplitResult) -> None:
+                """Serve the registry API paths."""
+                path = url.path
+                if path == "/v2/":
+                    self._reply(200, b"{}")
+                elif path.endswith("/tags/list"):
+                    self.tags_list(path[4:-10], urllib.parse.parse_qs(url.query))
+                elif "/manifests/" in path:
+                    repository, reference = path[4:].rsplit("/manifests/", 1)
+                    digest = registry.tags.get(repository, {}).get(reference, reference)
+                    if digest not in registry.manifests:
+                        self._reply(404, b'{"errors": [{"code": "MANIFEST_UNKNOWN"}]}')
+                        return
+                    media_type, body = registry.manifests[digest]
+                    self._reply(
+                        200,
+                        body,
+                        {"Content-Type": media_type, "Docker-Content-Digest": digest},
+                    )
+                elif "/blobs/" in path:
+                    digest = path.rsplit("/blobs/", 1)[1]
+                    if digest not in registry.blobs:
+                        self._reply(404, b'{"errors": [{"code": "BLOB_UNKNOWN"}]}')
+                        return
+                    self._reply(200, registry.blobs[digest])
+                else:
+                    self._reply(404)
+
+            def tags_list(self, repository: str, query: dict[str, list[str]]) -> None:
+                """Serve a page of the lexically sorted tags of a repository."""
+                if repository not in registry.tags:
+                    self._reply(404, b'{"errors": [{"code": "NAME_UNKNOWN"}]}')
+                    return
+                tags = sorted(registry.tags[repository])
+                if "last" in query:
+                    tags = [tag for tag in tags if tag > query["last"][0]]
+                headers = {"Content-Type": "application/json"}
+                if "n" in query and len(tags) > int(query["n"][0]):
+                    tags = tags[: int(query["n"][0])]
+                    next_query = urllib.parse.urlencode(
+                        {"n": query["n"][0], "last": tags[-1]}
+                    )
+                    headers["Link"] = (
+                        f'</v2/{repository}/tags/list?{next_query}>; rel="next"'
+                    )
+                body = json.dumps({"name": repository, "tags": tags})
+                self._reply(200, body.encode(), headers)
+
+        return Handler
@@ -0,0 +1,51 @@
+import base64
+import json
+import time
+
+from docker_tag_updater import auth
+
+SCOPE = "repository:library/alpine:pull"
+
+
+def test_token_expiry():
+    """Stop using a token just before it expires."""
+    tokens = auth.TokenCache()
+    tokens.set("docker.io", SCOPE, "fresh", expires_in=300)
+    tokens.set("docker.io", "repository:library/redis:pull", "stale", expires_in=5)
+    tokens.set("ghcr.io", SCOPE, "old", expires_in=300, issued_at=time.time() - 600)
+    assert tokens.get("docker.io", SCOPE) == "fresh"
+    assert tokens.get("docker.io", "repository:library/redis:pull") is None
+    assert tokens.get("ghcr.io", SCOPE) is None
+
+
+def test_token_file(tmp_path):
+    """Share the unexpired tokens with another run through a private file."""
+    path = tmp_path / "cache" / "tokens.json"
+    auth.TokenCache(path).set("docker.io", SCOPE, "secret", expires_in=300)
+    auth.TokenCache(path).set("ghcr.io", SCOPE, "other", expires_in=300)
+    tokens = auth.TokenCache(path)
+    assert tokens.get("docker.io", SCOPE) == "secret"
+    assert tokens.get("ghcr.io", SCOPE) == "other"
+    assert path.stat().st_mode & 0o777 == 0o600
+    tokens.clear()
+    assert not path.exists()
+
+
+def test_docker_credentials(tmp_path):
+    """Find the credentials that docker login stored."""
+    path = tmp_path / "config.json"
+    encoded = base64.b64encode(b"user:hunter2").decode()
+    path.write_text(
+        json.dumps(
+            {
+                "auths": {
+                    "https://index.docker.io/v1/": {"auth": encoded},
+                    "ghcr.io": {"username": "user", "password": "hunter2"},
+                }
+            }
+        )
+    )
+    assert auth.docker_credentials("docker.io", path) == f"Basic {encoded}"
+    assert auth.docker_credentials("ghcr.io", path) == f"Basic {encoded}"
+    assert auth.docker_credentials("lscr.io", path) is None
+    assert auth.docker_credentials("lscr.io", tmp_path / "missing.json") is None
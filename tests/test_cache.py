@@ -0,0 +1,100 @@
+import pytest
+
+from docker_tag_updater import cache, ratelimit, registry, skopeo
+
+from .fake_inspector import fake_inspector
+
+
+@pytest.fixture
+def metadata_cache(tmp_path):
+    with cache.MetadataCache(tmp_path / "metadata.sqlite3") as metadata_cache:
+        yield metadata_cache
+
+
+def test_cache_hit(metadata_cache):
+    """Serve a repeated lookup from the cache."""
+    calls = []
+    inspector = fake_inspector({"traefik": "v2.11.0"}, calls, digest="sha256:abc")
+    for _ in range(3):
+        assert skopeo.image_version(
+            "traefik", inspector=inspector, cache=metadata_cache
+        ) == "v2.11.0"
+    assert [call[1] for call in calls] == ["traefik"]
+    entry = metadata_cache.get("docker.io", "traefik", "latest")
+    assert entry.digest == "sha256:abc"
+
+
+def test_cache_persistence(tmp_path):
+    """Reopen the cache and find the previous lookups."""
+    with cache.MetadataCache(tmp_path / "metadata.sqlite3") as metadata_cache:
+        metadata_cache.set_version("docker.io", "traefik", "latest", "v2.11.0")
+    with cache.MetadataCache(tmp_path / "metadata.sqlite3") as metadata_cache:
+        assert metadata_cache.get("docker.io", "traefik", "latest").version == "v2.11.0"
+
+
+def test_cache_expiry(metadata_cache):
+    """Inspect the image again once the cached version has expired."""
+    calls = []
+    inspector = fake_inspector({"traefik": "v2.11.0"}, calls)
+    metadata_cache.ttl = 0
+    skopeo.image_version("traefik", inspector=inspector, cache=metadata_cache)
+    skopeo.image_version("traefik", inspector=inspector, cache=metadata_cache)
+    assert len(calls) == 2
+
+
+def test_negative_cache(metadata_cache):
+    """Cache failed lookups with their own lifetime."""
+    calls = []
+    missing_label = fake_inspector({"hello-world": None}, calls)
+    invalid = fake_inspector({}, calls)
+    for _ in range(2):
+        with pytest.raises(KeyError, match="hello-world"):
+            skopeo.image_version(
+                "hello-world", inspector=missing_label, cache=metadata_cache
+            )
+        with pytest.raises(ValueError):
+            skopeo.image_version("asdf", inspector=invalid, cache=metadata_cache)
+    assert [call[1] for call in calls] == ["hello-world", "asdf"]
+
+    metadata_cache.error_ttl = 0
+    with pytest.raises(KeyError):
+        skopeo.image_version("hello-world", inspector=missing_label, cache=metadata_cache)
+    assert len(calls) == 3
+
+
+def test_lru_eviction(metadata_cache):
+    """Evict the least recently used entries beyond the size limit."""
+    metadata_cache.max_entries = 2
+    metadata_cache.set_version("docker.io", "a", "latest", "1.0.0")
+    metadata_cache.set_version("docker.io", "b", "latest", "1.0.0")
+    assert metadata_cache.get("docker.io", "a", "latest") is not None
+    metadata_cache.set_version("docker.io", "c", "latest", "1.0.0")
+    assert len(metadata_cache) == 2
+    assert metadata_cache.get("docker.io", "b", "latest") is None
+    assert metadata_cache.get("docker.io", "a", "latest") is not None
+
+
+@pytest.mark.parametrize(
+    "error",
+    [
+        registry.RegistryError("GET /v2/traefik/manifests/latest failed.", 429),
+        registry.RegistryError("GET /v2/traefik/manifests/latest failed.", 503),
+        ratelimit.RateLimitExceeded("docker.io", 60),
+    ],
+)
+def test_no_cache_throttled(metadata_cache, error):
+    """Never cache failed lookups that may pass soon, only definitive ones."""
+    calls = []
+    throttled = fake_inspector({}, calls, error=error)
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            skopeo.image_version("traefik", inspector=throttled, cache=metadata_cache)
+    assert len(calls) == 2
+
+    missing = fake_inspector(
+        {}, calls, error=registry.RegistryError("The image is missing.", 404)
+    )
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            skopeo.image_version("traefik", inspector=missing, cache=metadata_cache)
+    assert len(calls) == 3
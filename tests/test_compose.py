@@ -0,0 +1,243 @@
+import os
+import time
+
+import pytest
+
+from docker_tag_updater import compose
+from docker_tag_updater.scanindex import ScanIndex
+
+from .fake_inspector import fake_inspector
+
+COMPOSE_FILE = """---
+# The stack
+services:
+  db:
+    image: "postgres:16.1.0"  # pinned
+  cache:
+    image: redis:7.2.3
+  db-replica:
+    image: 'postgres:16.0.0'
+    environment:
+      IMAGE: postgres:16.1.0
+  proxy:
+    image: traefik:v2.11.0
+"""
+
+VERSIONS = {
+    "postgres": "16.2.0",
+    "redis": "7.2.3",
+    "traefik": "v2.10.0",
+}
+
+
+def test_find_images():
+    """Find only the image values, in order, without their quotes."""
+    references = compose.find_images(COMPOSE_FILE)
+    assert [reference.image for reference in references] == [
+        "postgres:16.1.0",
+        "redis:7.2.3",
+        "postgres:16.0.0",
+        "traefik:v2.11.0",
+    ]
+    assert references[0].line == 5
+    assert COMPOSE_FILE[references[2].start : references[2].end] == "postgres:16.0.0"
+
+
+def test_find_images_anchors():
+    """Find an anchored image once, and rewrite it after its anchor."""
+    text = (
+        "x-common: &common\n"
+        "  image: &img redis:7.0.0\n"
+        "services:\n"
+        "  cache:\n"
+        "    <<: *common\n"
+        "  replica:\n"
+        "    image: *img\n"
+    )
+    references = compose.find_images(text)
+    assert [(reference.image, reference.line) for reference in references] == [
+        ("redis:7.0.0", 2)
+    ]
+    assert compose.rewrite(text, references, {"redis:7.0.0": "redis:7.2.4"}) == (
+        text.replace("&img redis:7.0.0", "&img redis:7.2.4")
+    )
+
+
+def test_update_file(tmp_path):
+    """Resolve each image once and rewrite only the outdated image values."""
+    compose_file = tmp_path / "compose.yaml"
+    compose_file.write_text(COMPOSE_FILE)
+    calls = []
+    updated, errors = compose.update_file(
+        compose_file, inspector=fake_inspector(VERSIONS, calls)
+    )
+    assert not errors
+    assert sorted(call[1] for call in calls) == ["postgres", "redis", "traefik"]
+    assert updated == {
+        "postgres:16.1.0": "postgres:16.2.0",
+        "postgres:16.0.0": "postgres:16.2.0",
+    }
+    assert compose_file.read_text() == (
+        COMPOSE_FILE.replace('"postgres:16.1.0"', '"postgres:16.2.0"')
+        .replace("'postgres:16.0.0'", "'postgres:16.2.0'")
+    )
+
+
+def test_update_file_crlf(tmp_path):
+    """Keep the CRLF line endings of a Compose file."""
+    compose_file = tmp_path / "compose.yaml"
+    compose_file.write_bytes(COMPOSE_FILE.replace("\n", "\r\n").encode())
+    compose.update_file(compose_file, inspector=fake_inspector(VERSIONS))
+    assert compose_file.read_bytes() == (
+        COMPOSE_FILE.replace('"postgres:16.1.0"', '"postgres:16.2.0"')
+        .replace("'postgres:16.0.0'", "'postgres:16.2.0'")
+        .replace("\n", "\r\n")
+        .encode()
+    )
+
+
+def test_write_atomic_failure(tmp_path):
+    """Leave neither the file changed nor a temporary file behind if writing fails."""
+    compose_file = tmp_path / "compose.yaml"
+    compose_file.write_text(COMPOSE_FILE)
+    with pytest.raises(UnicodeEncodeError):
+        compose.write_atomic(compose_file, "services: \udc80\n")
+    assert compose_file.read_text() == COMPOSE_FILE
+    assert list(tmp_path.iterdir()) == [compose_file]
+
+
+def test_update_file_image_name(tmp_path):
+    """Only update the references to the image name."""
+    compose_file = tmp_path / "compose.yaml"
+    compose_file.write_text(COMPOSE_FILE)
+    calls = []
+    compose.update_file(
+        compose_file, "redis", inspector=fake_inspector(VERSIONS, calls)
+    )
+    assert [call[1] for call in calls] == ["redis"]
+    assert compose_file.read_text() == COMPOSE_FILE
+    with pytest.raises(LookupError):
+        compose.update_file(
+            compose_file, "mariadb", inspector=fake_inspector(VERSIONS, calls)
+        )
+
+
+def test_git_outputs():
+    """Prepare the same Git outputs as the compose-updater script did."""
+    assert compose.git_outputs({}) == {
+        "commit-message": "",
+        "commit-description": "",
+        "git-branch": "",
+    }
+    assert compose.git_outputs({"postgres:16.1.0": "postgres:16.2.0"}) == {
+        "commit-message": "chore: bump postgres from 16.1.0 to 16.2.0",
+        "commit-description": "",
+        "git-branch": "bump/postgres-16.2.0",
+    }
+    assert compose.git_outputs(
+        {
+            "lscr.io/linuxserver/mariadb:10.11.4": "lscr.io/linuxserver/mariadb:10.11.6",
+            "lscr.io/linuxserver/mariadb:10.11.5": "lscr.io/linuxserver/mariadb:10.11.6",
+        }
+    ) == {
+        "commit-message": "chore: bump mariadb to 10.11.6",
+        "commit-description": "The following versions of mariadb were updated:"
+        "\\n- 10.11.4\\n- 10.11.5",
+        "git-branch": "bump/mariadb-10.11.6",
+    }
+    # Every bump is listed when an image is bumped to several versions
+    assert compose.git_outputs(
+        {"postgres:15.5.0": "postgres:15.6.0", "postgres:16.1.0": "postgres:16.2.0"}
+    ) == {
+        "commit-message": "chore: bump postgres to 15.6.0, 16.2.0",
+        "commit-description": "The following images were updated:"
+        "\\n- postgres to 15.6.0\\n- postgres to 16.2.0",
+        "git-branch": "bump/postgres-15.6.0-postgres-16.2.0",
+    }
+    assert compose.git_outputs(
+        {
+            "postgres:15.5.0": "postgres:15.6.0",
+            "postgres:16.1.0": "postgres:16.2.0",
+            "redis:7.2.3": "redis:7.2.4",
+        }
+    )["commit-message"] == "chore: bump 2 images"
+
+
+def test_scan(tmp_path):
+    """Resolve the images of every Compose file together and rewrite the files."""
+    (tmp_path / "app").mkdir()
+    (tmp_path / ".git").mkdir()
+    (tmp_path / "compose.yaml").write_text(COMPOSE_FILE)
+    (tmp_path / "app" / "docker-compose.yml").write_text(
+        "services:\n  db:\n    image: postgres:16.0.0\n"
+    )
+    (tmp_path / ".git" / "compose.yaml").write_text(COMPOSE_FILE)
+    (tmp_path / "app" / "notes.yaml").write_text("image: postgres:15.0.0\n")
+    assert compose.discover(tmp_path) == [
+        tmp_path / "compose.yaml",
+        tmp_path / "app" / "docker-compose.yml",
+    ]
+
+    calls = []
+    files, errors = compose.scan(
+        tmp_path, inspector=fake_inspector(VERSIONS, calls), dry_run=True
+    )
+    assert not errors
+    assert sorted(call[1] for call in calls) == ["postgres", "redis", "traefik"]
+    assert [file.path.name for file in files] == ["compose.yaml", "docker-compose.yml"]
+    assert files[1].diff.startswith("--- a/app/docker-compose.yml\n")
+    assert "+    image: postgres:16.2.0\n" in files[1].diff
+    assert (tmp_path / "compose.yaml").read_text() == COMPOSE_FILE
+    assert compose.scan_summary(tmp_path, files, errors)["files"][1] == {
+        "path": "app/docker-compose.yml",
+        "updates": [
+            {"line": 3, "image": "postgres:16.0.0", "new_image": "postgres:16.2.0"}
+        ],
+    }
+
+    compose.scan(tmp_path, inspector=fake_inspector(VERSIONS, calls))
+    assert (tmp_path / "app" / "docker-compose.yml").read_text() == (
+        "services:\n  db:\n    image: postgres:16.2.0\n"
+    )
+
+
+def test_scan_index(tmp_path, monkeypatch):
+    """Skip the files that are unchanged since the last scan, unless they are updated."""
+    (tmp_path / "stacks").mkdir()
+    (tmp_path / "stacks" / "compose.yaml").write_text(COMPOSE_FILE)
+    (tmp_path / "stacks" / "stack.yml").write_text(
+        "services:\n  cache:\n    image: redis:7.2.3\n"
+    )
+    for path in (tmp_path / "stacks").iterdir():
+        os.utime(path, (time.time() - 60, time.time() - 60))
+    parsed = []
+    find_images = compose.find_images
+    monkeypatch.setattr(
+        compose, "find_images", lambda text: parsed.append(text) or find_images(text)
+    )
+    with ScanIndex(tmp_path / "scan.sqlite3") as index:
+        def rescan():
+            return compose.scan(
+                tmp_path / "stacks", inspector=fake_inspector(VERSIONS), scan_index=index
+            )[0]
+
+        files = rescan()
+        assert [file.path.name for file in files] == ["compose.yaml"]
+        assert len(parsed) == 2
+
+        # Only the file that was updated has changed, and the scan updates nothing
+        del parsed[:]
+        assert rescan() == []
+        assert len(parsed) == 1
+        del parsed[:]
+        assert rescan() == []
+        assert parsed == []
+
+        # Unchanged files are read again when one of their images is updated
+        monkeypatch.setitem(VERSIONS, "redis", "7.2.4")
+        files = rescan()
+        assert [file.path.name for file in files] == ["compose.yaml", "stack.yml"]
+        assert parsed == ["services:\n  cache:\n    image: redis:7.2.3\n"]
+    assert (tmp_path / "stacks" / "stack.yml").read_text() == (
+        "services:\n  cache:\n    image: redis:7.2.4\n"
+    )
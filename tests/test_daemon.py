@@ -0,0 +1,134 @@
+import json
+import threading
+import time
+
+import pytest
+
+from docker_tag_updater import daemon
+
+from .fake_inspector import fake_inspector
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_next_interval():
+    """Check stable images rarely, and images that change often more often."""
+    assert daemon.next_interval(0, None, 300, 86400, 0.1) == 300
+    assert daemon.next_interval(86400, None, 300, 86400, 0.1) == 8640
+    assert daemon.next_interval(86400, 3600, 300, 86400, 0.1) == 360
+    assert daemon.next_interval(10**8, None, 300, 86400, 0.1) == 86400
+
+
+def test_check_and_status():
+    """Resolve every reference of an image with a single lookup."""
+    calls = []
+    watcher = daemon.Watcher(
+        inspector=fake_inspector({"traefik": "v2.11.0"}, calls), jitter=0
+    )
+    watcher.watch(["traefik:v2.10.0", "traefik:v3.0.0"])
+    watcher.check(("docker.io", "traefik"))
+    statuses = {status.image: status for status in watcher.status()}
+    assert statuses["traefik:v2.10.0"].newest == "traefik:v2.11.0"
+    assert statuses["traefik:v3.0.0"].newest == "traefik:v3.0.0"
+    status = statuses["traefik:v2.10.0"]
+    assert status.next_check > status.checked_at
+    assert [call[1] for call in calls] == ["traefik"]
+
+
+def test_change_detection():
+    """Record when the version of an image changes and how often it does."""
+    versions = {"traefik": "v2.10.0"}
+    watcher = daemon.Watcher(inspector=fake_inspector(versions), jitter=0)
+    watcher.watch(["traefik:v2.10.0"])
+    watcher.check(("docker.io", "traefik"))
+    assert watcher.status()[0].changed_at is None
+    versions["traefik"] = "v2.11.0"
+    watcher.check(("docker.io", "traefik"))
+    status = watcher.status()[0]
+    assert status.changed_at == status.checked_at
+    assert status.newest == "traefik:v2.11.0"
+
+
+@pytest.mark.parametrize("budget", [1, 3])
+def test_run_budget(budget):
+    """Check every image without exceeding the concurrency budget."""
+    calls, running = [], {}
+    inspector = fake_inspector(
+        {f"app{index}": "v1.1.0" for index in range(10)},
+        calls,
+        delay=0.02,
+        running=running,
+    )
+    watcher = daemon.Watcher(inspector=inspector, budget=budget, min_interval=60)
+    watcher.watch([f"app{index}:v1.0.0" for index in range(10)])
+    thread = threading.Thread(target=watcher.run)
+    thread.start()
+    try:
+        _wait_for(lambda: all(status.checked_at for status in watcher.status()))
+    finally:
+        watcher.stop()
+        thread.join()
+    assert sorted(call[1] for call in calls) == sorted(
+        f"app{index}" for index in range(10)
+    )
+    assert running["peak"] <= budget
+    # Reading the results does not look anything up
+    watcher.status()
+    assert len(calls) == 10
+
+
+def test_failure_backoff():
+    """Check a failing image again sooner than the longest interval, backing off."""
+    failing = fake_inspector({}, error=ValueError("The registry is down."))
+    watcher = daemon.Watcher(inspector=failing, min_interval=10, jitter=0)
+    watcher.watch(["traefik:v2.10.0"])
+    intervals = []
+    for _ in range(3):
+        watcher.check(("docker.io", "traefik"))
+        status = watcher.status()[0]
+        intervals.append(round(status.next_check - status.checked_at))
+    assert intervals == [10, 20, 40]
+    assert status.error == "The registry is down."
+
+
+def test_reschedule_after_run():
+    """Keep an image scheduled after a check that ``run`` has taken off the queue."""
+    inspector = fake_inspector({"traefik": "v2.11.0"})
+    watcher = daemon.Watcher(inspector=inspector, min_interval=60, jitter=0)
+    watcher.watch(["traefik:v2.10.0"])
+    key = ("docker.io", "traefik")
+    assert watcher._next_due(time.time()) == key
+    watcher.check(key)
+    assert watcher._next_due(time.time()) == pytest.approx(60, abs=1)
+    assert watcher._next_due(time.time() + 120) == key
+
+
+def test_main_images_only(monkeypatch, tmp_path):
+    """Watch the images given on the command line, without any inventory file."""
+    handlers = {}
+    monkeypatch.setattr(daemon.signal, "signal", handlers.__setitem__)
+    monkeypatch.setitem(
+        daemon.registry.INSPECTORS, "native", fake_inspector({"traefik": "v2.11.0"})
+    )
+    output = tmp_path / "status.json"
+
+    def stop_when_checked():
+        deadline = time.monotonic() + 5
+        while not output.exists() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        handlers[daemon.signal.SIGTERM]()
+
+    thread = threading.Thread(target=stop_when_checked)
+    thread.start()
+    try:
+        assert daemon.main(
+            ["--output", str(output), "--reload-interval", "0.05", "traefik:v2.10.0"]
+        ) == 0
+    finally:
+        thread.join()
+    (status,) = json.loads(output.read_text())
+    assert status["newest"] == "traefik:v2.11.0"
@@ -134,3 +134,76 @@ def test_yyyymmdd_parser_semver_string():
         "minor": "2",
         "patch": "3",
     }
+
+def test_compiled_rules_are_cached():
+    """Compile a rule once and again only after it changes."""
+    rule_set = helpers.DefaultRules + helpers.lscrRules
+    pattern = rule_set.compiled("lscr")
+    assert rule_set.compiled("lscr.io") is pattern
+    rule_set["lscr"] = r"(?P<major>\d+)\.(?P<minor>\d+)\.(?P<patch>\d+)"
+    assert rule_set.compiled("lscr") is not pattern
+    assert helpers.parse_version("1.2.3", rule_set, "lscr") == {
+        "major": "1",
+        "minor": "2",
+        "patch": "3",
+    }
+
+def test_detect_rules():
+    """Detect the rule of version strings in a single combined match."""
+    assert helpers.rules.detect("v1.2.3.456-ls789") == (
+        "lscr",
+        {"major": "1", "minor": "2", "patch": "3", "prerelease": "456", "build": "789"},
+    )
+    assert helpers.rules.detect("1.2.3-alpine") == (
+        "default",
+        {"major": "1", "minor": "2", "patch": "3"},
+    )
+    assert helpers.rules.detect("20240601") == (
+        "yyyymmdd",
+        {"major": "2024", "minor": "06", "patch": "01"},
+    )
+    assert helpers.rules.detect("240601") == (
+        "yymmdd",
+        {"major": "24", "minor": "06", "patch": "01"},
+    )
+
+def test_detect_invalid_string():
+    """Fail to detect the rule of an invalid version string."""
+    with pytest.raises(ValueError):
+        helpers.rules.detect("latest")
+
+def test_auto_parser():
+    """Parse a version string with the detected rule."""
+    assert helpers.parse_version("version-1.2.3-ls789", helpers.rules, "auto") == {
+        "major": "1",
+        "minor": "2",
+        "patch": "3",
+        "prerelease": "0",
+        "build": "789",
+    }
+
+def test_version_key_matches_semver():
+    """Order version keys exactly like python-semver orders versions."""
+    semver = pytest.importorskip("semver")
+    versions = ["1.2.3", "1.2.3.4-ls5", "1.2.3.10-ls1", "1.10.0", "1.9.9", "0.0.1"]
+    for source in versions:
+        for target in versions:
+            source_fields = helpers.parse_version(source, helpers.rules, "lscr")
+            target_fields = helpers.parse_version(target, helpers.rules, "lscr")
+            assert (
+                helpers.VersionKey(source_fields) < helpers.VersionKey(target_fields)
+            ) == (semver.Version(**source_fields) < semver.Version(**target_fields))
+
+def test_newest_version():
+    """Pick the newest of many tags, skipping the ones that cannot be parsed."""
+    tags = ["latest", "edge"] + [f"v{major}.{minor}.0" for major in range(20) for minor in range(50)]
+    assert helpers.newest_version(tags) == "v19.49.0"
+    assert helpers.sort_versions(["v1.10.0", "latest", "v1.9.2"]) == ["v1.9.2", "v1.10.0"]
+    assert helpers.newest_version(["latest"]) is None
+
+def test_version_key_memo():
+    """Memoize the version keys of the general rules."""
+    key = helpers.version_key("v1.2.3.456-ls789", helpers.rules, "lscr")
+    assert helpers.version_key("v1.2.3.456-ls789", helpers.rules, "lscr") is key
+    assert (key.major, key.minor, key.patch, key.is_prerelease) == (1, 2, 3, True)
+    assert helpers.version_key("v1.2.3", helpers.rules, "default") == (1, 2, 3, 1)
@@ -0,0 +1,29 @@
+import json
+
+import pytest
+
+from docker_tag_updater import jsonstream
+
+
+def test_iter_array_chunks():
+    """Parse the same items however the text is split, even within a character."""
+    document = {"name": "library/redis", "count": 123, "tags": ["7.2.4", "7.2.4-é"]}
+    for ensure_ascii in (False, True):
+        body = json.dumps(document, ensure_ascii=ensure_ascii).encode()
+        for size in (1, 2, 7, len(body)):
+            chunks = [body[start : start + size] for start in range(0, len(body), size)]
+            assert list(jsonstream.iter_array(chunks, "tags")) == document["tags"]
+
+
+def test_iter_array_missing():
+    """Yield nothing when the array is missing or null."""
+    assert not list(jsonstream.iter_array([b'{"name": "redis"}'], "tags"))
+    assert not list(jsonstream.iter_array([b'{"tags": null}'], "tags"))
+    assert not list(jsonstream.iter_array([b" { } "], "tags"))
+
+
+def test_iter_array_invalid():
+    """Fail on text that is not a JSON object or ends too early."""
+    for body in (b'["7.2.4"]', b'{"tags": ["7.2.4"', b'{"tags": ["7.2.4" "7.2.5"]}'):
+        with pytest.raises(ValueError):
+            list(jsonstream.iter_array([body], "tags"))
@@ -0,0 +1,61 @@
+import json
+import pstats
+
+from docker_tag_updater import metrics, skopeo
+
+from .fake_inspector import fake_inspector
+
+_inspector = fake_inspector({"traefik": "v2.11.0", "hello-world": None})
+
+
+def test_disabled_records_nothing():
+    """A disabled instance ignores every timer and counter."""
+    recorder = metrics.Metrics()
+    with recorder.stage("inspect"):
+        recorder.count("failures")
+    stats = recorder.stats()
+    assert stats["stages"]["inspect"]["calls"] == 0
+    assert stats["counters"]["failures"] == 0
+
+
+def test_stages_and_counters(monkeypatch):
+    """Time the stages of a lookup and count its failures."""
+    recorder = metrics.Metrics(enabled=True)
+    monkeypatch.setattr(skopeo, "METRICS", recorder)
+    skopeo.image_version("traefik", inspector=_inspector)
+    try:
+        skopeo.image_version("hello-world", inspector=_inspector)
+    except KeyError:
+        pass
+    skopeo.compare_versions("v2.10.0", "v2.11.0")
+    stats = recorder.stats()
+    assert stats["stages"]["inspect"]["calls"] == 2
+    assert stats["stages"]["labels"]["calls"] == 2
+    assert stats["stages"]["compare"]["calls"] == 1
+    assert stats["counters"]["failures"] == 1
+    assert json.loads(json.dumps(stats)) == stats
+
+
+def test_write_prometheus(tmp_path):
+    """Export the metrics in the Prometheus text format."""
+    recorder = metrics.Metrics(enabled=True)
+    recorder.record("request", 0.5)
+    recorder.count("retries", 2)
+    path = tmp_path / "docker_tag_updater.prom"
+    recorder.write_prometheus(path)
+    lines = path.read_text(encoding="utf-8").splitlines()
+    assert 'docker_tag_updater_stage_seconds_total{stage="request"} 0.5' in lines
+    assert "docker_tag_updater_retries_total 2" in lines
+    assert list(tmp_path.iterdir()) == [path]
+
+
+def test_profile_threads(tmp_path):
+    """Profile the lookups that run in worker threads too."""
+    path = tmp_path / "run.prof"
+    with metrics.profile(path):
+        results = skopeo.image_versions(
+            ["traefik:v2.10.0", "ghcr.io/traefik:v2.9.0"], inspector=_inspector
+        )
+    assert [result.version for result in results] == ["v2.11.0", "v2.11.0"]
+    functions = {name for _, _, name in pstats.Stats(str(path)).stats}
+    assert "inspector" in functions
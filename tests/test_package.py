@@ -0,0 +1,19 @@
+import pkgutil
+import subprocess
+import sys
+
+import docker_tag_updater
+
+
+def test_lazy_submodules():
+    """Import every public submodule on first use, in a fresh interpreter."""
+    submodules = sorted(
+        module.name
+        for module in pkgutil.iter_modules(docker_tag_updater.__path__)
+        if not module.name.startswith("_")
+    )
+    assert sorted(docker_tag_updater.__all__) == submodules
+    code = "import docker_tag_updater as d; " + "; ".join(
+        f"d.{name}" for name in submodules
+    )
+    subprocess.run([sys.executable, "-c", code], check=True)
@@ -0,0 +1,89 @@
+import pytest
+
+from docker_tag_updater import compose, policy, skopeo
+
+from .fake_inspector import fake_inspector
+
+TAGS = [
+    "latest",
+    "15.5.0",
+    "15.6.0",
+    "15.6.0-alpine",
+    "15.7.0-alpine3.19",
+    "16.1.0",
+    "16.2.0",
+    "16.2.0-alpine",
+    "17.0.0-rc1",
+]
+
+
+def _lister(calls):
+    """Make a tag lister that counts its calls."""
+    def lister(image, registry, verbose):
+        calls.append(image)
+        return TAGS
+    return lister
+
+
+def test_parse_policy():
+    """Parse the constraints of a policy, and reject unknown ones."""
+    assert policy.parse_policy("major, stable, variant=") == policy.UpdatePolicy(
+        pin="major", stable=True, variant=""
+    )
+    assert policy.parse_policy("") == policy.UpdatePolicy()
+    with pytest.raises(ValueError):
+        policy.parse_policy("patch")
+
+
+def test_version_index():
+    """Answer every policy from the same index."""
+    index = policy.VersionIndex(TAGS)
+    assert len(index) == len(TAGS) - 1
+    assert index.newest("15.5.0") == "17.0.0-rc1"
+    assert index.newest("15.5.0", policy.parse_policy("stable")) == "16.2.0"
+    assert index.newest("15.5.0", policy.parse_policy("major")) == "15.7.0-alpine3.19"
+    assert index.newest("15.5.0", policy.parse_policy("major,variant=")) == "15.6.0"
+    assert index.newest("15.5.0", policy.parse_policy("minor")) == "15.5.0"
+    assert index.newest("16.1.0", policy.parse_policy("max=16.1.9")) == "16.1.0"
+    assert (
+        index.newest("15.6.0-alpine", policy.parse_policy("same-variant,stable"))
+        == "16.2.0-alpine"
+    )
+    # Another variant of the same version is not an update
+    assert index.newest("16.2.0-alpine") != "16.2.0"
+
+
+def test_policy_for():
+    """Prefer exact names to patterns."""
+    policies = {"*": "stable", "postgres": "major", "docker.io/redis": "minor"}
+    policies = policy.parse_policies(policies)
+    assert policy.policy_for(policies, "docker.io", "postgres").pin == "major"
+    assert policy.policy_for(policies, "docker.io", "redis").pin == "minor"
+    assert policy.policy_for(policies, "ghcr.io", "traefik").stable
+    assert policy.policy_for({}, "docker.io", "postgres") is None
+
+
+def test_pinned_majors():
+    """Keep every reference on its own major version, listing the tags once."""
+    calls = []
+    updates, errors = compose.resolve(
+        ["postgres:15.5.0", "postgres:16.1.0", "postgres:16.2.0-alpine"],
+        lister=_lister(calls),
+        policies=policy.parse_policies({"postgres": "major,same-variant"}),
+    )
+    assert not errors
+    assert calls == ["postgres"]
+    assert updates == {
+        "postgres:15.5.0": "postgres:15.6.0",
+        "postgres:16.1.0": "postgres:16.2.0",
+    }
+
+
+def test_policy_version_label():
+    """Hold the version label of the base tag to the policy too."""
+    inspector = fake_inspector("16.2.0")
+    policies = policy.parse_policies({"postgres": "major"})
+    results = skopeo.image_versions(
+        ["postgres:15.5.0", "postgres:16.1.0"], inspector=inspector, policies=policies
+    )
+    assert [result.version for result in results] == ["15.5.0", "16.2.0"]
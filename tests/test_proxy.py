@@ -0,0 +1,86 @@
+import threading
+
+import pytest
+
+from docker_tag_updater import proxy, ratelimit, registry, skopeo
+
+from .fake_registry import FakeRegistry
+
+VERSION_LABEL = "org.opencontainers.image.version"
+
+
+@pytest.fixture
+def upstream():
+    with FakeRegistry(auth=True) as server:
+        server.add_image("library/postgres", "16", {VERSION_LABEL: "16.2.0"})
+        server.add_image(
+            "linuxserver/mariadb",
+            "latest",
+            {VERSION_LABEL: "10.11.6-r0-ls136"},
+            platforms=["linux/amd64", "linux/arm64"],
+        )
+        server.add_tags("library/redis", [f"7.2.{patch}" for patch in range(5)])
+        yield server
+
+
+@pytest.fixture
+def registry_proxy(upstream, tmp_path):
+    client = registry.RegistryClient(
+        endpoints={"docker.io": upstream.url, "ghcr.io": upstream.url},
+        limits=ratelimit.RegistryLimits(),
+    )
+    with proxy.ContentStore(tmp_path / "proxy.sqlite3") as store:
+        registry_proxy = proxy.RegistryProxy(store, client)
+        server = proxy.ProxyServer(("127.0.0.1", 0), registry_proxy)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        yield registry_proxy, f"http://127.0.0.1:{server.server_port}"
+        server.shutdown()
+        server.server_close()
+    client.close()
+
+
+def _mirrored_client(url):
+    return registry.RegistryClient(limits=ratelimit.RegistryLimits(), mirror=url)
+
+
+def test_proxy_caches(registry_proxy, upstream):
+    """Serve repeated inspections of many clients from a single upstream fetch."""
+    _, url = registry_proxy
+    for attempt in range(3):
+        client = _mirrored_client(url)
+        assert skopeo.image_version("postgres", "docker.io", "16", client.inspect) == (
+            "16.2.0"
+        )
+        config = client.inspect("linuxserver/mariadb", "ghcr.io", "latest")
+        assert config["architecture"] == "amd64"
+        client.close()
+        if attempt == 0:
+            assert upstream.requests
+            del upstream.requests[:]
+    assert not upstream.requests
+
+    client = _mirrored_client(url)
+    assert client.list_tags("redis", page_size=2) == [
+        f"7.2.{patch}" for patch in range(5)
+    ]
+    client.close()
+
+
+def test_proxy_revalidates(registry_proxy, upstream):
+    """Revalidate the digest of a tag with a HEAD request once it is stale."""
+    registry_proxy_, url = registry_proxy
+    registry_proxy_.tag_ttl = 0
+    client = _mirrored_client(url)
+    client.inspect("postgres", "docker.io", "16")
+    del upstream.requests[:]
+    client.inspect("postgres", "docker.io", "16")
+    assert [method for method, path in upstream.requests if path != "/token"] == [
+        "HEAD"
+    ]
+
+    upstream.add_image("library/postgres", "16", {VERSION_LABEL: "16.3.0"})
+    assert skopeo.image_version("postgres", "docker.io", "16", client.inspect) == (
+        "16.3.0"
+    )
+    client.close()
@@ -0,0 +1,69 @@
+import time
+from email.message import Message
+
+import pytest
+
+from docker_tag_updater import ratelimit
+
+
+def _headers(**headers):
+    message = Message()
+    for key, value in headers.items():
+        message[key.replace("_", "-")] = value
+    return message
+
+
+def test_retry_after():
+    """Read Retry-After as a number of seconds or as a date."""
+    assert ratelimit.retry_after(_headers(Retry_After="120")) == 120
+    assert ratelimit.retry_after(
+        _headers(Retry_After="Wed, 21 Oct 2015 07:28:30 GMT"), now=1445412480
+    ) == 30
+    assert ratelimit.retry_after(_headers()) is None
+
+
+@pytest.mark.parametrize(
+    "headers, expected",
+    [
+        ({"RateLimit_Remaining": "76;w=21600"}, (76, 21600)),
+        ({"RateLimit_Remaining": "3", "RateLimit_Reset": "30"}, (3, 30)),
+        ({"RateLimit_Remaining": "5"}, (5, None)),
+        ({}, None),
+    ],
+)
+def test_rate_limit_remaining(headers, expected):
+    """Read the allowance in the forms of Docker Hub and of the IETF draft."""
+    assert ratelimit.rate_limit_remaining(_headers(**headers)) == expected
+
+
+def test_token_bucket():
+    """Hand out a burst of tokens, then pace them at the rate."""
+    bucket = ratelimit.TokenBucket(rate=10, burst=2)
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == pytest.approx(0.1, abs=0.01)
+    bucket.pause(5)
+    assert bucket.reserve() == pytest.approx(5, abs=0.01)
+
+
+def test_adaptive_limit():
+    """Halve the limit when throttled, and grow it back by one per round trip."""
+    limit = ratelimit.AdaptiveLimit(initial=8)
+    limit.record(0.1)
+    limit.record(0.1, throttled=True)
+    assert int(limit.limit) == 4
+    for _ in range(20):
+        limit.record(0.1)
+    assert int(limit.limit) == 7
+    time.sleep(0.1)
+    limit.record(1.0)
+    assert int(limit.limit) == 3
+
+
+def test_slot_max_wait():
+    """Refuse to wait longer than max_wait for a paused registry."""
+    limits = ratelimit.RegistryLimits(max_wait=1)
+    limits.observe("fake.io", 429, _headers(Retry_After="60"), 0.1)
+    with pytest.raises(ratelimit.RateLimitExceeded):
+        with limits.slot("fake.io"):
+            pass
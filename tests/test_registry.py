@@ -0,0 +1,263 @@
+import threading
+
+import pytest
+
+from docker_tag_updater import auth, ratelimit, registry, skopeo
+from docker_tag_updater.cache import MetadataCache
+
+from .fake_registry import FakeRegistry
+
+VERSION_LABEL = "org.opencontainers.image.version"
+
+
+@pytest.fixture
+def fake_registry():
+    with FakeRegistry() as server:
+        server.add_image("library/alpine", "latest", {VERSION_LABEL: "v3.19.1"})
+        server.add_image(
+            "linuxserver/mariadb",
+            "latest",
+            {VERSION_LABEL: "10.11.6-r0-ls136"},
+            platforms=["linux/amd64", "linux/arm64"],
+        )
+        yield server
+
+
+@pytest.fixture
+def client(fake_registry):
+    client = registry.RegistryClient(
+        endpoints={
+            "docker.io": fake_registry.url,
+            "fake.io": fake_registry.url,
+        },
+        limits=ratelimit.RegistryLimits(),
+    )
+    yield client
+    client.close()
+
+
+def test_repository_library_prefix():
+    """Official Docker Hub images live in the library namespace."""
+    assert registry.RegistryClient.repository("alpine") == "library/alpine"
+    assert registry.RegistryClient.repository("alpine", "ghcr.io") == "alpine"
+
+
+def test_inspect_config(client):
+    """Fetch the image configuration of a single-platform image."""
+    config = client.inspect("alpine", "docker.io", "latest")
+    assert config["config"]["Labels"][VERSION_LABEL] == "v3.19.1"
+
+
+def test_inspect_index(client):
+    """Select the platform manifest from an image index."""
+    config = client.inspect("linuxserver/mariadb", "fake.io", "latest")
+    assert config["architecture"] == "amd64"
+    client.platform = "linux/arm64"
+    config = client.inspect("linuxserver/mariadb", "fake.io", "latest")
+    assert config["architecture"] == "arm64"
+
+
+def test_inspect_missing_platform(client):
+    """Fail to select a platform that is not in the image index."""
+    client.platform = "linux/s390x"
+    with pytest.raises(registry.RegistryError):
+        client.inspect("linuxserver/mariadb", "fake.io", "latest")
+
+
+def test_inspect_annotations(client, fake_registry):
+    """Read the version from the annotations instead of the image configuration."""
+    fake_registry.add_image(
+        "library/nginx",
+        "latest",
+        {VERSION_LABEL: "1.25.3"},
+        platforms=["linux/amd64"],
+        annotations={VERSION_LABEL: "1.25.4"},
+    )
+    fake_registry.add_image(
+        "library/redis", "latest", annotations={VERSION_LABEL: "7.2.4"}
+    )
+    requests = len(fake_registry.requests)
+    config = client.inspect("nginx", "docker.io", "latest")
+    assert config["config"]["Labels"][VERSION_LABEL] == "1.25.4"
+    config = client.inspect("redis", "docker.io", "latest")
+    assert config["config"]["Labels"][VERSION_LABEL] == "7.2.4"
+    assert len(fake_registry.requests) - requests == 2
+
+
+def test_inspect_single_config(client, fake_registry):
+    """Fetch the configuration of the selected platform only."""
+    client.inspect("linuxserver/mariadb", "fake.io", "latest")
+    paths = [path for _, path in fake_registry.requests]
+    assert len(paths) == 3
+    assert sum("/blobs/" in path for path in paths) == 1
+
+
+def test_inspect_invalid_tag(client):
+    """Fail to inspect a tag that does not exist."""
+    with pytest.raises(ValueError):
+        client.inspect("alpine", "docker.io", "asdf")
+
+
+def test_image_version_inspector(client):
+    """Plug the client into skopeo.image_version."""
+    assert (
+        skopeo.image_version("alpine", "docker.io", "latest", inspector=client.inspect)
+        == "v3.19.1"
+    )
+
+
+def test_connection_reuse(client, fake_registry):
+    """Serve every lookup over a single keep-alive connection."""
+    for _ in range(5):
+        client.inspect("alpine", "docker.io", "latest")
+    assert len(fake_registry.requests) == 10
+    assert fake_registry.connections == 1
+
+
+def test_bearer_token():
+    """Authenticate once with a bearer token and reuse it."""
+    with FakeRegistry(auth=True) as server:
+        server.add_image("linuxserver/mariadb", "latest", {VERSION_LABEL: "10.11.6"})
+        client = registry.RegistryClient(
+            endpoints={"fake.io": server.url}, tokens=auth.TokenCache()
+        )
+        for _ in range(3):
+            config = client.inspect("linuxserver/mariadb", "fake.io", "latest")
+        client.close()
+    assert config["config"]["Labels"][VERSION_LABEL] == "10.11.6"
+    assert [path for _, path in server.requests].count("/token") == 1
+
+
+def test_list_tags_pagination(client, fake_registry):
+    """List every tag over several pages."""
+    tags = [f"1.{minor}.{patch}" for minor in range(10) for patch in range(10)]
+    fake_registry.add_tags("library/redis", ["latest", *tags])
+    assert sorted(client.list_tags("redis", "docker.io", page_size=30)) == sorted(
+        ["latest", *tags]
+    )
+    assert len(fake_registry.requests) == 4
+
+
+def test_iter_tags_stream(client, fake_registry):
+    """Stream the tags of every page, reusing the connection once each is read."""
+    tags = [f"1.{minor}.{patch}" for minor in range(10) for patch in range(10)]
+    fake_registry.add_tags("library/redis", tags)
+    stream = client.iter_tags("redis", "docker.io", page_size=30)
+    assert next(stream) == "1.0.0"
+    assert sorted(["1.0.0", *stream]) == tags
+    assert skopeo.newest_tag(
+        "redis", "docker.io", lister=client.iter_tags
+    ) == "1.9.9"
+    assert fake_registry.connections == 1
+
+
+def test_newest_tag(client, fake_registry):
+    """Find the newest tag of an image without a version label."""
+    fake_registry.add_tags(
+        "library/hello-world", ["latest", "1.9.0", "1.10.0", "1.10.0-alpine", "linux"]
+    )
+    assert skopeo.newest_tag(
+        "hello-world", "docker.io", lister=client.list_tags
+    ) == "1.10.0"
+
+
+def test_retry_throttled(client, fake_registry):
+    """Retry a throttled request after the delay that the registry asks for."""
+    fake_registry.fail(429, headers={"Retry-After": "0"})
+    fake_registry.fail(503)
+    config = client.inspect("alpine", "docker.io", "latest")
+    assert config["config"]["Labels"][VERSION_LABEL] == "v3.19.1"
+    assert len(fake_registry.requests) == 4
+
+
+def test_retries_exhausted(fake_registry):
+    """Give up on a request that keeps failing, without falling back."""
+    client = registry.RegistryClient(
+        endpoints={"fake.io": fake_registry.url},
+        limits=ratelimit.RegistryLimits(),
+        retries=1,
+    )
+    fake_registry.fail(500, count=2)
+    with pytest.raises(registry.RegistryError) as excinfo:
+        client.inspect("linuxserver/mariadb", "fake.io", "latest")
+    assert excinfo.value.status == 500
+    assert len(fake_registry.requests) == 2
+
+
+def test_rate_limit_exhausted(client, fake_registry):
+    """Fail fast instead of waiting for hours when the allowance is used up."""
+    fake_registry.headers["RateLimit-Remaining"] = "0;w=21600"
+    client.manifest("alpine", "docker.io", "latest")
+    with pytest.raises(registry.RegistryError) as excinfo:
+        client.inspect("alpine", "docker.io", "latest")
+    assert excinfo.value.status == 429
+
+
+def test_bearer_token_other_scope():
+    """Request the token of another repository without being challenged again."""
+    with FakeRegistry(auth=True) as server:
+        server.add_image("linuxserver/mariadb", "latest", {VERSION_LABEL: "10.11.6"})
+        server.add_image("linuxserver/sonarr", "latest", {VERSION_LABEL: "4.0.2"})
+        client = registry.RegistryClient(
+            endpoints={"fake.io": server.url}, tokens=auth.TokenCache()
+        )
+        client.inspect("linuxserver/mariadb", "fake.io", "latest")
+        requests = len(server.requests)
+        client.inspect("linuxserver/sonarr", "fake.io", "latest")
+        client.close()
+    # The token, the manifest and the configuration, without a 401 first
+    assert len(server.requests) - requests == 3
+
+
+def test_bearer_token_persisted(tmp_path):
+    """Reuse the tokens of a previous run that were kept on disk."""
+    path = tmp_path / "tokens.json"
+    with FakeRegistry(auth=True) as server:
+        server.add_image("linuxserver/mariadb", "latest", {VERSION_LABEL: "10.11.6"})
+        for _ in range(2):
+            client = registry.RegistryClient(
+                endpoints={"fake.io": server.url}, tokens=auth.TokenCache(path)
+            )
+            client.inspect("linuxserver/mariadb", "fake.io", "latest")
+            client.close()
+    assert [path for _, path in server.requests].count("/token") == 1
+    assert path.stat().st_mode & 0o777 == 0o600
+
+
+def test_matching_version(client, fake_registry, tmp_path):
+    """Find the version tag with the digest of the base tag, once per digest."""
+    fake_registry.add_tags("library/hello-world", ["latest", "1.2.0", "linux"])
+    fake_registry.add_image("library/hello-world", "1.3.0", {"stage": "next"})
+    fake_registry.add_image("library/hello-world", "1.1.0", {"stage": "old"})
+    with MetadataCache(tmp_path / "metadata.sqlite3") as cache:
+        for _ in range(2):
+            del fake_registry.requests[:]
+            version = skopeo.matching_version(
+                "hello-world",
+                digester=client.digest,
+                lister=client.list_tags,
+                cache=cache,
+            )
+            assert version == "1.2.0"
+    assert fake_registry.requests == [
+        ("HEAD", "/v2/library/hello-world/manifests/latest")
+    ]
+
+
+def test_deadline_read_timeout(client, fake_registry):
+    """Time the requests of a lookup out by the deadline of its batch."""
+    fake_registry.latency = 2.0
+    finished = threading.Event()
+
+    def inspector(*args):
+        try:
+            return client.inspect(*args)
+        finally:
+            finished.set()
+
+    (result,) = skopeo.image_versions(
+        ["alpine:v3.18.0"], inspector=inspector, deadline=0.2
+    )
+    assert isinstance(result.error, skopeo.DeadlineExceeded)
+    # The worker gave up at the deadline instead of waiting for the registry
+    assert finished.wait(1)
@@ -0,0 +1,80 @@
+import pytest
+
+from docker_tag_updater import compose, registry, replay, skopeo
+
+from .fake_inspector import fake_inspector
+
+inspector = fake_inspector({"traefik": "v2.11.0"}, digest="sha256:abc")
+
+
+def lister(image, registry, verbose):
+    """Serve the tags of any image."""
+    return ["v2.10.0", "v2.11.0", "latest"]
+
+
+def test_record_replay(tmp_path):
+    """Replay the recorded responses and failures without the backend."""
+    archive = replay.ResponseArchive()
+    results = skopeo.image_versions(
+        ["traefik:v2.10.0", "hello-world"], inspector=archive.recorder(inspector)
+    )
+    assert archive.list_recorder(lister)("traefik") == lister("traefik", "", False)
+    archive.save(tmp_path / "fixtures.json.gz")
+
+    archive = replay.ResponseArchive(tmp_path / "fixtures.json.gz")
+    assert len(archive) == 3
+    assert skopeo.image_versions(
+        ["traefik:v2.10.0", "hello-world"], inspector=archive.inspect
+    )[0] == results[0]
+    with pytest.raises(ValueError, match="hello-world is invalid"):
+        archive.inspect("hello-world")
+    assert skopeo.newest_tag("traefik", lister=archive.list_tags) == "v2.11.0"
+
+
+def test_replay_missing():
+    """Fail the lookups that were not recorded."""
+    archive = replay.ResponseArchive()
+    with pytest.raises(replay.MissingResponse):
+        archive.inspect("traefik", "docker.io", "latest")
+    with pytest.raises(replay.MissingResponse):
+        archive.list_tags("traefik")
+
+
+def test_save_deterministic(tmp_path):
+    """Write the same archive byte for byte for the same responses."""
+    archive = replay.ResponseArchive()
+    archive.recorder(inspector)("traefik")
+    archive.save(tmp_path / "first.json.gz")
+    archive.save(tmp_path / "second.json.gz")
+    assert (tmp_path / "first.json.gz").read_bytes() == (
+        tmp_path / "second.json.gz"
+    ).read_bytes()
+
+
+def test_record_essentials():
+    """Record only the labels and the digest of each inspector response."""
+    archive = replay.ResponseArchive()
+
+    def full_inspector(image, registry, base_tag, verbose):
+        response = inspector(image, registry, base_tag, verbose)
+        return {**response, "architecture": "amd64", "rootfs": {"diff_ids": []}}
+
+    archive.recorder(full_inspector)("traefik")
+    assert archive.inspections["docker.io/traefik:latest"]["result"] == {
+        "config": {"Labels": {"org.opencontainers.image.version": "v2.11.0"}},
+        "Digest": "sha256:abc",
+    }
+
+
+def test_record_warm_cache(tmp_path, monkeypatch):
+    """Record the lookups that a warm cache would have answered too."""
+    monkeypatch.setitem(registry.INSPECTORS, "native", inspector)
+    monkeypatch.setenv("GITHUB_OUTPUT", str(tmp_path / "outputs"))
+    compose_file = tmp_path / "compose.yaml"
+    compose_file.write_text("services:\n  proxy:\n    image: traefik:v2.10.0\n")
+    cache_path = str(tmp_path / "metadata.sqlite3")
+    arguments = ["-f", str(compose_file), "--cache", cache_path, "--dry-run"]
+    compose.main(arguments)
+    compose.main([*arguments, "--record", str(tmp_path / "fixtures.json.gz")])
+    archive = replay.ResponseArchive(tmp_path / "fixtures.json.gz")
+    assert archive.inspect("traefik")["config"]["Labels"]
@@ -0,0 +1,73 @@
+import threading
+
+import pytest
+
+from docker_tag_updater import server
+
+from .fake_inspector import fake_inspector
+
+_inspector = fake_inspector({"traefik": "v2.11.0", "hello-world": None})
+
+
+@pytest.fixture
+def resolver():
+    with server.Resolver(inspectors={"native": _inspector}, listers={}) as resolver:
+        yield resolver
+
+
+@pytest.fixture
+def socket_path(resolver, tmp_path):
+    path = str(tmp_path / "resolver.sock")
+    resolver_server = server.ResolverServer(path, resolver)
+    thread = threading.Thread(target=resolver_server.serve_forever, args=(0.01,))
+    thread.start()
+    yield path
+    resolver_server.shutdown()
+    resolver_server.server_close()
+    thread.join()
+
+
+def test_resolve(resolver):
+    """Resolve the newest tagged image of each image in-process."""
+    assert resolver.resolve(["traefik:v2.10.0", "traefik:v3.0.0", "hello-world"]) == [
+        server.Resolution("traefik:v2.10.0", "traefik:v2.11.0"),
+        server.Resolution("traefik:v3.0.0", "traefik:v3.0.0"),
+        server.Resolution(
+            "hello-world",
+            error="'The version label for docker.io/hello-world:latest is not set.'",
+        ),
+    ]
+
+
+def test_forward(resolver, socket_path):
+    """Resolve images on the server exactly like in-process."""
+    images = ["traefik:v2.10.0", "hello-world"]
+    assert server.forward(images, {"rule": "auto"}, socket_path) == resolver.resolve(
+        images, rule="auto"
+    )
+
+
+def test_forward_invalid_request(socket_path):
+    """Reject options that the resolver does not know about."""
+    with pytest.raises(server.ServerError, match="Unknown options: shell"):
+        server.forward(["traefik"], {"shell": "true"}, socket_path)
+
+
+def test_forward_without_server(tmp_path):
+    """Fail to forward when no server is listening, so the caller can fall back."""
+    with pytest.raises(OSError):
+        server.forward(["traefik"], {}, str(tmp_path / "missing.sock"))
+
+
+def test_stream(socket_path):
+    """Stream a record for every image from the server as soon as it is resolved."""
+    images = ["traefik:v2.10.0", "ghcr.io/traefik:v2.9.0", "hello-world"]
+    records = dict(server.stream(images, {"rule": "auto"}, socket_path))
+    assert sorted(records) == [0, 1, 2]
+    assert records[1].registry == "ghcr.io"
+    assert records[1].tag == "v2.9.0"
+    assert records[1].version == "v2.11.0"
+    assert records[1].newest == "ghcr.io/traefik:v2.11.0"
+    assert records[1].rule == "auto"
+    assert records[2].error is not None
+    assert all(record.seconds >= 0 for record in records.values())
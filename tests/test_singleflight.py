@@ -0,0 +1,61 @@
+import threading
+
+from docker_tag_updater import singleflight, skopeo
+
+from .fake_inspector import fake_inspector
+
+
+def _run_concurrently(func, count=8):
+    """Call a function from several threads at once, collecting results and errors."""
+    outcomes = []
+    barrier = threading.Barrier(count)
+
+    def call():
+        barrier.wait()
+        try:
+            outcomes.append(func())
+        except Exception as exc:  # pylint: disable=broad-exception-caught
+            outcomes.append(exc)
+
+    threads = [threading.Thread(target=call) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return outcomes
+
+
+def test_shared_result():
+    """Share one outstanding lookup among concurrent callers."""
+    calls = []
+    inspector = singleflight.coalesce(fake_inspector("16.2.0", calls, delay=0.05))
+    outcomes = _run_concurrently(
+        lambda: skopeo.image_version("postgres", inspector=inspector)
+    )
+    assert outcomes == ["16.2.0"] * 8
+    assert calls == [("docker.io", "postgres", "latest")]
+
+
+def test_shared_error():
+    """Share the error of one outstanding lookup among concurrent callers."""
+    calls = []
+    inspector = singleflight.coalesce(
+        fake_inspector("16.2.0", calls, delay=0.05, error=ValueError("invalid"))
+    )
+    outcomes = _run_concurrently(lambda: inspector("postgres", "docker.io", "latest", False))
+    assert all(isinstance(outcome, ValueError) for outcome in outcomes)
+    assert len(calls) == 1
+
+
+def test_distinct_keys():
+    """Do not share lookups of different base tags, nor finished lookups."""
+    calls = []
+    flight = singleflight.SingleFlight()
+    inspector = singleflight.coalesce(
+        fake_inspector("16.2.0", calls, delay=0.05), flight
+    )
+    inspector("postgres", "docker.io", "latest", False)
+    inspector("postgres", "docker.io", "latest", False)
+    inspector("postgres", "docker.io", "alpine", False)
+    assert len(calls) == 3
+    assert len(flight) == 0
@@ -1,7 +1,12 @@
+import threading
+import time
+
 import pytest
 
 from docker_tag_updater import skopeo
 
+from .fake_inspector import fake_inspector
+
 baseimage_alpine_tag = "3.18-f7e3c236-ls38"
 
 
@@ -34,3 +39,92 @@ def test_inspect_invalid_tag():
   "Test inspect with an invalid base tag."
   with pytest.raises(ValueError):
     skopeo.inspect("linuxserver/baseimage-alpine", "ghcr.io", "asdf")
+
+
+def test_image_versions_batch():
+  """Look up many images, recording failures without aborting the batch."""
+  calls = []
+  results = skopeo.image_versions(
+    ["traefik:v2.10.0", "missing:1.0.0", "ghcr.io/linuxserver/mariadb:10.11.5", "traefik:v2.9.0"],
+    inspector=fake_inspector(
+      {"traefik": "v2.11.0", "linuxserver/mariadb": "10.11.6"}, calls=calls
+    ),
+  )
+  assert [result.version for result in results] == ["v2.11.0", None, "10.11.6", "v2.11.0"]
+  assert isinstance(results[1].error, ValueError)
+  assert results[2].registry == "ghcr.io"
+  assert results[3].tag == "v2.9.0"
+  assert len(calls) == 3
+
+
+def test_image_versions_per_registry_cap():
+  """Never run more lookups on a registry at once than allowed."""
+  running = {"now": 0, "peak": 0}
+  lock = threading.Lock()
+  inspector = fake_inspector({f"image{i}": "1.0.0" for i in range(12)}, delay=0.02)
+
+  def counting_inspector(*args):
+    with lock:
+      running["now"] += 1
+      running["peak"] = max(running["peak"], running["now"])
+    try:
+      return inspector(*args)
+    finally:
+      with lock:
+        running["now"] -= 1
+
+  results = skopeo.image_versions(
+    [f"image{i}" for i in range(12)],
+    inspector=counting_inspector,
+    max_workers=8,
+    per_registry=2,
+  )
+  assert all(result.error is None for result in results)
+  assert running["peak"] == 2
+
+
+def test_image_versions_deadline():
+  """Return the results found by the deadline, looking urgent images up first."""
+  calls = []
+  inspector = fake_inspector({"slow": "2.0", "fast": "2.0", "urgent": "2.0"}, calls=calls)
+
+  def slow_inspector(image, registry, base_tag, verbose):
+    labels = inspector(image, registry, base_tag, verbose)
+    if image == "slow":
+      time.sleep(0.5)
+    return labels
+
+  results = skopeo.image_versions(
+    ["slow:1.0", "fast:1.0", "urgent:1.0"],
+    inspector=slow_inspector,
+    max_workers=1,
+    deadline=0.2,
+    priorities={"urg*": 10},
+  )
+  assert [call[1] for call in calls] == ["urgent", "slow"]
+  assert results[2].version == "2.0"
+  assert isinstance(results[0].error, skopeo.DeadlineExceeded)
+  assert isinstance(results[1].error, skopeo.DeadlineExceeded)
+
+
+def test_image_versions_deadline_timeouts():
+  """Time the processes and requests of a running lookup out by the deadline."""
+  finished = threading.Event()
+
+  def hung_inspector(image, registry, base_tag, verbose):
+    # Like a registry read that blocks for as long as its timeout allows
+    try:
+      time.sleep(skopeo.time_left(10))
+      skopeo.time_left(10)
+    finally:
+      finished.set()
+
+  start = time.monotonic()
+  (result,) = skopeo.image_versions(
+    ["hung:1.0"], inspector=hung_inspector, deadline=0.2
+  )
+  assert isinstance(result.error, skopeo.DeadlineExceeded)
+  assert finished.wait(1)
+  assert time.monotonic() - start < 1
+  # Lookups outside of a batch keep their own timeouts
+  assert skopeo.time_left(10) == 10
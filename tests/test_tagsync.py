@@ -0,0 +1,52 @@
+import pytest
+
+from docker_tag_updater import ratelimit, registry, tagsync
+
+from .fake_registry import FakeRegistry
+
+
+@pytest.fixture
+def fake_registry():
+    with FakeRegistry() as server:
+        server.add_tags("library/redis", ["7.2.3", "7.2.4", "latest"])
+        yield server
+
+
+@pytest.fixture
+def sync(fake_registry, tmp_path):
+    client = registry.RegistryClient(
+        endpoints={"docker.io": fake_registry.url}, limits=ratelimit.RegistryLimits()
+    )
+    with tagsync.TagStore(tmp_path / "tags.sqlite3") as store:
+        yield tagsync.TagSync(store, client)
+    client.close()
+
+
+def test_incremental_sync(sync, fake_registry):
+    """Only list the tags after the last known tag once the tags are stored."""
+    assert sync.list_tags("redis") == ["7.2.3", "7.2.4", "latest"]
+    fake_registry.add_tags("library/redis", ["mainline", "7.2.5"])
+    del fake_registry.requests[:]
+    assert sync.list_tags("redis") == ["7.2.3", "7.2.4", "latest", "mainline"]
+    assert len(fake_registry.requests) == 1
+    assert sync.store.get("docker.io", "redis").last == "mainline"
+
+
+def test_full_relist(sync, fake_registry):
+    """List every tag again when the stored tags are old or inconsistent."""
+    sync.list_tags("redis")
+    fake_registry.add_tags("library/redis", ["7.2.5"])
+    sync.full_interval = 0
+    assert "7.2.5" in sync.list_tags("redis")
+
+    # A registry that ignores the last tag
+    lists = []
+
+    def list_tags(image, registry, verbose, page_size=1000, last=None):
+        lists.append(last)
+        return ["7.2.3", "7.2.4", "7.2.5", "7.2.6", "latest"]
+
+    sync.full_interval = 86400
+    sync.client.list_tags = list_tags
+    assert "7.2.6" in sync.list_tags("redis")
+    assert lists == ["latest", None]